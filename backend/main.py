@@ -1,23 +1,119 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, field_validator
+from typing import List, Optional
+from contextlib import asynccontextmanager
+import multiprocessing
+import asyncio
+import functools
+import time
 import os
 import json
-import mysql.connector
-import psycopg2
+from backend.scripts.connection_pool import connect_mysql, connect_postgres, pool_metrics, POOL_SETTINGS
+from backend.scripts.query_console import ConsoleStream, run_console_query, run_console_page
 from datetime import datetime
-from backend.scripts.generate_keys import generate_ecc_keys
+from backend.scripts.key_manager import ensure_keys, named_key_paths, rotate_keys, key_info, key_fingerprint, load_public_key, KEY_NAME_PATTERN
 from backend.scripts.load_dummy_data_mysql import load_dummy_data
 from backend.scripts.extract_mysql_encrypt import extract_and_encrypt
 from backend.scripts.encrypt_payload import ecc_encrypt_session_key
 from backend.scripts.transfer_to_postgres import ecc_decrypt_and_load
+from backend.scripts.stream_pipeline import stream_transfer, estimate_row_count
+from backend.scripts.partitioned_transfer import partitioned_transfer, partitioned_verify_postgres
 from backend.scripts.extract_postgres_encrypt import extract_and_encrypt_postgres
-from backend.scripts.compare_hash import compare_hashes
-from backend.scripts.audit_logger import log_transfer
+from backend.scripts.compare_hash import compare_hashes, compare_fingerprints
+from backend.scripts.table_fingerprint import fingerprint_table
+from backend.scripts.schema_transfer import schema_transfer, schema_verify_postgres
+from backend.scripts.incremental_transfer import incremental_transfer, verify_incremental_postgres, load_watermark
+from concurrent.futures import ThreadPoolExecutor
+from backend.scripts.audit_logger import AuditStore, log_transfer
+from backend.scripts.audit_verify import verify_chain
 from backend.scripts.generate_pdf import generate_pdf
+from backend.scripts.job_queue import JobQueue, JobProgress
+from backend.scripts.workspace import JobWorkspace, apply_retention
+from backend.scripts.pipeline_metrics import PipelineMetrics, render_prometheus
+from backend.scripts.checkpointed_transfer import Checkpoint, resumable_transfer
 
-app = FastAPI(title="Secure DB Transfer API")
+# Transfers run as jobs in separate worker processes. Each job works in
+# JOB_ROOT/<job id>; state shared between jobs lives in BASE_DIR.
+BASE_DIR = os.path.abspath(os.getenv("TRANSFER_STATE_DIR", "."))
+PRIVATE_KEY_PATH = os.path.join(BASE_DIR, "private_key.pem")
+PUBLIC_KEY_PATH = os.path.join(BASE_DIR, "public_key.pem")
+# ECDSA pair that signs audit checkpoints; never used for key agreement
+AUDIT_SIGNING_PRIVATE_KEY_PATH = os.path.join(BASE_DIR, "audit_signing_private_key.pem")
+AUDIT_SIGNING_PUBLIC_KEY_PATH = os.path.join(BASE_DIR, "audit_signing_public_key.pem")
+# Named recipient keys other than "default" (the pair above): keys/<name>/
+KEY_DIR = os.path.join(BASE_DIR, "keys")
+WATERMARK_PATH = os.path.join(BASE_DIR, "watermarks.json")
+AUDIT_LOG_PATH = os.path.join(BASE_DIR, "audit_log.db")
+# Pre-SQLite audit log, imported into AUDIT_LOG_PATH on first startup
+LEGACY_AUDIT_LOG_PATH = os.path.join(BASE_DIR, "audit_log.json")
+JOB_DB_PATH = os.path.join(BASE_DIR, "jobs.db")
+JOB_ROOT = os.path.join(BASE_DIR, "jobs")
+TRANSFER_WORKERS = int(os.getenv("TRANSFER_WORKERS", 2))
+# Jobs allowed to run at once against the same source / destination database
+JOB_MAX_PER_SOURCE = int(os.getenv("JOB_MAX_PER_SOURCE", 1))
+JOB_MAX_PER_DESTINATION = int(os.getenv("JOB_MAX_PER_DESTINATION", 1))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1))
+# How often an open /progress/stream checks for new events, and sends a keep-alive when idle
+PROGRESS_STREAM_INTERVAL = float(os.getenv("PROGRESS_STREAM_INTERVAL", 0.5))
+PROGRESS_KEEPALIVE = float(os.getenv("PROGRESS_KEEPALIVE", 15))
+# Intermediate payloads go here (e.g. a tmpfs mount) instead of the job directory
+JOB_SCRATCH_ROOT = os.getenv("JOB_SCRATCH_ROOT") or None
+# Finished job directories are deleted after this many days / beyond this many
+# jobs; failed jobs keep theirs until they are resumed
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", 7))
+JOB_RETENTION_MAX = int(os.getenv("JOB_RETENTION_MAX", 100))
+
+# Opened in lifespan, so importing this module (worker processes, tools)
+# creates nothing on disk
+job_queue = None
+audit_store = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global job_queue, audit_store
+    os.makedirs(JOB_ROOT, exist_ok=True)
+    job_queue = JobQueue(JOB_DB_PATH)
+    audit_store = AuditStore(AUDIT_LOG_PATH)
+    # Keys are created once here so concurrent jobs never race to generate them
+    ensure_keys(PRIVATE_KEY_PATH, PUBLIC_KEY_PATH)
+    ensure_keys(AUDIT_SIGNING_PRIVATE_KEY_PATH, AUDIT_SIGNING_PUBLIC_KEY_PATH)
+    audit_store.import_json(LEGACY_AUDIT_LOG_PATH)
+    requeued = job_queue.requeue_orphaned()
+    if requeued:
+        print(f"Requeued {len(requeued)} interrupted transfer jobs")
+    # spawn, not fork: the server process already runs threads
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=transfer_worker, args=(f"worker-{os.getpid()}-{i}",), daemon=True)
+        for i in range(TRANSFER_WORKERS)
+    ]
+    for worker in workers:
+        worker.start()
+    yield
+    for worker in workers:
+        worker.terminate()
+    for worker in workers:
+        worker.join(timeout=10)
+
+app = FastAPI(title="Secure DB Transfer API", lifespan=lifespan)
+
+# Blocking driver calls from request handlers run on this bounded pool so the
+# event loop (and /progress polling) never waits on a database
+API_DB_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("API_DB_WORKERS", 16)), thread_name_prefix="api-db")
+API_CONNECT_TIMEOUT = int(os.getenv("API_CONNECT_TIMEOUT", 5))
+API_QUERY_TIMEOUT = float(os.getenv("API_QUERY_TIMEOUT", 30))
+API_MAX_ROWS = int(os.getenv("API_MAX_ROWS", 10000))
+API_MAX_BYTES = int(os.getenv("API_MAX_BYTES", 16 * 1024 * 1024))
+API_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", 500))
+# Full audit chain verification reads every entry, so it gets its own limit
+AUDIT_VERIFY_TIMEOUT = float(os.getenv("AUDIT_VERIFY_TIMEOUT", 600))
+AUDIT_VERIFY_WORKERS = int(os.getenv("AUDIT_VERIFY_WORKERS", 4))
+
+async def run_blocking(func, *args, timeout):
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(loop.run_in_executor(API_DB_EXECUTOR, functools.partial(func, *args)), timeout)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -40,208 +136,590 @@ class DBConfig(BaseModel):
     postgres_password: str = "password"
     postgres_database: str = "target_db"
 
+    # Rows fetched per round-trip by the streaming extractors
+    batch_size: int = 1000
+
+    # "files": step-by-step with intermediate files kept for auditing
+    # "streaming": single pass extract -> hash -> encrypt -> load
+    pipeline_mode: str = "files"
+    # Streaming mode only: write encrypted_payload.bundle (1x disk) or hand it
+    # to the loader in-process (no payload written to disk)
+    persist_bundle: bool = True
+
+    # >1 splits the table on partition_key (an integer column) into that many
+    # slices, moved concurrently with one MySQL and one Postgres connection
+    # per worker; at most POOL_MAX_SIZE
+    partitions: int = 1
+    partition_key: str = "id"
+
+    # "csv": SHA-256 of the extracted CSV on both sides
+    # "fingerprint": order-independent per-row fingerprint bucketed by
+    # partition_key, computed server-side-streamed on both databases
+    # (always used for payload_format "arrow", which doesn't hash CSV)
+    integrity_mode: str = "csv"
+    fingerprint_bucket_size: int = 10000
+
+    # Delta sync: only rows past the stored high-water mark of
+    # watermark_column are moved and upserted on partition_key
+    incremental: bool = False
+    watermark_column: str = "id"
+    # How far each run re-reads below the stored watermark to catch late
+    # commits: seconds for timestamp columns, key values for integer ones
+    # (None: WATERMARK_OVERLAP_SECONDS / WATERMARK_OVERLAP_KEYS)
+    watermark_overlap: Optional[int] = None
+    # Reseeding truncates the source; unset, it seeds except in incremental
+    # mode, where a reseed would wipe the rows the watermark points past
+    seed_dummy_data: Optional[bool] = None
+    # Rows seeded into users; large seeds are bulk loaded ("auto" tries
+    # LOAD DATA LOCAL INFILE and falls back to batched INSERTs, or force
+    # "infile" / "insert")
+    seed_row_count: int = 20
+    seed_method: str = "auto"
+
+    # Whole-database transfer: every base table (or just `tables`) is moved,
+    # independent tables concurrently on up to max_workers connections, in
+    # foreign-key order
+    transfer_schema: bool = False
+    tables: Optional[List[str]] = None
+    max_workers: int = 4
+    # Generate destination DDL from MySQL metadata (tables are recreated,
+    # indexes and constraints are built after the bulk load)
+    translate_schema: bool = False
+
+    # Chunked bundles only: "csv" text or "arrow" (typed Arrow IPC record
+    # batches, schema embedded in the bundle; requires pyarrow)
+    payload_format: str = "csv"
+    # Chunked bundles only: compress each chunk before encrypting it with
+    # "none", "gzip", "zstd" or "lz4" (the last two need zstandard / lz4);
+    # compression_level defaults to the codec's own default
+    compression: str = "none"
+    compression_level: Optional[int] = None
+
+    # Checkpointed transfer in chunks of checkpoint_chunk_size rows,
+    # each committed on its own; /resume-transfer continues after the last
+    # committed chunk
+    resumable: bool = False
+    checkpoint_chunk_size: int = 50000
+
+    # Recipient key the session keys are wrapped for: "default" or a named
+    # key under keys/ (generated on first use, rotated via /keys/rotate)
+    recipient_key: str = "default"
+
+    @field_validator("partitions")
+    @classmethod
+    def check_partitions(cls, value):
+        # Every slice holds a pooled connection per side for its whole run
+        if not 1 <= value <= POOL_SETTINGS["max_size"]:
+            raise ValueError(f"partitions must be between 1 and {POOL_SETTINGS['max_size']} (POOL_MAX_SIZE)")
+        return value
+
 class QueryRequest(BaseModel):
     config: DBConfig
     target: str # "source" or "destination"
     query: str
+    # Seconds before the query is abandoned, capped at API_QUERY_TIMEOUT
+    timeout_seconds: Optional[float] = None
+    # Results are capped at API_MAX_ROWS rows / API_MAX_BYTES bytes in every mode.
+    # stream: NDJSON rows read off a server-side cursor as they arrive
+    stream: bool = False
+    # Pagination: page_size rows per response plus a continuation_token for
+    # the next page. Pages need a stable order: page_key (a unique, sortable
+    # column) for keyset paging, or order_by ("col [ASC|DESC], ...", unique
+    # overall) for LIMIT/OFFSET paging
+    page_size: Optional[int] = None
+    continuation_token: Optional[str] = None
+    page_key: Optional[str] = None
+    order_by: Optional[str] = None
 
-transfer_status = {
-    "status": "idle", # idle, running, completed, failed
-    "current_step": "None",
-    "logs": [],
-    "result": None
-}
-
-def run_transfer_pipeline(config: DBConfig):
-    global transfer_status
-    transfer_status["status"] = "running"
-    transfer_status["logs"] = []
-    
+def recipient_key_paths(name: str):
+    # (private, public) key paths for a DBConfig.recipient_key
+    if name == "default":
+        return PRIVATE_KEY_PATH, PUBLIC_KEY_PATH
+    return named_key_paths(KEY_DIR, name)
+
+def run_transfer_pipeline(config: DBConfig, progress: JobProgress, workspace: JobWorkspace):
+    # Job files live in the job's workspace; shared state (keys, watermarks,
+    # audit log) in BASE_DIR
+    # Per-stage timing, CPU, rows, DB round-trips and hot-path throughput
+    metrics = PipelineMetrics()
     try:
         def log_step(step_name):
-            transfer_status["current_step"] = step_name
-            transfer_status["logs"].append(f"{datetime.now().isoformat()}: {step_name}")
+            progress.log_step(step_name)
             print(f"PIPELINE: {step_name}")
 
-        # Step 0: Ensure ECC keys exist
-        if not os.path.exists("private_key.pem"):
-            log_step("Generating ECC keys")
-            generate_ecc_keys("private_key.pem", "public_key.pem")
+        # Step 0: Recipient ECC keys (parsed once per worker and cached; only
+        # generated if the pair doesn't exist yet)
+        private_key_path, public_key_path = recipient_key_paths(config.recipient_key)
+        if ensure_keys(private_key_path, public_key_path):
+            log_step(f"Generated ECC keys for recipient {config.recipient_key}")
+
+        # Stages (and chunks, in resumable mode) completed by an earlier attempt of this job
+        checkpoint = Checkpoint(workspace.path("checkpoint.json"))
 
         # Step 1: Load Dummy Data (Optional, but included in flow)
-        log_step("Loading dummy data into MySQL")
-        if not load_dummy_data(config.mysql_host, config.mysql_port, config.mysql_username, config.mysql_password, config.mysql_database):
-            raise Exception("Failed to load dummy data")
+        seed_dummy_data = not config.incremental if config.seed_dummy_data is None else config.seed_dummy_data
+        if seed_dummy_data and not checkpoint.stage_done("seed"):
+            metrics.begin("seed")
+            log_step(f"Loading {config.seed_row_count} dummy records into MySQL")
+            if not load_dummy_data(config.mysql_host, config.mysql_port, config.mysql_username, config.mysql_password, config.mysql_database,
+                                   config.seed_row_count, config.seed_method):
+                raise Exception("Failed to load dummy data")
+            checkpoint.mark_stage("seed")
+
+        mysql_params = (config.mysql_host, config.mysql_port, config.mysql_username, config.mysql_password, config.mysql_database)
+        postgres_params = (config.postgres_host, config.postgres_port, config.postgres_username, config.postgres_password, config.postgres_database)
+
+        schema_mode = config.transfer_schema or bool(config.tables) or config.translate_schema
+        # Arrow bundles hash the Arrow stream, which has no CSV counterpart on the destination
+        integrity_mode = "fingerprint" if config.payload_format == "arrow" else config.integrity_mode
+        schema_tables = config.tables or (None if config.transfer_schema else ["users"])
+        metrics.begin("load")
+        # Rows extracted from MySQL are reported as they go; the table size
+        # estimate (single-table modes only) gives the dashboard an ETA
+        total_rows = None
+        if not schema_mode and not checkpoint.stage_done("load"):
+            try:
+                total_rows = estimate_row_count(*mysql_params, "users")
+            except Exception as e:
+                print(f"Could not estimate row count: {e}")
+        progress.start_counting(total_rows)
 
-        # Step 2: Extract and Encrypt from MySQL
-        log_step("Extracting and encrypting data from MySQL")
-        if not extract_and_encrypt(config.mysql_host, config.mysql_port, config.mysql_username, config.mysql_password, config.mysql_database, "users", "pre_transfer.csv.enc", "pre_transfer.hash", "session.key"):
-            raise Exception("Failed to extract and encrypt from MySQL")
+        if checkpoint.stage_done("load"):
+            log_step("Data already loaded by an earlier attempt; resuming at verification")
+        elif schema_mode:
+            # Steps 2-4 for every table, scheduled by foreign-key dependencies
+            log_step("Transferring schema tables from MySQL into Postgres in dependency order")
+            if not schema_transfer(mysql_params, postgres_params, public_key_path, private_key_path, workspace.path("pre_transfer.hash"), workspace.path("pre_transfer.tables.json"), tables=schema_tables, batch_size=config.batch_size, max_workers=config.max_workers, translate=config.translate_schema, payload_format=config.payload_format, compression=config.compression, compression_level=config.compression_level, on_batch=progress.advance):
+                raise Exception("Failed schema transfer to Postgres")
+        elif config.incremental:
+            # Steps 2-4 for the rows past the last watermark only
+            log_step(f"Transferring rows past the {config.watermark_column} watermark from MySQL into Postgres")
+            bundle_path = workspace.scratch("encrypted_payload.bundle") if config.persist_bundle else None
+            if not incremental_transfer(mysql_params, postgres_params, "users", config.watermark_column, config.partition_key, public_key_path, private_key_path, workspace.path("pre_transfer.hash"), WATERMARK_PATH, bundle_path=bundle_path, batch_size=config.batch_size, payload_format=config.payload_format, compression=config.compression, compression_level=config.compression_level, on_batch=progress.advance, overlap=config.watermark_overlap):
+                raise Exception("Failed incremental transfer to Postgres")
+        elif config.resumable:
+            # Steps 2-4 chunk by chunk, each chunk committed and checkpointed
+            log_step(f"Transferring in checkpointed chunks of {config.checkpoint_chunk_size} rows from MySQL into Postgres")
+            bundle_dir = workspace.scratch_dir if config.persist_bundle else None
+            if not resumable_transfer(mysql_params, postgres_params, "users", config.partition_key, config.checkpoint_chunk_size, public_key_path, private_key_path, workspace.path("pre_transfer.hash"), workspace.path("pre_transfer.partitions.json"), checkpoint, bundle_dir=bundle_dir, batch_size=config.batch_size, max_workers=config.max_workers, payload_format=config.payload_format, compression=config.compression, compression_level=config.compression_level, on_batch=progress.advance):
+                raise Exception("Failed resumable transfer to Postgres")
+        elif config.partitions > 1:
+            # Steps 2-4 per key-range slice, concurrently
+            log_step(f"Transferring {config.partitions} partitions in parallel from MySQL into Postgres")
+            if not partitioned_transfer(mysql_params, postgres_params, "users", config.partition_key, config.partitions, public_key_path, private_key_path, workspace.path("pre_transfer.hash"), workspace.path("pre_transfer.partitions.json"), bundle_dir=workspace.scratch_dir, batch_size=config.batch_size, payload_format=config.payload_format, compression=config.compression, compression_level=config.compression_level, on_batch=progress.advance):
+                raise Exception("Failed partitioned transfer to Postgres")
+        elif config.pipeline_mode == "streaming":
+            # Steps 2-4 in a single pass, no intermediate CSV or .enc files
+            log_step("Streaming extract, hash, encrypt and load from MySQL into Postgres")
+            bundle_path = workspace.scratch("encrypted_payload.bundle") if config.persist_bundle else None
+            if not stream_transfer(mysql_params, postgres_params, "users", public_key_path, private_key_path, workspace.path("pre_transfer.hash"), bundle_path=bundle_path, batch_size=config.batch_size, payload_format=config.payload_format, compression=config.compression, compression_level=config.compression_level, on_batch=progress.advance):
+                raise Exception("Failed streaming transfer to Postgres")
+        else:
+            # Step 2: Extract and Encrypt from MySQL
+            log_step("Extracting and encrypting data from MySQL")
+            if not extract_and_encrypt(*mysql_params, "users", workspace.scratch("pre_transfer.csv.enc"), workspace.path("pre_transfer.hash"), workspace.scratch("session.key"), batch_size=config.batch_size, compression=config.compression, compression_level=config.compression_level, on_batch=progress.advance):
+                raise Exception("Failed to extract and encrypt from MySQL")
 
-        # Step 3: ECC Hybrid Encryption
-        log_step("Performing ECC hybrid encryption on payload")
-        if not ecc_encrypt_session_key("public_key.pem", "session.key", "pre_transfer.csv.enc", "encrypted_payload.bundle"):
-            raise Exception("Failed ECC hybrid encryption")
+            # Step 3: ECC Hybrid Encryption
+            log_step("Performing ECC hybrid encryption on payload")
+            if not ecc_encrypt_session_key(public_key_path, workspace.scratch("session.key"), workspace.scratch("pre_transfer.csv.enc"), workspace.scratch("encrypted_payload.bundle")):
+                raise Exception("Failed ECC hybrid encryption")
 
-        # Step 4: Transfer and Load into Postgres
-        log_step("Decrypting (ECC) and loading data into Postgres")
-        if not ecc_decrypt_and_load("private_key.pem", "encrypted_payload.bundle", config.postgres_host, config.postgres_port, config.postgres_username, config.postgres_password, config.postgres_database, "users"):
-            raise Exception("Failed to transfer to Postgres")
+            # Step 4: Transfer and Load into Postgres
+            log_step("Decrypting (ECC) and loading data into Postgres")
+            if not ecc_decrypt_and_load(private_key_path, workspace.scratch("encrypted_payload.bundle"), *postgres_params, "users"):
+                raise Exception("Failed to transfer to Postgres")
+        if checkpoint.stage_done("load"):
+            record_count = checkpoint.stage_info("load").get("record_count")
+        else:
+            # Rows extracted from MySQL; a resumed chunked load includes chunks committed earlier
+            record_count = checkpoint.transfer_rows() if config.resumable else progress.rows
+            checkpoint.mark_stage("load", record_count=record_count)
 
         # Step 5: Extract from Postgres for Verification
-        log_step("Extracting data from Postgres for integrity verification")
-        if not extract_and_encrypt_postgres(config.postgres_host, config.postgres_port, config.postgres_username, config.postgres_password, config.postgres_database, "users", "post_transfer.csv.enc", "post_transfer.hash", "post_session.key"):
-            raise Exception("Failed to extract from Postgres")
+        metrics.begin("verify")
+        if schema_mode:
+            log_step("Extracting schema tables from Postgres for integrity verification")
+            if not schema_verify_postgres(postgres_params, workspace.path("pre_transfer.tables.json"), workspace.path("post_transfer.hash"), workspace.path("post_transfer.tables.json"), batch_size=config.batch_size, max_workers=config.max_workers):
+                raise Exception("Failed to extract from Postgres")
+        elif integrity_mode == "fingerprint":
+            log_step("Fingerprinting source and destination tables for integrity verification")
+            workers = max(1, config.partitions)
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                pre_fp = pool.submit(fingerprint_table, "mysql", mysql_params, "users", config.partition_key, workspace.path("pre_transfer.hash"), workspace.path("pre_transfer.fingerprint.json"), config.fingerprint_bucket_size, config.batch_size, workers)
+                post_fp = pool.submit(fingerprint_table, "postgres", postgres_params, "users", config.partition_key, workspace.path("post_transfer.hash"), workspace.path("post_transfer.fingerprint.json"), config.fingerprint_bucket_size, config.batch_size, workers)
+                if not (pre_fp.result() and post_fp.result()):
+                    raise Exception("Failed to fingerprint source or destination table")
+        elif config.incremental:
+            log_step("Extracting transferred window from Postgres for integrity verification")
+            watermark = load_watermark(WATERMARK_PATH, config.mysql_host, config.mysql_port, config.mysql_database, "users")
+            if not verify_incremental_postgres(*postgres_params, "users", config.partition_key, watermark, workspace.path("post_transfer.hash"), batch_size=config.batch_size):
+                raise Exception("Failed to extract from Postgres")
+        elif config.partitions > 1 or config.resumable:
+            log_step("Extracting data from Postgres for integrity verification")
+            if not partitioned_verify_postgres(postgres_params, "users", config.partition_key, workspace.path("pre_transfer.partitions.json"), workspace.path("post_transfer.hash"), workspace.path("post_transfer.partitions.json"), batch_size=config.batch_size):
+                raise Exception("Failed to extract from Postgres")
+        else:
+            log_step("Extracting data from Postgres for integrity verification")
+            if not extract_and_encrypt_postgres(*postgres_params, "users", workspace.scratch("post_transfer.csv.enc"), workspace.path("post_transfer.hash"), workspace.scratch("post_session.key"), batch_size=config.batch_size):
+                raise Exception("Failed to extract from Postgres")
 
         # Step 6: Compare Hashes
+        metrics.begin("compare")
         log_step("Comparing integrity hashes")
-        hashes_match = compare_hashes("pre_transfer.hash", "post_transfer.hash")
+        mismatched_ranges = []
+        # Schema transfers fingerprint per table and compare the combined hash
+        if integrity_mode == "fingerprint" and not schema_mode:
+            fingerprint_report = compare_fingerprints(workspace.path("pre_transfer.fingerprint.json"), workspace.path("post_transfer.fingerprint.json"))
+            hashes_match = fingerprint_report["match"]
+            mismatched_ranges = fingerprint_report["mismatched_ranges"]
+        else:
+            hashes_match = compare_hashes(workspace.path("pre_transfer.hash"), workspace.path("post_transfer.hash"))
         final_status = "PASS" if hashes_match else "FAIL"
 
         # Step 7: Audit Log
+        metrics.begin("audit")
         log_step("Writing immutable audit log")
-        with open("pre_transfer.hash", "r") as f: pre_h = f.read().strip()
-        with open("post_transfer.hash", "r") as f: post_h = f.read().strip()
+        with open(workspace.path("pre_transfer.hash"), "r") as f: pre_h = f.read().strip()
+        with open(workspace.path("post_transfer.hash"), "r") as f: post_h = f.read().strip()
         
         audit_data = {
             "username": config.mysql_username,
             "source_database": config.mysql_database,
             "destination_database": config.postgres_database,
-            "record_count": 20, # Updated to 20 rows as requested
+            "record_count": record_count,
             "hash_before": pre_h,
             "hash_after": post_h,
-            "transfer_status": final_status
+            "transfer_status": final_status,
+            "recipient_key": config.recipient_key,
+            "recipient_key_fingerprint": key_fingerprint(load_public_key(public_key_path)),
+            # Stages up to and including the hash comparison
+            "metrics": metrics.summary()
         }
-        log_transfer("audit_log.json", audit_data)
+        if schema_mode:
+            with open(workspace.path("pre_transfer.tables.json"), "r") as f:
+                audit_data["tables"] = sorted(json.load(f)["tables"])
+        if config.incremental:
+            watermark = load_watermark(WATERMARK_PATH, config.mysql_host, config.mysql_port, config.mysql_database, "users")
+            audit_data["watermark"] = {
+                "column": watermark["column"],
+                "from": watermark["previous_value"],
+                "to": watermark["value"]
+            }
+        if mismatched_ranges:
+            audit_data["mismatched_ranges"] = [m["range"] for m in mismatched_ranges]
+        if checkpoint.stage_done("audit"):
+            # Never append a second entry for the same job
+            entry_hash = checkpoint.stage_info("audit")["entry_hash"]
+        else:
+            entry_hash = log_transfer(AUDIT_LOG_PATH, audit_data)
+            if not entry_hash:
+                # A transfer without its audit entry must not report success
+                raise Exception("Failed to write the audit log entry")
+            checkpoint.mark_stage("audit", entry_hash=entry_hash)
 
         # Step 8: Generate PDF
+        metrics.begin("report")
         log_step("Generating PDF audit report")
-        generate_pdf("audit_log.json", "secure_transfer_report.pdf")
+        generate_pdf(AUDIT_LOG_PATH, workspace.path("secure_transfer_report.pdf"), entry_hash=entry_hash)
 
-        transfer_status["status"] = "completed"
-        transfer_status["result"] = {
+        metrics.finish()
+        progress.record_metrics(metrics.summary(), record_count or 0)
+        log_step("Transfer Pipeline Completed Successfully")
+        progress.complete({
             "success": hashes_match,
             "hash_before": pre_h,
             "hash_after": post_h,
+            "mismatched_ranges": mismatched_ranges,
+            "record_count": record_count,
+            "metrics": metrics.summary(),
             "timestamp": datetime.now().isoformat()
-        }
-        log_step("Transfer Pipeline Completed Successfully")
+        })
 
     except Exception as e:
-        transfer_status["status"] = "failed"
-        transfer_status["logs"].append(f"ERROR: {str(e)}")
+        progress.log(f"ERROR: {str(e)}")
         log_step(f"Transfer Pipeline Failed: {str(e)}")
+        metrics.finish()
+        progress.record_metrics(metrics.summary())
+        progress.fail(str(e))
+
+def transfer_worker(worker_name: str):
+    # Worker process: claims queued jobs and runs each in its own workspace.
+    # Nothing a single job raises may end the loop: the job is marked failed
+    # (not left 'running' forever) and the worker moves on to the next one.
+    queue = JobQueue(JOB_DB_PATH)
+    while True:
+        try:
+            claimed = queue.claim(worker_name, JOB_MAX_PER_SOURCE, JOB_MAX_PER_DESTINATION)
+            if claimed is None:
+                # Jobs of workers that died mid-run (killed, out of memory)
+                # go back in the queue without waiting for a server restart
+                queue.requeue_orphaned()
+        except Exception as e:
+            print(f"{worker_name}: job queue unavailable: {e}")
+            claimed = None
+        if claimed is None:
+            time.sleep(JOB_POLL_INTERVAL)
+            continue
+        job_id, config = claimed
+        try:
+            workspace = JobWorkspace(job_id, JOB_ROOT, JOB_SCRATCH_ROOT)
+            try:
+                run_transfer_pipeline(DBConfig(**config), JobProgress(queue, job_id), workspace)
+            finally:
+                # Scratch holds plaintext session keys and payloads: never kept
+                workspace.cleanup_scratch()
+        except Exception as e:
+            print(f"{worker_name}: job {job_id} failed outside the pipeline: {e}")
+            try:
+                queue.fail_running(job_id, str(e))
+            except Exception as e:
+                print(f"{worker_name}: could not mark job {job_id} failed: {e}")
+        try:
+            apply_retention(JOB_ROOT, JOB_RETENTION_DAYS, JOB_RETENTION_MAX, active=queue.running_ids(), resumable=queue.resumable_ids())
+        except Exception as e:
+            print(f"{worker_name}: job retention failed: {e}")
+
+def config_keys(config: DBConfig):
+    # Concurrency limits are per source and per destination database
+    return (f"mysql://{config.mysql_host}:{config.mysql_port}/{config.mysql_database}",
+            f"postgres://{config.postgres_host}:{config.postgres_port}/{config.postgres_database}")
+
 
 @app.post("/start-transfer")
-async def start_transfer(config: DBConfig, background_tasks: BackgroundTasks):
-    if transfer_status["status"] == "running":
-        raise HTTPException(status_code=400, detail="Transfer already in progress")
-    
-    background_tasks.add_task(run_transfer_pipeline, config)
-    return {"message": "Transfer started"}
+async def start_transfer(config: DBConfig):
+    source_key, destination_key = config_keys(config)
+    job_id = await run_blocking(job_queue.enqueue, config.model_dump(), source_key, destination_key, timeout=API_QUERY_TIMEOUT)
+    return {"message": "Transfer queued", "job_id": job_id}
+
+async def get_job_or_404(job_id: Optional[str]):
+    # No job_id means the most recently submitted job
+    job = await run_blocking(job_queue.get, job_id, timeout=API_QUERY_TIMEOUT)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/resume-transfer")
+async def resume_transfer(job_id: str):
+    # Requeues a failed job; its worker picks up from the job's checkpoint
+    if not await run_blocking(job_queue.requeue_failed, job_id, timeout=API_QUERY_TIMEOUT):
+        await get_job_or_404(job_id)
+        raise HTTPException(status_code=400, detail="Only failed transfers can be resumed")
+    return {"message": "Transfer resumed", "job_id": job_id}
+
+@app.get("/jobs")
+async def list_jobs(status: Optional[str] = None, limit: int = 50):
+    return await run_blocking(job_queue.list, status, min(limit, 500), timeout=API_QUERY_TIMEOUT)
 
 @app.get("/progress")
-async def get_progress():
-    return transfer_status
+async def get_progress(job_id: Optional[str] = None, since: int = 0):
+    # With since=<cursor from the previous response>, logs holds only new lines
+    job = await run_blocking(job_queue.get, job_id, True, since, timeout=API_QUERY_TIMEOUT)
+    if job is not None:
+        return job
+    if job_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"status": "idle", "current_step": "None", "progress": None, "logs": [], "result": None, "cursor": 0}
+
+def sse_event(event, data, event_id=None):
+    lines = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{lines}event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+async def stream_job_events(job_id: str, since: int):
+    # Server-Sent Events: every job_logs row as a "log", "step" or "progress"
+    # event with its id, so EventSource reconnects resume via Last-Event-ID;
+    # "status" when the job changes state; "done" with the final job, then EOF
+    status = None
+    idle_since = time.monotonic()
+    while True:
+        events = await run_blocking(job_queue.events, job_id, since, timeout=API_QUERY_TIMEOUT)
+        for event in events:
+            yield sse_event(event["kind"], event, event["id"])
+            since = event["id"]
+        job = await run_blocking(job_queue.get, job_id, False, timeout=API_QUERY_TIMEOUT)
+        if job["status"] != status:
+            status = job["status"]
+            yield sse_event("status", {"status": status, "current_step": job["current_step"]})
+        if events:
+            idle_since = time.monotonic()
+            continue
+        if status in ("completed", "failed"):
+            yield sse_event("done", job)
+            return
+        if time.monotonic() - idle_since >= PROGRESS_KEEPALIVE:
+            # Comment line; keeps proxies from closing an idle connection
+            yield b": keep-alive\n\n"
+            idle_since = time.monotonic()
+        await asyncio.sleep(PROGRESS_STREAM_INTERVAL)
+
+@app.get("/progress/stream")
+async def progress_stream(request: Request, job_id: Optional[str] = None, since: int = 0):
+    job = await get_job_or_404(job_id)
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        since = max(since, int(last_event_id))
+    return StreamingResponse(stream_job_events(job["job_id"], since), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.get("/result")
-async def get_result():
-    if transfer_status["status"] != "completed":
+async def get_result(job_id: Optional[str] = None):
+    job = await get_job_or_404(job_id)
+    if job["status"] != "completed":
         raise HTTPException(status_code=400, detail="Transfer not completed yet")
-    return transfer_status["result"]
+    return job["result"]
+
+@app.get("/pool-metrics")
+async def get_pool_metrics():
+    return pool_metrics()
+
+def collect_metrics():
+    return render_prometheus(job_queue.metric_totals(), job_queue.status_counts(), pool_metrics())
+
+@app.get("/metrics")
+async def get_metrics():
+    # Prometheus text exposition: totals over all finished jobs, plus this process's pools
+    body = await run_blocking(collect_metrics, timeout=API_QUERY_TIMEOUT)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
 
 @app.get("/audit-logs")
-async def get_audit_logs():
-    if os.path.exists("audit_log.json"):
-        with open("audit_log.json", "r") as f:
-            return json.load(f)
-    return []
+async def get_audit_logs(limit: int = 50, before: Optional[int] = None, since: Optional[str] = None, until: Optional[str] = None,
+                         database: Optional[str] = None, status: Optional[str] = None):
+    # Newest first; pass the last entry's seq as before= for the next page
+    limit = max(1, min(limit, 500))
+    return await run_blocking(audit_store.list, limit, before, since, until, database, status, timeout=API_QUERY_TIMEOUT)
+
+@app.get("/verify-audit-log")
+async def verify_audit_log(full: bool = False):
+    # Read-only. Incremental by default: only entries after the last signed checkpoint
+    timeout = AUDIT_VERIFY_TIMEOUT if full else API_QUERY_TIMEOUT
+    return await run_blocking(verify_chain, AUDIT_LOG_PATH, AUDIT_SIGNING_PUBLIC_KEY_PATH, None, full, AUDIT_VERIFY_WORKERS, timeout=timeout)
+
+@app.post("/audit-log/checkpoints")
+async def checkpoint_audit_log():
+    # Verifies the tail after the last checkpoint and signs new checkpoints on it
+    return await run_blocking(verify_chain, AUDIT_LOG_PATH, AUDIT_SIGNING_PUBLIC_KEY_PATH, AUDIT_SIGNING_PRIVATE_KEY_PATH, False, AUDIT_VERIFY_WORKERS, timeout=AUDIT_VERIFY_TIMEOUT)
+
+@app.get("/keys")
+async def list_keys():
+    names = ["default"]
+    if os.path.isdir(KEY_DIR):
+        names += sorted(n for n in os.listdir(KEY_DIR) if KEY_NAME_PATTERN.match(n) and n != "default" and os.path.isdir(os.path.join(KEY_DIR, n)))
+    keys = []
+    for name in names:
+        try:
+            keys.append({"name": name, **key_info(*recipient_key_paths(name))})
+        except FileNotFoundError:
+            continue
+    return keys
+
+@app.post("/keys/rotate")
+async def rotate_key(name: str = "default"):
+    # New transfers use the new pair at once; bundles and audit checkpoints
+    # made with the old one stay readable through retired_keys/
+    try:
+        private_key_path, public_key_path = recipient_key_paths(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    fingerprint = await run_blocking(rotate_keys, private_key_path, public_key_path, timeout=API_QUERY_TIMEOUT)
+    return {"name": name, "fingerprint": fingerprint}
 
 @app.get("/download-report")
-async def download_report():
-    if os.path.exists("secure_transfer_report.pdf"):
-        return FileResponse("secure_transfer_report.pdf", media_type="application/pdf", filename="secure_transfer_report.pdf")
+async def download_report(job_id: Optional[str] = None):
+    job = await get_job_or_404(job_id)
+    report_path = os.path.join(JOB_ROOT, job["job_id"], "secure_transfer_report.pdf")
+    if os.path.exists(report_path):
+        return FileResponse(report_path, media_type="application/pdf", filename="secure_transfer_report.pdf")
     raise HTTPException(status_code=404, detail="Report not found")
 
+def check_mysql_connection(config: DBConfig):
+    conn = connect_mysql(
+        host=config.mysql_host,
+        port=config.mysql_port,
+        user=config.mysql_username,
+        password=config.mysql_password,
+        database=config.mysql_database,
+        connect_timeout=API_CONNECT_TIMEOUT,
+        validate=True
+    )
+    conn.close()
+
+def check_postgres_connection(config: DBConfig):
+    conn = connect_postgres(
+        host=config.postgres_host,
+        port=config.postgres_port,
+        user=config.postgres_username,
+        password=config.postgres_password,
+        database=config.postgres_database,
+        connect_timeout=API_CONNECT_TIMEOUT,
+        validate=True
+    )
+    conn.close()
+
 @app.post("/test-connection")
 async def test_connection(config: DBConfig):
     results = {"mysql": "failed", "postgres": "failed", "messages": []}
-    
-    # Test MySQL
-    try:
-        m_conn = mysql.connector.connect(
-            host=config.mysql_host,
-            port=config.mysql_port,
-            user=config.mysql_username,
-            password=config.mysql_password,
-            database=config.mysql_database,
-            connect_timeout=5
-        )
-        m_conn.close()
-        results["mysql"] = "success"
-    except Exception as e:
-        results["messages"].append(f"MySQL Error: {str(e)}")
 
-    # Test Postgres
-    try:
-        p_conn = psycopg2.connect(
-            host=config.postgres_host,
-            port=config.postgres_port,
-            user=config.postgres_username,
-            password=config.postgres_password,
-            database=config.postgres_database,
-            connect_timeout=5
-        )
-        p_conn.close()
-        results["postgres"] = "success"
-    except Exception as e:
-        results["messages"].append(f"Postgres Error: {str(e)}")
+    # Both databases are checked at the same time on the DB executor
+    checks = await asyncio.gather(
+        run_blocking(check_mysql_connection, config, timeout=API_CONNECT_TIMEOUT + 1),
+        run_blocking(check_postgres_connection, config, timeout=API_CONNECT_TIMEOUT + 1),
+        return_exceptions=True
+    )
+    for name, label, outcome in zip(("mysql", "postgres"), ("MySQL", "Postgres"), checks):
+        if isinstance(outcome, asyncio.TimeoutError):
+            results["messages"].append(f"{label} Error: timed out after {API_CONNECT_TIMEOUT}s")
+        elif isinstance(outcome, Exception):
+            results["messages"].append(f"{label} Error: {str(outcome)}")
+        else:
+            results[name] = "success"
     if results["mysql"] == "success" and results["postgres"] == "success":
         return {"status": "success", "message": "All connections verified successfully."}
     else:
         return {"status": "error", "message": " | ".join(results["messages"])}
 
+def console_params(request: QueryRequest):
+    config = request.config
+    if request.target == "source":
+        return (config.mysql_host, config.mysql_port, config.mysql_username, config.mysql_password, config.mysql_database)
+    return (config.postgres_host, config.postgres_port, config.postgres_username, config.postgres_password, config.postgres_database)
+
+async def stream_console_rows(stream: ConsoleStream, timeout: float):
+    # Each batch is fetched on the DB executor; a client that disconnects
+    # closes the generator, which releases the cursor and connection
+    completed = False
+    try:
+        while True:
+            chunk = await run_blocking(stream.next_chunk, timeout=timeout)
+            if chunk is None:
+                completed = True
+                return
+            yield chunk
+    finally:
+        if not completed:
+            await run_blocking(stream.close, True, timeout=timeout)
+
 @app.post("/execute-query")
 async def execute_sql_query(request: QueryRequest):
+    timeout = min(request.timeout_seconds or API_QUERY_TIMEOUT, API_QUERY_TIMEOUT)
+    timeout_ms = int(timeout * 1000)
+    params = console_params(request)
     try:
-        config = request.config
-        if request.target == "source":
-            # MySQL
-            conn = mysql.connector.connect(
-                host=config.mysql_host,
-                port=config.mysql_port,
-                user=config.mysql_username,
-                password=config.mysql_password,
-                database=config.mysql_database
-            )
-        else:
-            # Postgres
-            conn = psycopg2.connect(
-                host=config.postgres_host,
-                port=config.postgres_port,
-                user=config.postgres_username,
-                password=config.postgres_password,
-                database=config.postgres_database
-            )
-        
-        cursor = conn.cursor()
-        cursor.execute(request.query)
-        
-        if cursor.description:
-            columns = [i[0] for i in cursor.description]
-            rows = cursor.fetchall()
-            results = [dict(zip(columns, row)) for row in rows]
-            # Convert datetime objects to string for JSON serialization
-            for res in results:
-                for k, v in res.items():
-                    if isinstance(v, datetime):
-                        res[k] = v.isoformat()
-        else:
-            conn.commit()
-            results = {"message": "Query executed successfully."}
-            
-        cursor.close()
-        conn.close()
-        return results
+        # Small grace period so the server-side timeout normally fires first
+        if request.stream:
+            stream = ConsoleStream(request.target, params, request.query, timeout_ms, API_MAX_ROWS, API_MAX_BYTES)
+            await run_blocking(stream.open, timeout=timeout + 2)
+            return StreamingResponse(stream_console_rows(stream, timeout + 2), media_type="application/x-ndjson")
+        if request.page_size or request.continuation_token:
+            page_size = min(request.page_size or API_PAGE_SIZE, API_MAX_ROWS)
+            body = await run_blocking(run_console_page, request.target, params, request.query, timeout_ms,
+                                      page_size, request.continuation_token, request.page_key, API_MAX_BYTES,
+                                      request.order_by, timeout=timeout + 2)
+            return Response(content=body, media_type="application/json")
+        body, truncated = await run_blocking(run_console_query, request.target, params, request.query, timeout_ms,
+                                             API_MAX_ROWS, API_MAX_BYTES, timeout=timeout + 2)
+        return Response(content=body, media_type="application/json",
+                        headers={"X-Result-Truncated": "true"} if truncated else None)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Query timed out after {timeout}s")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
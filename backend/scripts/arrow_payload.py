@@ -0,0 +1,161 @@
+from backend.scripts.pipeline_metrics import timed
+from backend.scripts.csv_codec import encode_csv_field
+from backend.scripts.stream_cipher import ChunkIteratorReader
+from mysql.connector.constants import FieldFlag, FieldType
+from decimal import Decimal
+import io
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+# Optional columnar payload: rows are shipped as Arrow IPC record batches
+# (one per fetchmany batch) instead of CSV text. The Arrow stream starts with
+# its schema, and the same schema is recorded in the chunked container's
+# metadata, so the bundle is self-describing. Decimals travel as strings to
+# stay exact; everything else keeps a native Arrow type.
+#
+# Rows are never rendered as CSV in Python: the source hashes the Arrow IPC
+# bytes it ships (so arrow transfers are verified with table fingerprints,
+# not the CSV hash), and the loader has pyarrow's CSV writer produce the COPY
+# input. Only binary and TIME columns, which that writer can't render the
+# way Postgres reads them, are converted value by value.
+
+_INTEGER_TYPES = {FieldType.TINY, FieldType.SHORT, FieldType.LONG, FieldType.LONGLONG, FieldType.INT24, FieldType.YEAR, FieldType.BIT}
+_FLOAT_TYPES = {FieldType.FLOAT, FieldType.DOUBLE}
+_DECIMAL_TYPES = {FieldType.DECIMAL, FieldType.NEWDECIMAL}
+_DATE_TYPES = {FieldType.DATE, FieldType.NEWDATE}
+_DATETIME_TYPES = {FieldType.DATETIME, FieldType.TIMESTAMP}
+_BYTES_TYPES = {FieldType.TINY_BLOB, FieldType.MEDIUM_BLOB, FieldType.LONG_BLOB, FieldType.BLOB, FieldType.VAR_STRING, FieldType.STRING}
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("The arrow payload format requires pyarrow (pip install pyarrow)")
+
+def _mysql_arrow_type(type_code, flags):
+    if type_code in _INTEGER_TYPES:
+        if type_code == FieldType.LONGLONG and flags & FieldFlag.UNSIGNED:
+            return pa.uint64()
+        return pa.int64()
+    if type_code in _FLOAT_TYPES:
+        return pa.float64()
+    if type_code in _DATE_TYPES:
+        return pa.date32()
+    if type_code in _DATETIME_TYPES:
+        return pa.timestamp("us")
+    if type_code == FieldType.TIME:
+        return pa.duration("us")
+    if type_code in _BYTES_TYPES and flags & FieldFlag.BINARY:
+        return pa.binary()
+    # Decimals, text, JSON, ENUM/SET and anything unknown
+    return pa.string()
+
+def mysql_arrow_schema(description):
+    _require_pyarrow()
+    # mysql-connector description: (name, type_code, ..., null_ok, flags, ...)
+    return pa.schema([
+        pa.field(column[0], _mysql_arrow_type(column[1], column[7] if len(column) > 7 else 0))
+        for column in description
+    ])
+
+def describe_schema(schema):
+    return [{"name": field.name, "type": str(field.type)} for field in schema]
+
+def _to_text(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (set, frozenset)):
+        # mysql-connector returns SET columns as Python sets
+        return ",".join(sorted(value))
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).decode("utf-8")
+    if isinstance(value, Decimal):
+        return str(value)
+    return str(value)
+
+def _string_array(values):
+    # Text columns are nearly always str already; only Decimals, sets and
+    # the odd bytes value need converting
+    try:
+        return pa.array(values, type=pa.string())
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        return pa.array([_to_text(v) for v in values], type=pa.string())
+
+def _record_batch(rows, schema):
+    columns = list(zip(*rows))
+    arrays = []
+    for field, values in zip(schema, columns):
+        if pa.types.is_string(field.type):
+            arrays.append(_string_array(values))
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.record_batch(arrays, schema=schema)
+
+class _WriterSink:
+    # Lets pyarrow write the IPC stream straight into the chunked encryptor,
+    # hashing the bytes on the way
+    def __init__(self, out, hasher=None):
+        self.out = out
+        self.hasher = hasher
+        self.bytes_written = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        if self.hasher is not None:
+            with timed("hash", len(data)):
+                self.hasher.update(data)
+        self.bytes_written += len(data)
+        return self.out.write(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+def write_arrow_stream(cursor, schema, out, hasher=None, batch_size=1000, on_batch=None):
+    # hasher sees the Arrow IPC stream exactly as it goes into the bundle
+    _require_pyarrow()
+    sink = _WriterSink(out, hasher)
+    writer = pa.ipc.new_stream(sink, schema)
+    rows_written = 0
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        before = sink.bytes_written
+        writer.write_batch(_record_batch(rows, schema))
+        rows_written += len(rows)
+        if on_batch:
+            on_batch(len(rows), sink.bytes_written - before)
+    writer.close()
+    return rows_written
+
+def _copy_ready(batch):
+    # pyarrow's CSV writer rejects binary and writes durations as integers
+    arrays = []
+    for field, column in zip(batch.schema, batch.columns):
+        if pa.types.is_binary(field.type) or pa.types.is_duration(field.type):
+            column = pa.array([encode_csv_field(v) if v is not None else None for v in column.to_pylist()], type=pa.string())
+        arrays.append(column)
+    return pa.record_batch(arrays, names=batch.schema.names)
+
+def open_arrow_csv_stream(in_f):
+    # Returns (column names, file-like CSV rows without header) for COPY
+    _require_pyarrow()
+    stream = pa.ipc.open_stream(in_f)
+    # Strings are always quoted, so "" is an empty string and an unquoted
+    # empty field is NULL, as COPY (FORMAT csv) reads them
+    options = pa.csv.WriteOptions(include_header=False, quoting_style="needed")
+
+    def iter_csv():
+        for batch in stream:
+            out = io.BytesIO()
+            pa.csv.write_csv(_copy_ready(batch), out, options)
+            yield out.getvalue()
+
+    return stream.schema.names, ChunkIteratorReader(iter_csv())
@@ -1,39 +1,176 @@
 import json
 import hashlib
+import sqlite3
 import os
 from datetime import datetime
 
+# Append-only, hash-chained audit store in SQLite. Each append is one small
+# transaction: BEGIN IMMEDIATE takes the database write lock, so concurrent
+# jobs in different processes never fork the chain or lose an entry, and
+# synchronous=FULL fsyncs the commit. The chain tip lives in a one-row table
+# updated in the same transaction, so an append never reads earlier entries.
+# Filtered columns are copied out of the entry and indexed for reads.
+#
+# Entry hashes are computed exactly as before over
+# {timestamp, previous_hash, data}, so chains migrated from the old
+# audit_log.json keep verifying.
+
+GENESIS_HASH = "0" * 64
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS audit_entries (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    previous_hash TEXT NOT NULL,
+    current_hash TEXT UNIQUE NOT NULL,
+    data TEXT NOT NULL,
+    source_database TEXT,
+    destination_database TEXT,
+    transfer_status TEXT
+);
+CREATE INDEX IF NOT EXISTS audit_timestamp ON audit_entries (timestamp);
+CREATE INDEX IF NOT EXISTS audit_source ON audit_entries (source_database, seq);
+CREATE INDEX IF NOT EXISTS audit_destination ON audit_entries (destination_database, seq);
+CREATE INDEX IF NOT EXISTS audit_status ON audit_entries (transfer_status, seq);
+CREATE TABLE IF NOT EXISTS audit_tip (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    seq INTEGER NOT NULL,
+    current_hash TEXT NOT NULL
+);
+"""
+
 def calculate_entry_hash(entry):
     # Sort keys for deterministic hashing
     entry_str = json.dumps(entry, sort_keys=True)
     return hashlib.sha256(entry_str.encode('utf-8')).hexdigest()
 
-def log_transfer(audit_file, log_data):
-    try:
-        if os.path.exists(audit_file):
-            with open(audit_file, "r") as f:
-                logs = json.load(f)
-        else:
-            logs = []
-            
-        previous_hash = "0" * 64 # Genesis hash
-        if logs:
-            previous_hash = logs[-1]["current_hash"]
-            
-        new_entry = {
-            "timestamp": datetime.now().isoformat(),
+
+class AuditStore:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        conn.close()
+
+    def _connect(self):
+        # Autocommit mode; appends use explicit BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    def _insert(self, conn, entry):
+        data = entry["data"]
+        seq = conn.execute(
+            "INSERT INTO audit_entries (timestamp, previous_hash, current_hash, data, source_database, destination_database, transfer_status) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (entry["timestamp"], entry["previous_hash"], entry["current_hash"], json.dumps(data),
+             data.get("source_database"), data.get("destination_database"), data.get("transfer_status"))
+        ).lastrowid
+        conn.execute(
+            "INSERT INTO audit_tip (id, seq, current_hash) VALUES (1, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET seq = excluded.seq, current_hash = excluded.current_hash",
+            (seq, entry["current_hash"])
+        )
+        return seq
+
+    def append(self, log_data):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            tip = conn.execute("SELECT current_hash FROM audit_tip WHERE id = 1").fetchone()
+            new_entry = {
+                "timestamp": datetime.now().isoformat(),
+                "previous_hash": tip[0] if tip else GENESIS_HASH,
+                "data": log_data
+            }
+            new_entry["current_hash"] = calculate_entry_hash(new_entry)
+            new_entry["seq"] = self._insert(conn, new_entry)
+            conn.execute("COMMIT")
+            return new_entry
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def import_json(self, json_path):
+        # One-off migration of a legacy audit_log.json into an empty store;
+        # entries keep their hashes and order. Returns the number imported.
+        if not os.path.exists(json_path):
+            return 0
+        with open(json_path, "r") as f:
+            logs = json.load(f)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT 1 FROM audit_tip").fetchone():
+                conn.execute("ROLLBACK")
+                print(f"Audit store already has entries; not importing {json_path}")
+                return 0
+            for entry in logs:
+                self._insert(conn, entry)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        os.replace(json_path, f"{json_path}.migrated")
+        print(f"Imported {len(logs)} audit entries from {json_path}")
+        return len(logs)
+
+    def _entry_dict(self, row):
+        seq, timestamp, previous_hash, current_hash, data = row[:5]
+        return {
+            "seq": seq,
+            "timestamp": timestamp,
             "previous_hash": previous_hash,
-            "data": log_data
+            "data": json.loads(data),
+            "current_hash": current_hash
         }
-        
-        new_entry["current_hash"] = calculate_entry_hash(new_entry)
-        logs.append(new_entry)
-        
-        with open(audit_file, "w") as f:
-            json.dump(logs, f, indent=4)
-            
-        print(f"Audit log written to {audit_file}. Entry hash: {new_entry['current_hash']}")
-        return True
+
+    def get(self, entry_hash=None):
+        # entry_hash None means the latest entry
+        conn = self._connect()
+        if entry_hash is None:
+            row = conn.execute("SELECT * FROM audit_entries ORDER BY seq DESC LIMIT 1").fetchone()
+        else:
+            row = conn.execute("SELECT * FROM audit_entries WHERE current_hash = ?", (entry_hash,)).fetchone()
+        conn.close()
+        return self._entry_dict(row) if row is not None else None
+
+    def list(self, limit=50, before=None, since=None, until=None, database=None, status=None):
+        # Newest first. before is the seq of the last entry of the previous
+        # page; since/until are ISO timestamps; database matches either side.
+        clauses, params = [], []
+        if before is not None:
+            clauses.append("seq < ?")
+            params.append(before)
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        if database:
+            clauses.append("(source_database = ? OR destination_database = ?)")
+            params.extend([database, database])
+        if status:
+            clauses.append("transfer_status = ?")
+            params.append(status)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        conn = self._connect()
+        rows = conn.execute(f"SELECT * FROM audit_entries {where} ORDER BY seq DESC LIMIT ?", params + [limit]).fetchall()
+        conn.close()
+        return [self._entry_dict(row) for row in rows]
+
+
+def log_transfer(audit_file, log_data):
+    try:
+        entry = AuditStore(audit_file).append(log_data)
+        print(f"Audit log written to {audit_file}. Entry hash: {entry['current_hash']}")
+        return entry["current_hash"]
     except Exception as e:
         print(f"Error writing audit log: {e}")
         return False
@@ -49,4 +186,4 @@ if __name__ == "__main__":
         "hash_after": "abc...",
         "transfer_status": "PASS"
     }
-    log_transfer("audit_log.json", sample_data)
+    log_transfer("audit_log.db", sample_data)
@@ -0,0 +1,267 @@
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.exceptions import InvalidSignature
+from backend.scripts.audit_logger import AuditStore, calculate_entry_hash, GENESIS_HASH
+from backend.scripts.key_manager import load_private_key, load_public_key, public_key_candidates, key_fingerprint
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import multiprocessing
+import pathlib
+import argparse
+import sqlite3
+import base64
+import json
+import sys
+
+# Hash-chain verification for the audit store. Every CHECKPOINT_INTERVAL
+# entries a signing run records (seq, current_hash) signed with the audit
+# signing key, an ECDSA pair used for nothing else (transfer keys only do
+# ECDH); checkpoints signed before a rotation of that pair verify against the
+# retired key. Verification without a signing key is read-only: the database
+# is opened read-only and no checkpoints are written. Checkpoints from before
+# the dedicated key (no signer recorded) are ignored, not trusted.
+#
+# An incremental run trusts the newest checkpoint whose signature
+# and row still match, and only recomputes the entries after it, so its cost
+# depends on how much was appended since the last run, not on the log size.
+# A full run splits the log into segments and verifies them in parallel;
+# each segment is anchored on the hash of the entry just before it, so the
+# segments together check every link.
+#
+# Either way the walk must end exactly at audit_tip (the seq and hash of the
+# last append) and no signed checkpoint may lie past it, so entries deleted
+# from the end of the log are reported rather than silently not walked.
+
+CHECKPOINT_INTERVAL = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS audit_checkpoints (
+    seq INTEGER PRIMARY KEY,
+    current_hash TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    signer TEXT
+);
+"""
+
+
+def _connect(db_path, read_only=False):
+    if read_only:
+        uri = pathlib.Path(db_path).absolute().as_uri() + "?mode=ro"
+        return sqlite3.connect(uri, uri=True, timeout=30, isolation_level=None)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.executescript(_SCHEMA)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(audit_checkpoints)")]
+    if "signer" not in columns:
+        conn.execute("ALTER TABLE audit_checkpoints ADD COLUMN signer TEXT")
+    return conn
+
+
+def _checkpoints(conn, newest_only=False):
+    # Signed checkpoints, oldest first; none if no signing run created the table yet
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'audit_checkpoints'").fetchone() is None:
+        return []
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(audit_checkpoints)")]
+    if "signer" not in columns:
+        return []
+    sql = "SELECT seq, current_hash, signature FROM audit_checkpoints WHERE signer IS NOT NULL ORDER BY seq"
+    if newest_only:
+        sql += " DESC LIMIT 1"
+    return conn.execute(sql).fetchall()
+
+
+def _checkpoint_message(seq, current_hash):
+    return f"{seq}:{current_hash}".encode("utf-8")
+
+
+def sign_checkpoint(private_key_path, seq, current_hash):
+    private_key = load_private_key(private_key_path)
+    signature = private_key.sign(_checkpoint_message(seq, current_hash), ec.ECDSA(hashes.SHA256()))
+    return base64.b64encode(signature).decode("ascii")
+
+
+def checkpoint_signature_valid(public_keys, seq, current_hash, signature):
+    # public_keys: the current key and any retired ones (see key_manager)
+    for public_key in public_keys:
+        try:
+            public_key.verify(base64.b64decode(signature), _checkpoint_message(seq, current_hash), ec.ECDSA(hashes.SHA256()))
+            return True
+        except (InvalidSignature, ValueError):
+            continue
+    return False
+
+
+def _previous_hash(conn, seq):
+    # Hash of the entry before seq; a deleted row shows up as a broken link
+    row = conn.execute("SELECT current_hash FROM audit_entries WHERE seq < ? ORDER BY seq DESC LIMIT 1", (seq,)).fetchone()
+    return row[0] if row else GENESIS_HASH
+
+
+def _walk(conn, after_seq, previous_hash, last_seq=None, batch_size=5000):
+    # Yields (seq, current_hash, error) for entries in (after_seq, last_seq];
+    # error is None for an entry that hashes and links correctly
+    sql = "SELECT seq, timestamp, previous_hash, current_hash, data FROM audit_entries WHERE seq > ?"
+    params = [after_seq]
+    if last_seq is not None:
+        sql += " AND seq <= ?"
+        params.append(last_seq)
+    cursor = conn.execute(sql + " ORDER BY seq", params)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        for seq, timestamp, stored_previous, current_hash, data in rows:
+            if stored_previous != previous_hash:
+                yield seq, current_hash, "previous_hash does not link to the preceding entry"
+            elif calculate_entry_hash({"timestamp": timestamp, "previous_hash": stored_previous, "data": json.loads(data)}) != current_hash:
+                yield seq, current_hash, "current_hash does not match the entry contents"
+            else:
+                yield seq, current_hash, None
+            previous_hash = current_hash
+
+
+def _verify_segment(db_path, first_seq, last_seq):
+    # Runs in a worker process; returns (entries verified, error or None,
+    # (seq, hash) of the last entry walked or None)
+    conn = _connect(db_path, read_only=True)
+    count = 0
+    last = None
+    try:
+        for seq, current_hash, error in _walk(conn, first_seq - 1, _previous_hash(conn, first_seq), last_seq):
+            if error:
+                return count, {"seq": seq, "error": error}, last
+            count += 1
+            last = (seq, current_hash)
+        return count, None, last
+    finally:
+        conn.close()
+
+
+def _checkpoint_error(conn, public_keys, seq, current_hash, signature):
+    # A checkpoint must carry a valid signature and still match its row
+    if not checkpoint_signature_valid(public_keys, seq, current_hash, signature):
+        return {"seq": seq, "error": "checkpoint signature is invalid"}
+    row = conn.execute("SELECT current_hash FROM audit_entries WHERE seq = ?", (seq,)).fetchone()
+    if row is None or row[0] != current_hash:
+        return {"seq": seq, "error": "entry no longer matches its signed checkpoint"}
+    return None
+
+
+def _end_error(last, tip_seq, tip_hash):
+    # last: (seq, hash) the walk ended on; must be the recorded tip
+    if last[0] != tip_seq:
+        return {"seq": tip_seq, "error": f"log ends at seq {last[0]} but audit_tip records seq {tip_seq}"}
+    if last[1] != tip_hash:
+        return {"seq": tip_seq, "error": "last entry does not match the hash recorded in audit_tip"}
+    return None
+
+
+def _checkpoint_past_tip(checkpoint_seq, tip_seq):
+    if checkpoint_seq > tip_seq:
+        return {"seq": checkpoint_seq, "error": f"signed checkpoint lies past the end of the log (seq {tip_seq})"}
+    return None
+
+
+def _check_checkpoints(conn, public_keys):
+    for checkpoint in _checkpoints(conn):
+        error = _checkpoint_error(conn, public_keys, *checkpoint)
+        if error:
+            return error
+    return None
+
+
+def verify_chain(db_path, public_key_path, private_key_path=None, full=False, workers=4, interval=CHECKPOINT_INTERVAL):
+    # public_key_path / private_key_path: the audit signing pair. With
+    # private_key_path, new checkpoints are signed as the tail is verified;
+    # without it verification is read-only.
+    public_keys = public_key_candidates(public_key_path)
+    if private_key_path:
+        AuditStore(db_path)
+        signer = key_fingerprint(load_public_key(public_key_path))
+    conn = _connect(db_path, read_only=not private_key_path)
+    try:
+        tip = conn.execute("SELECT seq, current_hash FROM audit_tip WHERE id = 1").fetchone()
+        tip_seq, tip_hash = tip if tip else (0, GENESIS_HASH)
+        result = {"valid": True, "mode": "full" if full else "incremental", "entries_verified": 0,
+                  "verified_from": None, "tip_seq": tip_seq, "tip_hash": tip_hash, "error": None}
+
+        if full:
+            signed = _checkpoints(conn, newest_only=True)
+            if signed:
+                result["error"] = _checkpoint_past_tip(signed[0][0], tip_seq)
+            if result["error"] is None:
+                result["error"] = _check_checkpoints(conn, public_keys)
+            first, end = conn.execute("SELECT MIN(seq), MAX(seq) FROM audit_entries").fetchone()
+            last = (0, GENESIS_HASH)
+            if result["error"] is None and first is not None:
+                # Walk to the last stored entry even if it is past the tip
+                end = max(end, tip_seq)
+                size = max(interval, -(-(end - first + 1) // max(workers, 1)))
+                segments = [(start, min(start + size - 1, end)) for start in range(first, end + 1, size)]
+                result["verified_from"] = first
+                if workers > 1 and len(segments) > 1:
+                    # spawn, not fork: the API process runs threads
+                    context = multiprocessing.get_context("spawn")
+                    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                        outcomes = list(pool.map(_verify_segment, [db_path] * len(segments), *zip(*segments)))
+                else:
+                    outcomes = [_verify_segment(db_path, start, stop) for start, stop in segments]
+                for count, error, segment_last in outcomes:
+                    result["entries_verified"] += count
+                    if error and result["error"] is None:
+                        result["error"] = error
+                    last = segment_last or last
+            if result["error"] is None:
+                result["error"] = _end_error(last, tip_seq, tip_hash)
+        else:
+            # Start after the newest checkpoint; everything after it is re-verified
+            after_seq, previous_hash = 0, GENESIS_HASH
+            newest = _checkpoints(conn, newest_only=True)
+            checkpoint = newest[0] if newest else None
+            if checkpoint:
+                result["error"] = (_checkpoint_past_tip(checkpoint[0], tip_seq)
+                                   or _checkpoint_error(conn, public_keys, *checkpoint))
+                after_seq, previous_hash = checkpoint[0], checkpoint[1]
+            if result["error"] is None:
+                result["verified_from"] = after_seq + 1
+                new_checkpoints = []
+                last = (after_seq, previous_hash)
+                for seq, current_hash, error in _walk(conn, after_seq, previous_hash):
+                    if error:
+                        result["error"] = {"seq": seq, "error": error}
+                        break
+                    result["entries_verified"] += 1
+                    last = (seq, current_hash)
+                    if private_key_path and seq % interval == 0:
+                        new_checkpoints.append((seq, current_hash, sign_checkpoint(private_key_path, seq, current_hash), datetime.now().isoformat(), signer))
+                if result["error"] is None:
+                    result["error"] = _end_error(last, tip_seq, tip_hash)
+                # Only checkpoints on a fully verified tail are stored; they
+                # replace unsigned legacy rows but never a signed checkpoint
+                if new_checkpoints and result["error"] is None:
+                    conn.executemany("""
+                        INSERT INTO audit_checkpoints (seq, current_hash, signature, created_at, signer) VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT (seq) DO UPDATE SET current_hash = excluded.current_hash, signature = excluded.signature,
+                            created_at = excluded.created_at, signer = excluded.signer
+                        WHERE audit_checkpoints.signer IS NULL
+                    """, new_checkpoints)
+                result["checkpoints_added"] = len(new_checkpoints) if result["error"] is None else 0
+
+        result["valid"] = result["error"] is None
+        return result
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify the audit log hash chain")
+    parser.add_argument("--db", default="audit_log.db")
+    parser.add_argument("--public-key", default="audit_signing_public_key.pem", help="audit signing public key")
+    parser.add_argument("--private-key", help="sign new checkpoints with this audit signing private key")
+    parser.add_argument("--full", action="store_true", help="verify every entry instead of the tail after the last checkpoint")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--interval", type=int, default=CHECKPOINT_INTERVAL)
+    args = parser.parse_args()
+    outcome = verify_chain(args.db, args.public_key, args.private_key, args.full, args.workers, args.interval)
+    print(json.dumps(outcome, indent=4))
+    sys.exit(0 if outcome["valid"] else 1)
@@ -0,0 +1,327 @@
+from backend.scripts.synthetic_data import parse_column_mix, bulk_load_synthetic_data, write_synthetic_csv
+from backend.scripts.bulk_load_mysql import BULK_METHODS
+from backend.scripts.extract_mysql_encrypt import extract_and_encrypt
+from backend.scripts.encrypt_payload import ecc_encrypt_session_key
+from backend.scripts.transfer_to_postgres import ecc_decrypt_and_load, read_bundle_header
+from backend.scripts.key_manager import unwrap_session_key_for
+from backend.scripts.extract_postgres_encrypt import extract_and_encrypt_postgres
+from backend.scripts.compare_hash import compare_hashes
+from backend.scripts.stream_pipeline import stream_transfer
+from backend.scripts.stream_cipher import generate_stream_key, encrypt_file, iter_decrypted_chunks, CRYPTO_WORKERS
+from backend.scripts.generate_keys import generate_ecc_keys
+from backend.scripts.pipeline_metrics import operation_totals, reset_peak_rss, peak_rss_bytes, timed
+from contextlib import redirect_stdout
+from datetime import datetime
+import subprocess
+import platform
+import argparse
+import tempfile
+import hashlib
+import json
+import time
+import sys
+import io
+import os
+
+# Benchmark harness for the transfer pipeline. For each row count it builds
+# a synthetic table, then times every pipeline stage in isolation
+# (extract_and_encrypt, ecc_encrypt_session_key, ecc_decrypt_and_load,
+# extract_and_encrypt_postgres, compare_hashes) plus the five of them in a
+# row and the single-pass streaming transfer, --repeat times each. Results
+# (latency percentiles, rows/s, MB/s, peak RSS, hot-path operation time) go
+# to a JSON file; --baseline diffs them against an earlier file and exits 1
+# on regressions beyond --threshold.
+#
+# --offline needs no databases: the synthetic CSV stands in for the MySQL
+# extract and the stages run the same hashing, AES-GCM and ECC code paths
+# without the DB round-trips.
+#
+#   python -m backend.scripts.benchmark --rows 10000,1000000 --columns int:2,varchar:4,datetime:1
+#   python -m backend.scripts.benchmark --rows 100000 --offline --output new.json --baseline old.json
+
+RESULTS_VERSION = 1
+
+DB_STAGES = ["extract_and_encrypt", "ecc_encrypt_session_key", "ecc_decrypt_and_load", "extract_and_encrypt_postgres", "compare_hashes", "end_to_end_files", "end_to_end_streaming"]
+# Stages that never touch the payload get no MB/s figure
+METADATA_STAGES = {"compare_hashes"}
+OFFLINE_STAGES = ["hash_and_encrypt", "ecc_encrypt_session_key", "decrypt", "compare_hashes", "end_to_end_files"]
+
+
+def percentile(samples, fraction):
+    # Linear interpolation between closest ranks
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(samples):
+    return {
+        "min": min(samples),
+        "p50": percentile(samples, 0.5),
+        "p90": percentile(samples, 0.9),
+        "p99": percentile(samples, 0.99),
+        "max": max(samples),
+        "mean": sum(samples) / len(samples),
+    }
+
+
+def run_stage(func, quiet=True):
+    # Returns (ok, wall seconds, CPU seconds, peak RSS bytes, operation deltas)
+    before = operation_totals()
+    reset_peak_rss()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    output = io.StringIO()
+    if quiet:
+        with redirect_stdout(output):
+            ok = func()
+    else:
+        ok = func()
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+    operations = {}
+    for name, entry in operation_totals().items():
+        previous = before.get(name, {"seconds": 0.0, "bytes": 0, "count": 0})
+        if entry["count"] > previous["count"]:
+            operations[name] = {"seconds": entry["seconds"] - previous["seconds"], "bytes": entry["bytes"] - previous["bytes"]}
+    if not ok and quiet:
+        sys.stderr.write(output.getvalue())
+    return bool(ok), wall, cpu, peak_rss_bytes(), operations
+
+
+def hash_and_encrypt_file(csv_path, enc_path, hash_path, key_path):
+    # extract_and_encrypt after the extract: hash and encrypt the CSV in one read
+    key = generate_stream_key()
+    with open(key_path, "wb") as f:
+        f.write(key)
+    sha256_hash = hashlib.sha256()
+    encrypt_file(key, csv_path, enc_path, hasher=sha256_hash)
+    with open(hash_path, "w") as f:
+        f.write(sha256_hash.hexdigest())
+    return True
+
+
+def decrypt_and_hash(private_key_path, bundle_path, hash_path):
+    # ecc_decrypt_and_load up to the COPY: unwrap, decrypt and hash what would be loaded
+    sha256_hash = hashlib.sha256()
+    with open(bundle_path, "rb") as f:
+        _, eph_pub_bytes, enc_session_key = read_bundle_header(f)
+        session_key = unwrap_session_key_for(private_key_path, eph_pub_bytes, enc_session_key)
+        for chunk in iter_decrypted_chunks(session_key, f):
+            with timed("hash", len(chunk)):
+                sha256_hash.update(chunk)
+    with open(hash_path, "w") as f:
+        f.write(sha256_hash.hexdigest())
+    return True
+
+
+def stage_functions(args, mysql_params, postgres_params, table, workdir, csv_path):
+    def path(name):
+        return os.path.join(workdir, name)
+
+    pub, priv = path("public_key.pem"), path("private_key.pem")
+    if args.offline:
+        stages = {
+            "hash_and_encrypt": lambda: hash_and_encrypt_file(csv_path, path("pre.csv.enc"), path("pre.hash"), path("session.key")),
+            "ecc_encrypt_session_key": lambda: ecc_encrypt_session_key(pub, path("session.key"), path("pre.csv.enc"), path("payload.bundle")),
+            "decrypt": lambda: decrypt_and_hash(priv, path("payload.bundle"), path("post.hash")),
+            "compare_hashes": lambda: compare_hashes(path("pre.hash"), path("post.hash")),
+        }
+        order = OFFLINE_STAGES[:4]
+    else:
+        stages = {
+            "extract_and_encrypt": lambda: extract_and_encrypt(*mysql_params, table, path("pre.csv.enc"), path("pre.hash"), path("session.key"), batch_size=args.batch_size),
+            "ecc_encrypt_session_key": lambda: ecc_encrypt_session_key(pub, path("session.key"), path("pre.csv.enc"), path("payload.bundle")),
+            "ecc_decrypt_and_load": lambda: ecc_decrypt_and_load(priv, path("payload.bundle"), *postgres_params, table),
+            "extract_and_encrypt_postgres": lambda: extract_and_encrypt_postgres(*postgres_params, table, path("post.csv.enc"), path("post.hash"), path("post_session.key"), batch_size=args.batch_size),
+            "compare_hashes": lambda: compare_hashes(path("pre.hash"), path("post.hash")),
+        }
+        order = DB_STAGES[:5]
+        stages["end_to_end_streaming"] = lambda: stream_transfer(mysql_params, postgres_params, table, pub, priv, path("stream.hash"), batch_size=args.batch_size)
+
+    def end_to_end():
+        return all(stages[name]() for name in order)
+
+    stages["end_to_end_files"] = end_to_end
+    return stages
+
+
+def benchmark_size(args, row_count, columns, mysql_params, postgres_params):
+    table = args.table
+    results = []
+    with tempfile.TemporaryDirectory(prefix="transfer-bench-") as workdir:
+        with redirect_stdout(io.StringIO()):
+            generate_ecc_keys(os.path.join(workdir, "private_key.pem"), os.path.join(workdir, "public_key.pem"))
+
+        # Setup: synthetic source data (not part of any stage's timing)
+        csv_path = os.path.join(workdir, "synthetic.csv")
+        started = time.perf_counter()
+        if args.offline:
+            payload_bytes = write_synthetic_csv(csv_path, columns, row_count, args.width, args.seed)
+        else:
+            if not args.reuse_data:
+                with redirect_stdout(io.StringIO()) as setup_output:
+                    loaded = bulk_load_synthetic_data(mysql_params, postgres_params, table, columns, row_count, args.width, args.seed, args.seed_method)
+                if not loaded:
+                    raise RuntimeError(f"Could not load {row_count} synthetic rows: {setup_output.getvalue().strip()}")
+            # Payload size for MB/s: the CSV the extractor produces
+            payload_bytes = None
+        print(f"[{row_count} rows] synthetic data ready in {time.perf_counter() - started:.2f}s")
+
+        stages = stage_functions(args, mysql_params, postgres_params, table, workdir, csv_path)
+        selected = args.stages or (OFFLINE_STAGES if args.offline else DB_STAGES)
+        for stage in selected:
+            if stage not in stages:
+                raise ValueError(f"Stage {stage} is not available {'offline' if args.offline else 'with databases'}")
+
+        # Stages run in pipeline order within each repetition, since each consumes the previous one's files
+        samples = {stage: [] for stage in selected}
+        for repetition in range(args.warmup + args.repeat):
+            for stage in selected:
+                outcome = run_stage(stages[stage], quiet=not args.verbose)
+                if repetition >= args.warmup:
+                    samples[stage].append(outcome)
+            if payload_bytes is None and os.path.exists(os.path.join(workdir, "pre.csv.enc")):
+                payload_bytes = os.path.getsize(os.path.join(workdir, "pre.csv.enc"))
+
+        for stage in selected:
+            runs = samples[stage]
+            walls = [wall for _, wall, _, _, _ in runs]
+            p50 = percentile(walls, 0.5)
+            operations = {}
+            for _, _, _, _, ops in runs:
+                for name, delta in ops.items():
+                    total = operations.setdefault(name, {"seconds": 0.0, "bytes": 0})
+                    total["seconds"] += delta["seconds"] / len(runs)
+                    total["bytes"] += delta["bytes"] / len(runs)
+            results.append({
+                "rows": row_count,
+                "stage": stage,
+                "ok": all(ok for ok, _, _, _, _ in runs),
+                "repeat": len(runs),
+                "wall_seconds": summarize(walls),
+                "cpu_seconds": summarize([cpu for _, _, cpu, _, _ in runs]),
+                "rows_per_second": row_count / p50 if p50 else None,
+                "mb_per_second": payload_bytes / p50 / 1048576 if p50 and payload_bytes and stage not in METADATA_STAGES else None,
+                "peak_rss_bytes": max(rss for _, _, _, rss, _ in runs),
+                "operations": operations,
+            })
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=5,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "crypto_workers": CRYPTO_WORKERS,
+        "git_commit": commit,
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+def compare_results(current, baseline, threshold, min_delta=0.001):
+    # Regression: median latency up by more than threshold (0.1 = 10%) and
+    # by more than min_delta seconds, so sub-millisecond stages don't flap
+    previous = {(r["rows"], r["stage"]): r for r in baseline["results"]}
+    report = []
+    for result in current["results"]:
+        before = previous.get((result["rows"], result["stage"]))
+        if before is None:
+            continue
+        old, new = before["wall_seconds"]["p50"], result["wall_seconds"]["p50"]
+        change = (new - old) / old if old else 0.0
+        report.append({
+            "rows": result["rows"],
+            "stage": result["stage"],
+            "baseline_p50": old,
+            "p50": new,
+            "change": change,
+            "regression": change > threshold and new - old > min_delta,
+        })
+    return report
+
+
+def print_results(results):
+    print(f"{'rows':>10}  {'stage':<30} {'p50 s':>9} {'p90 s':>9} {'p99 s':>9} {'rows/s':>12} {'MB/s':>8} {'peak RSS MiB':>13}")
+    for r in results:
+        rows_per_second = f"{r['rows_per_second']:.0f}" if r["rows_per_second"] else "-"
+        mb_per_second = f"{r['mb_per_second']:.1f}" if r["mb_per_second"] else "-"
+        status = "" if r["ok"] else "  FAILED"
+        print(f"{r['rows']:>10}  {r['stage']:<30} {r['wall_seconds']['p50']:>9.4f} {r['wall_seconds']['p90']:>9.4f} {r['wall_seconds']['p99']:>9.4f} "
+              f"{rows_per_second:>12} {mb_per_second:>8} {r['peak_rss_bytes'] / 1048576:>13.1f}{status}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the transfer pipeline on synthetic data")
+    parser.add_argument("--rows", default="10000", help="comma-separated row counts, e.g. 10000,1000000")
+    parser.add_argument("--columns", default="varchar:2,datetime:1", help="column mix, e.g. int:2,varchar:4,decimal:1 (types: int, bigint, double, decimal, varchar, text, datetime)")
+    parser.add_argument("--width", type=int, default=32, help="VARCHAR length; TEXT values are 1-4x this")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--stages", help=f"comma-separated subset of: {', '.join(dict.fromkeys(DB_STAGES + OFFLINE_STAGES))}")
+    parser.add_argument("--table", default="bench_synthetic")
+    parser.add_argument("--offline", action="store_true", help="no databases; CSV stands in for the extract")
+    parser.add_argument("--seed-method", choices=BULK_METHODS, default="auto", help="how synthetic rows are loaded into MySQL")
+    parser.add_argument("--reuse-data", action="store_true", help="keep the existing synthetic table instead of regenerating it")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="earlier results file to diff against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed p50 slowdown before a stage counts as regressed")
+    parser.add_argument("--min-delta", type=float, default=0.001, help="ignore p50 slowdowns smaller than this many seconds")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline scripts' own output")
+    args = parser.parse_args(argv)
+    args.stages = args.stages.split(",") if args.stages else None
+
+    mysql_params = (os.getenv("MYSQL_HOST", "localhost"), int(os.getenv("MYSQL_PORT", 3306)), os.getenv("MYSQL_USER", "user"),
+                    os.getenv("MYSQL_PASSWORD", "password"), os.getenv("MYSQL_DATABASE", "source_db"))
+    postgres_params = (os.getenv("POSTGRES_HOST", "localhost"), int(os.getenv("POSTGRES_PORT", 5432)), os.getenv("POSTGRES_USER", "user"),
+                       os.getenv("POSTGRES_PASSWORD", "password"), os.getenv("POSTGRES_DB", "target_db"))
+    columns = parse_column_mix(args.columns)
+
+    results = []
+    for row_count in [int(r) for r in args.rows.split(",")]:
+        results.extend(benchmark_size(args, row_count, columns, mysql_params, postgres_params))
+
+    output = {
+        "version": RESULTS_VERSION,
+        "environment": environment(),
+        "config": {
+            "columns": args.columns, "width": args.width, "seed": args.seed, "repeat": args.repeat,
+            "warmup": args.warmup, "batch_size": args.batch_size, "offline": args.offline,
+        },
+        "results": results,
+    }
+    print_results(results)
+
+    exit_code = 0 if all(r["ok"] for r in results) else 1
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        if baseline.get("config", {}).get("columns") != args.columns or baseline.get("config", {}).get("offline") != args.offline:
+            print("Warning: baseline was recorded with a different column mix or mode")
+        output["comparison"] = compare_results(output, baseline, args.threshold, args.min_delta)
+        for c in output["comparison"]:
+            marker = "REGRESSION" if c["regression"] else ""
+            print(f"{c['rows']:>10}  {c['stage']:<30} {c['baseline_p50']:.4f}s -> {c['p50']:.4f}s ({c['change']:+.1%}) {marker}")
+        if any(c["regression"] for c in output["comparison"]):
+            exit_code = 1
+
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=4)
+    print(f"Results written to {args.output}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
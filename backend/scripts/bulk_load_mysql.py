@@ -0,0 +1,175 @@
+from backend.scripts.pipeline_metrics import timed
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+import mysql.connector
+import tempfile
+import time
+import re
+import os
+
+# Bulk row loader for seeding MySQL with large generated datasets. Rows come
+# from any iterator and are never held in memory as a whole:
+#
+#   "infile": written chunk_rows at a time to temporary TSV files and sent
+#             with LOAD DATA LOCAL INFILE (needs local_infile=1 on the server);
+#             the next chunk is generated while the server loads the last
+#   "insert": multi-row INSERT statements of batch_size rows
+#   "auto":   LOAD DATA, falling back to INSERTs if the server refuses it
+#
+# Both modes commit once per chunk and run with unique/foreign key checks off.
+# They use their own unpooled connection because LOCAL INFILE is a
+# per-connection client capability that pooled API connections must not get.
+# Even then the client only serves files from the run's own temporary chunk
+# directory (allow_local_infile_in_path): the server is whatever host the
+# job config names, and a rogue one could otherwise ask for any file the
+# worker can read, such as private keys or jobs.db.
+
+BULK_METHODS = ("auto", "infile", "insert")
+DEFAULT_CHUNK_ROWS = 1000000
+DEFAULT_BATCH_SIZE = 2000
+
+# ER_NOT_ALLOWED_COMMAND, CR_LOAD_DATA_LOCAL_INFILE_REJECTED, ER_CLIENT_LOCAL_FILES_DISABLED
+LOCAL_INFILE_REFUSED = {1148, 2068, 3948}
+
+_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r", "\0": "\\0"})
+_NEEDS_ESCAPE = re.compile(r"[\\\t\n\r\0]")
+
+
+def _escape(value):
+    return value.translate(_ESCAPES) if _NEEDS_ESCAPE.search(value) else value
+
+
+# LOAD DATA defaults: tab-separated, backslash escapes, \N for NULL; other
+# types (numbers, Decimal, datetime) are written with str()
+_FORMATTERS = {
+    str: _escape,
+    type(None): lambda value: "\\N",
+    bool: lambda value: "1" if value else "0",
+}
+
+
+def _write_chunk(path, rows, limit):
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        lines = []
+        for row in islice(rows, limit):
+            lines.append("\t".join([_FORMATTERS.get(type(value), str)(value) for value in row]) + "\n")
+            if len(lines) >= 10000:
+                f.writelines(lines)
+                count += len(lines)
+                lines = []
+        f.writelines(lines)
+        count += len(lines)
+    return count
+
+
+def _connect(mysql_params, infile_dir=None):
+    # infile_dir: the only directory LOAD DATA LOCAL may read from; None
+    # disables LOCAL INFILE on the connection
+    host, port, user, password, database = mysql_params
+    local_infile = {"allow_local_infile_in_path": infile_dir} if infile_dir else {"allow_local_infile": False}
+    conn = mysql.connector.connect(host=host, port=port, user=user, password=password, database=database,
+                                   autocommit=False, **local_infile)
+    cursor = conn.cursor()
+    cursor.execute("SET SESSION unique_checks = 0")
+    cursor.execute("SET SESSION foreign_key_checks = 0")
+    return conn, cursor
+
+
+def _load_infile(conn, cursor, table, column_names, rows, chunk_rows, tmp, on_batch=None):
+    load_sql = (f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+                f"({', '.join(column_names)})")
+    loaded = 0
+    with ThreadPoolExecutor(max_workers=1) as writer:
+        paths = [os.path.join(tmp, "chunk0.tsv"), os.path.join(tmp, "chunk1.tsv")]
+        index = 0
+        pending = writer.submit(_write_chunk, paths[index], rows, chunk_rows)
+        while True:
+            count = pending.result()
+            if not count:
+                break
+            path = paths[index]
+            index = 1 - index
+            # Generate the next chunk while the server ingests this one
+            pending = writer.submit(_write_chunk, paths[index], rows, chunk_rows)
+            nbytes = os.path.getsize(path)
+            with timed("db_copy", nbytes):
+                cursor.execute(load_sql, (path,))
+            # LOCAL implies IGNORE: rejected rows only show up as a short count
+            if cursor.rowcount != count:
+                raise Exception(f"LOAD DATA accepted {cursor.rowcount} of {count} rows")
+            conn.commit()
+            loaded += count
+            if on_batch:
+                on_batch(count, nbytes)
+    return loaded
+
+
+def _load_inserts(conn, cursor, table, column_names, rows, chunk_rows, batch_size, on_batch=None):
+    row_sql = "(" + ", ".join(["%s"] * len(column_names)) + ")"
+    prefix = f"INSERT INTO {table} ({', '.join(column_names)}) VALUES "
+    loaded = 0
+    uncommitted = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        with timed("db_execute"):
+            cursor.execute(prefix + ", ".join([row_sql] * len(batch)), [value for row in batch for value in row])
+        loaded += len(batch)
+        uncommitted += len(batch)
+        if uncommitted >= chunk_rows:
+            conn.commit()
+            uncommitted = 0
+        if on_batch:
+            on_batch(len(batch), 0)
+    conn.commit()
+    return loaded
+
+
+def bulk_load_rows(mysql_params, table, column_names, rows, method="auto", chunk_rows=DEFAULT_CHUNK_ROWS, batch_size=DEFAULT_BATCH_SIZE, on_batch=None):
+    # Returns (rows loaded, method used); raises on failure. Chunks committed
+    # before a failure stay in the table.
+    if method not in BULK_METHODS:
+        raise ValueError(f"Unknown bulk load method: {method} (choose from {', '.join(BULK_METHODS)})")
+    rows = iter(rows)
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="bulk-load-") as tmp:
+        # Resolved, so the connector's path check sees the same path LOAD DATA names
+        tmp = os.path.realpath(tmp)
+        loaded, method = _bulk_load(mysql_params, table, column_names, rows, method, chunk_rows, batch_size, tmp, on_batch)
+    elapsed = time.perf_counter() - started
+    rate = f" ({loaded / elapsed:.0f} rows/s)" if elapsed > 0 else ""
+    print(f"Bulk loaded {loaded} rows into {table} via {method} in {elapsed:.1f}s{rate}.")
+    return loaded, method
+
+
+def _bulk_load(mysql_params, table, column_names, rows, method, chunk_rows, batch_size, tmp, on_batch):
+    conn, cursor = _connect(mysql_params, tmp if method != "insert" else None)
+    try:
+        loaded = 0
+        if method == "auto":
+            # The first batch doubles as the probe: small, kept in memory, and
+            # replayed through INSERTs if the server refuses LOCAL INFILE
+            probe = list(islice(rows, batch_size))
+            try:
+                loaded = _load_infile(conn, cursor, table, column_names, iter(probe), chunk_rows, tmp, on_batch)
+                method = "infile"
+            except mysql.connector.Error as e:
+                if e.errno not in LOCAL_INFILE_REFUSED:
+                    raise
+                print(f"LOAD DATA LOCAL INFILE unavailable ({e.msg}); falling back to batched INSERTs")
+                cursor.close()
+                conn.close()
+                conn, cursor = _connect(mysql_params)
+                rows = chain(probe, rows)
+                method = "insert"
+        if method == "infile":
+            loaded += _load_infile(conn, cursor, table, column_names, rows, chunk_rows, tmp, on_batch)
+        else:
+            loaded += _load_inserts(conn, cursor, table, column_names, rows, chunk_rows, batch_size, on_batch)
+    finally:
+        cursor.close()
+        conn.close()
+    return loaded, method
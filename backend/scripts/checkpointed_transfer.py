@@ -0,0 +1,187 @@
+from backend.scripts.stream_pipeline import stream_transfer
+from backend.scripts.key_manager import SessionKeyWrapper, load_public_key
+from backend.scripts.transfer_to_postgres import prepare_destination_table
+from backend.scripts.partitioned_transfer import partition_query, hash_postgres_partition, write_partition_manifest
+from backend.scripts.connection_pool import connect_mysql, connect_postgres
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import threading
+import json
+import os
+
+# Resumable transfer. The table is cut into chunks of chunk_size rows and
+# every chunk is extracted, encrypted and COPY-loaded in its own Postgres
+# transaction. Chunk boundaries are found by walking the key index in keyset
+# steps (WHERE key > last ORDER BY key LIMIT n), so sparse or skewed keys
+# still give evenly sized chunks.
+# After each commit the chunk's source digest is written to a checkpoint file,
+# so a rerun skips straight to the chunks that never committed. Chunks the
+# checkpoint says are loaded are re-verified by hashing the destination range
+# instead of being copied again. Pipeline stages are checkpointed in the same
+# file so a resumed job doesn't redo one-off work such as seeding.
+
+class Checkpoint:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.state = {"stages": {}, "transfer": None}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self.state = json.load(f)
+
+    def _save(self):
+        # Write-then-rename so a crash never leaves a half-written checkpoint
+        temp_file = f"{self.path}.tmp"
+        with open(temp_file, "w") as f:
+            json.dump(self.state, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.path)
+
+    def stage_done(self, name):
+        return name in self.state["stages"]
+
+    def stage_info(self, name):
+        return self.state["stages"].get(name)
+
+    def mark_stage(self, name, **info):
+        with self.lock:
+            self.state["stages"][name] = dict(info, completed_at=datetime.now().isoformat())
+            self._save()
+
+    def start_transfer(self, plan):
+        with self.lock:
+            self.state["transfer"] = dict(plan, chunks={})
+            self._save()
+
+    def transfer_plan(self):
+        return self.state["transfer"]
+
+    def transfer_rows(self):
+        # Rows in all committed chunks; None if a chunk predates row counts
+        chunks = self.state["transfer"]["chunks"].values() if self.state["transfer"] else []
+        if any(chunk.get("rows") is None for chunk in chunks):
+            return None
+        return sum(chunk["rows"] for chunk in chunks)
+
+    def chunk(self, index):
+        return self.state["transfer"]["chunks"].get(str(index))
+
+    def mark_chunk(self, index, bounds, digest, rows=None):
+        with self.lock:
+            self.state["transfer"]["chunks"][str(index)] = {
+                "range": list(bounds),
+                "hash": digest,
+                "rows": rows,
+                "committed_at": datetime.now().isoformat()
+            }
+            self._save()
+
+
+def plan_key_chunks(host, port, user, password, database, table, key_column, chunk_size):
+    # [(first key, last key)] of consecutive chunk_size-row slices in key
+    # order; each step reads chunk_size index entries, not the rows
+    conn = connect_mysql(
+        host=host,
+        port=port,
+        user=user,
+        password=password,
+        database=database
+    )
+    cursor = conn.cursor()
+    ranges = []
+    while True:
+        after = f"WHERE {key_column} > %s " if ranges else ""
+        params = (ranges[-1][1], chunk_size) if ranges else (chunk_size,)
+        cursor.execute(
+            f"SELECT MIN({key_column}), MAX({key_column}) FROM "
+            f"(SELECT {key_column} FROM {table} {after}ORDER BY {key_column} LIMIT %s) AS chunk", params)
+        lo, hi = cursor.fetchone()
+        if lo is None:
+            break
+        ranges.append((lo, hi))
+    cursor.close()
+    conn.close()
+    # Empty table: a single empty chunk keeps both sides comparable
+    return ranges or [(0, 0)]
+
+
+def _delete_range(postgres_params, table, key_column, lo, hi):
+    # Makes reloading a chunk idempotent: whatever a failed attempt left is removed
+    host, port, user, password, database = postgres_params
+    conn = connect_postgres(host=host, port=port, user=user, password=password, database=database)
+    cursor = conn.cursor()
+    cursor.execute(f"DELETE FROM {table} WHERE {key_column} BETWEEN %s AND %s", (lo, hi))
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def resumable_transfer(mysql_params, postgres_params, table, key_column, chunk_size, public_key_path, private_key_path, hash_file, manifest_path, checkpoint, bundle_dir=None, batch_size=1000, max_workers=4, payload_format="csv", compression=None, compression_level=None, on_batch=None):
+    # mysql_params / postgres_params: (host, port, user, password, database)
+    try:
+        # 1. Fix the chunk plan once; a resumed run reuses it unchanged
+        plan = checkpoint.transfer_plan()
+        if plan and (plan["table"], plan["key_column"], plan["chunk_size"]) == (table, key_column, chunk_size):
+            ranges = [tuple(r) for r in plan["ranges"]]
+            print(f"Resuming {table}: {len(plan['chunks'])} of {len(ranges)} chunks already committed")
+        else:
+            ranges = plan_key_chunks(*mysql_params, table, key_column, chunk_size)
+
+            # 2. Prepare (create + truncate) the destination, exactly once per plan
+            host, port, user, password, database = postgres_params
+            conn = connect_postgres(host=host, port=port, user=user, password=password, database=database)
+            cursor = conn.cursor()
+            prepare_destination_table(cursor, table)
+            conn.commit()
+            cursor.close()
+            conn.close()
+            checkpoint.start_transfer({"table": table, "key_column": key_column, "chunk_size": chunk_size, "ranges": ranges})
+
+        # 3. Verify committed chunks by hash, (re)load everything else
+        query = partition_query(table, key_column)
+        # One key-wrapping key for every chunk's session key in this attempt
+        key_wrapper = SessionKeyWrapper(load_public_key(public_key_path))
+
+        def run_chunk(index):
+            lo, hi = ranges[index]
+            done = checkpoint.chunk(index)
+            if done:
+                if hash_postgres_partition(*postgres_params, table, key_column, lo, hi, batch_size) == done["hash"]:
+                    return done["hash"], False
+                print(f"Chunk {index} ({lo}-{hi}) no longer matches its checkpoint; reloading")
+            _delete_range(postgres_params, table, key_column, lo, hi)
+            chunk_hash = f"{hash_file}.chunk{index}"
+            chunk_bundle = os.path.join(bundle_dir, f"encrypted_payload.chunk{index}.bundle") if bundle_dir else None
+            rows = [0]
+
+            def count_batch(batch_rows, nbytes):
+                rows[0] += batch_rows
+                if on_batch:
+                    on_batch(batch_rows, nbytes)
+            if not stream_transfer(mysql_params, postgres_params, table, public_key_path, private_key_path, chunk_hash,
+                                   bundle_path=chunk_bundle, batch_size=batch_size, query=query, query_params=(lo, hi), prepare_table=False,
+                                   payload_format=payload_format, compression=compression, compression_level=compression_level, on_batch=count_batch,
+                                   key_wrapper=key_wrapper):
+                raise Exception(f"Chunk {index} ({lo}-{hi}) failed")
+            with open(chunk_hash, "r") as f:
+                digest = f.read().strip()
+            os.remove(chunk_hash)
+            if chunk_bundle:
+                os.remove(chunk_bundle)
+            # COPY has committed; only now does the chunk count as done
+            checkpoint.mark_chunk(index, (lo, hi), digest, rows[0])
+            return digest, True
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            outcomes = list(pool.map(run_chunk, range(len(ranges))))
+        digests = [digest for digest, _ in outcomes]
+        copied = sum(1 for _, was_copied in outcomes if was_copied)
+
+        # 4. Same manifest layout as a partitioned transfer, so verification is shared
+        combined = write_partition_manifest(manifest_path, hash_file, ranges, digests)
+        print(f"Resumable transfer of {table} successful ({copied} chunks copied, {len(ranges) - copied} verified in place). Hash: {combined}")
+        return True
+    except Exception as e:
+        print(f"Error during resumable transfer: {e}")
+        return False
@@ -1,3 +1,4 @@
+import json
 import os
 
 def compare_hashes(pre_hash_file, post_hash_file):
@@ -23,5 +24,47 @@ def compare_hashes(pre_hash_file, post_hash_file):
         print(f"Error comparing hashes: {e}")
         return False
 
+def compare_fingerprints(pre_fingerprint_file, post_fingerprint_file):
+    # Diffs two table_fingerprint files bucket by bucket and reports the key
+    # ranges whose rows differ (missing, extra or changed)
+    try:
+        with open(pre_fingerprint_file, "r") as f:
+            pre = json.load(f)
+        with open(post_fingerprint_file, "r") as f:
+            post = json.load(f)
+            
+        if pre["bucket_size"] != post["bucket_size"]:
+            raise ValueError("Fingerprints use different bucket sizes")
+        bucket_size = pre["bucket_size"]
+        
+        mismatched_ranges = []
+        for bucket in sorted(set(pre["buckets"]) | set(post["buckets"]), key=int):
+            pre_bucket = pre["buckets"].get(bucket)
+            post_bucket = post["buckets"].get(bucket)
+            if pre_bucket != post_bucket:
+                lo = int(bucket) * bucket_size
+                mismatched_ranges.append({
+                    "range": [lo, lo + bucket_size - 1],
+                    "rows_before": pre_bucket["count"] if pre_bucket else 0,
+                    "rows_after": post_bucket["count"] if post_bucket else 0
+                })
+                
+        match = pre["root"] == post["root"]
+        if match:
+            print(f"PASS: Fingerprints match. ({pre['root']})")
+        else:
+            print(f"FAIL: Fingerprints differ in {len(mismatched_ranges)} key range(s)")
+            for mismatch in mismatched_ranges:
+                print(f"  {mismatch['range'][0]}-{mismatch['range'][1]}: {mismatch['rows_before']} rows before, {mismatch['rows_after']} after")
+        return {
+            "match": match,
+            "row_count_before": pre["row_count"],
+            "row_count_after": post["row_count"],
+            "mismatched_ranges": mismatched_ranges
+        }
+    except Exception as e:
+        print(f"Error comparing fingerprints: {e}")
+        return {"match": False, "error": str(e), "mismatched_ranges": []}
+
 if __name__ == "__main__":
     compare_hashes("pre_transfer.hash", "post_transfer.hash")
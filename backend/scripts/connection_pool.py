@@ -0,0 +1,361 @@
+from backend.scripts.pipeline_metrics import observe
+import mysql.connector
+import psycopg2
+import threading
+import time
+import os
+
+# Process-wide connection pools shared by the API and every pipeline script.
+# One pool per (kind, host, port, user, password, database), i.e. per side of
+# a DBConfig. connect_mysql / connect_postgres hand out a proxy that behaves
+# like the driver connection; its close() rolls back, resets the session and
+# returns the connection to the pool instead of tearing down TCP/TLS/auth.
+# Stale connections are evicted lazily on acquire and release (no reaper
+# thread).
+#
+# The same pools serve the arbitrary-SQL query console and the transfer
+# pipeline, so a released connection must not carry anything a statement
+# changed: MySQL gets COM_RESET_CONNECTION plus a re-select of the pool's
+# database (the reset keeps the USE'd one), Postgres DISCARD ALL. Session
+# variables, search_path, temporary tables and prepared statements are gone
+# before the next borrower sees the connection.
+
+POOL_SETTINGS = {
+    # Connections per pool, idle + in use
+    "max_size": int(os.getenv("POOL_MAX_SIZE", 20)),
+    # Seconds an idle connection is kept before it is closed
+    "idle_timeout": float(os.getenv("POOL_IDLE_TIMEOUT", 300)),
+    # Seconds after which a connection is recycled regardless of use
+    "max_lifetime": float(os.getenv("POOL_MAX_LIFETIME", 1800)),
+    # Idle seconds after which a connection is pinged before reuse
+    "health_check_interval": float(os.getenv("POOL_HEALTH_CHECK_INTERVAL", 30)),
+    # Seconds to wait for a free connection before giving up
+    "acquire_timeout": float(os.getenv("POOL_ACQUIRE_TIMEOUT", 30)),
+}
+
+
+class _PooledEntry:
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class MeteredCursor:
+    # Driver cursor that times every call that talks to the server and
+    # reports it to pipeline_metrics (db_execute / db_fetch / db_copy)
+    _OPERATIONS = {
+        "execute": "db_execute", "executemany": "db_execute", "callproc": "db_execute",
+        "fetchone": "db_fetch", "fetchmany": "db_fetch", "fetchall": "db_fetch",
+        "copy_expert": "db_copy", "copy_from": "db_copy", "copy_to": "db_copy",
+    }
+
+    def __init__(self, raw):
+        object.__setattr__(self, "_raw", raw)
+
+    def __getattr__(self, name):
+        attr = getattr(self._raw, name)
+        operation = self._OPERATIONS.get(name)
+        if operation is None:
+            return attr
+
+        def call(*args, **kwargs):
+            started = time.perf_counter()
+            result = attr(*args, **kwargs)
+            rows = 0
+            if operation == "db_fetch" and result is not None:
+                rows = 1 if name == "fetchone" else len(result)
+            observe(operation, time.perf_counter() - started, rows=rows)
+            return result
+        return call
+
+    def __setattr__(self, name, value):
+        # e.g. itersize on psycopg2 named cursors
+        setattr(self._raw, name, value)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __enter__(self):
+        self._raw.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._raw.__exit__(*exc)
+
+
+class PooledConnection:
+    # Delegates everything to the driver connection except close()
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+
+    def __getattr__(self, name):
+        if self._entry is None:
+            raise AttributeError(f"Connection already returned to the pool ({name})")
+        return getattr(self._entry.raw, name)
+
+    def cursor(self, *args, **kwargs):
+        if self._entry is None:
+            raise AttributeError("Connection already returned to the pool (cursor)")
+        return MeteredCursor(self._entry.raw.cursor(*args, **kwargs))
+
+    def close(self):
+        if self._entry is not None:
+            entry, self._entry = self._entry, None
+            self._pool.release(entry)
+
+    def discard(self):
+        # Drops the connection instead of resetting it, e.g. when draining an
+        # abandoned unbuffered MySQL result would cost more than reconnecting
+        if self._entry is not None:
+            entry, self._entry = self._entry, None
+            self._pool.release(entry, discard=True)
+
+    def __del__(self):
+        # Callers that bail out on an exception never reach close()
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    def __init__(self, kind, host, port, user, password, database, settings=None):
+        self.kind = kind
+        self.params = {"host": host, "port": port, "user": user, "password": password, "database": database}
+        self.settings = dict(POOL_SETTINGS, **(settings or {}))
+        self.idle = []
+        self.in_use = 0
+        self.condition = threading.Condition()
+        self.metrics = {
+            "created": 0,
+            "reused": 0,
+            "closed_idle": 0,
+            "closed_lifetime": 0,
+            "closed_broken": 0,
+            "closed_discarded": 0,
+            "health_check_failures": 0,
+            "waits": 0,
+            "wait_timeouts": 0,
+            "wait_seconds": 0.0,
+        }
+
+    def name(self):
+        p = self.params
+        return f"{self.kind}://{p['user']}@{p['host']}:{p['port']}/{p['database']}"
+
+    def _open(self, connect_timeout=None):
+        extra = {"connect_timeout": connect_timeout} if connect_timeout else {}
+        if self.kind == "mysql":
+            return mysql.connector.connect(**self.params, **extra)
+        return psycopg2.connect(**self.params, **extra)
+
+    def _discard(self, entry, reason):
+        # Called with the condition held: counts the connection as closed and
+        # returns it for _close_raw, which runs after the condition is released
+        self.metrics[reason] += 1
+        return entry
+
+    def _close_raw(self, entries):
+        # Closing can block on the network, so never under the condition
+        for entry in entries:
+            try:
+                entry.raw.close()
+            except Exception:
+                pass
+
+    def _expired(self, entry, now):
+        return now - entry.created_at > self.settings["max_lifetime"]
+
+    def _healthy(self, entry):
+        try:
+            if self.kind == "mysql":
+                entry.raw.ping(reconnect=False)
+            else:
+                if entry.raw.closed:
+                    return False
+                cursor = entry.raw.cursor()
+                cursor.execute("SELECT 1")
+                cursor.close()
+                entry.raw.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _evict_idle(self, now):
+        # Called with the condition held; oldest idle connections are at the
+        # front. Returns the evicted entries for _close_raw.
+        keep = []
+        evicted = []
+        for entry in self.idle:
+            if self._expired(entry, now):
+                evicted.append(self._discard(entry, "closed_lifetime"))
+            elif now - entry.last_used > self.settings["idle_timeout"]:
+                evicted.append(self._discard(entry, "closed_idle"))
+            else:
+                keep.append(entry)
+        self.idle = keep
+        return evicted
+
+    def acquire(self, validate=False, connect_timeout=None):
+        deadline = time.monotonic() + self.settings["acquire_timeout"]
+        waited_from = None
+        while True:
+            entry = None
+            evicted = []
+            timed_out = False
+            with self.condition:
+                while True:
+                    now = time.monotonic()
+                    evicted += self._evict_idle(now)
+                    if self.idle:
+                        # Most recently used first keeps the working set small
+                        entry = self.idle.pop()
+                        check = validate or now - entry.last_used > self.settings["health_check_interval"]
+                        break
+                    if self.in_use < self.settings["max_size"]:
+                        break
+                    if waited_from is None:
+                        waited_from = now
+                        self.metrics["waits"] += 1
+                    if now >= deadline:
+                        self.metrics["wait_timeouts"] += 1
+                        self._finish_wait(waited_from)
+                        timed_out = True
+                        break
+                    self.condition.wait(deadline - now)
+                if not timed_out:
+                    # The slot is reserved before the lock is released
+                    self.in_use += 1
+            self._close_raw(evicted)
+            if timed_out:
+                raise TimeoutError(f"No free connection in pool {self.name()} after {self.settings['acquire_timeout']}s")
+            if entry is None:
+                break
+
+            # Validated outside the lock, so one slow or half-dead connection
+            # doesn't stall every other acquire and release
+            if check and not self._healthy(entry):
+                with self.condition:
+                    self.in_use -= 1
+                    self.metrics["health_check_failures"] += 1
+                    self._discard(entry, "closed_broken")
+                    self.condition.notify()
+                self._close_raw([entry])
+                continue
+            with self.condition:
+                self.metrics["reused"] += 1
+                self._finish_wait(waited_from)
+            return PooledConnection(self, entry)
+
+        with self.condition:
+            self._finish_wait(waited_from)
+        # Connect outside the lock; the slot is already reserved
+        try:
+            raw = self._open(connect_timeout)
+        except Exception:
+            with self.condition:
+                self.in_use -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.metrics["created"] += 1
+        return PooledConnection(self, _PooledEntry(raw))
+
+    def _finish_wait(self, waited_from):
+        if waited_from is not None:
+            self.metrics["wait_seconds"] += time.monotonic() - waited_from
+
+    def _reset(self, entry):
+        # Leaves the connection with no open transaction, pending result or
+        # session state; False if it can't be reset and must be closed
+        try:
+            if self.kind == "mysql":
+                if entry.raw.unread_result:
+                    entry.raw.consume_results()
+                entry.raw.rollback()
+                entry.raw.cmd_reset_connection()
+                entry.raw.database = self.params["database"]
+                return True
+            if entry.raw.closed:
+                return False
+            entry.raw.rollback()
+            # DISCARD ALL can't run inside a transaction block
+            entry.raw.autocommit = True
+            cursor = entry.raw.cursor()
+            cursor.execute("DISCARD ALL")
+            cursor.close()
+            entry.raw.autocommit = False
+            return True
+        except Exception:
+            return False
+
+    def release(self, entry, discard=False):
+        healthy = not discard and self._reset(entry)
+        with self.condition:
+            self.in_use -= 1
+            now = time.monotonic()
+            closing = []
+            if discard:
+                closing.append(self._discard(entry, "closed_discarded"))
+            elif not healthy:
+                closing.append(self._discard(entry, "closed_broken"))
+            elif self._expired(entry, now):
+                closing.append(self._discard(entry, "closed_lifetime"))
+            else:
+                entry.last_used = now
+                self.idle.append(entry)
+            closing += self._evict_idle(now)
+            self.condition.notify()
+        self._close_raw(closing)
+
+    def close_idle(self):
+        with self.condition:
+            closing = [self._discard(entry, "closed_idle") for entry in self.idle]
+            self.idle = []
+        self._close_raw(closing)
+
+    def stats(self):
+        with self.condition:
+            return dict(self.metrics, name=self.name(), idle=len(self.idle), in_use=self.in_use, max_size=self.settings["max_size"])
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def get_pool(kind, host, port, user, password, database):
+    global _pools_pid
+    key = (kind, host, int(port), user, password, database)
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # Forked child: the parent's sockets must not be shared
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(kind, host, port, user, password, database)
+        return pool
+
+
+def connect_mysql(host, port, user, password, database, connect_timeout=None, validate=False):
+    return get_pool("mysql", host, port, user, password, database).acquire(validate, connect_timeout)
+
+
+def connect_postgres(host, port, user, password, database, connect_timeout=None, validate=False):
+    return get_pool("postgres", host, port, user, password, database).acquire(validate, connect_timeout)
+
+
+def pool_metrics():
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
+
+
+def close_all_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_idle()
@@ -0,0 +1,58 @@
+from datetime import timedelta
+from decimal import Decimal
+import json
+import re
+
+# CSV encoding that round-trips through PostgreSQL's COPY ... (FORMAT csv):
+# NULL is an unquoted empty field and an empty string is a quoted "" (plain
+# csv.writer writes both as nothing), bytes use bytea hex input (\x...), and
+# JSON values are serialised as JSON. Lines end in \r\n like csv.writer's.
+# Booleans are written as 1/0, which Postgres boolean and integer columns
+# both accept and which matches what MySQL returns for TINYINT(1), so a
+# boolean column hashes the same on either side. SET columns (Python sets)
+# are written as MySQL shows them, sorted and comma-joined, and TIME values
+# (timedelta) as [-]HH:MM:SS[.ffffff].
+_NEEDS_QUOTING = re.compile(r'[",\r\n]')
+_UNQUOTED_TYPES = (int, float, Decimal)
+
+def _format_timedelta(value):
+    sign = "-" if value < timedelta(0) else ""
+    value = abs(value)
+    seconds = value.days * 86400 + value.seconds
+    text = f"{sign}{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    if value.microseconds:
+        text += f".{value.microseconds:06d}"
+    return text
+
+def encode_csv_field(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, _UNQUOTED_TYPES):
+        return str(value)
+    if isinstance(value, str):
+        text = value
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        return "\\x" + bytes(value).hex()
+    elif isinstance(value, (dict, list)):
+        text = json.dumps(value)
+    elif isinstance(value, (set, frozenset)):
+        text = ",".join(sorted(value))
+    elif isinstance(value, timedelta):
+        return _format_timedelta(value)
+    else:
+        text = str(value)
+    # "\." alone on a line is COPY's end-of-data marker
+    if not text or text == "\\." or _NEEDS_QUOTING.search(text):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+def encode_csv_row(row):
+    return ",".join([encode_csv_field(v) for v in row]) + "\r\n"
+
+def encode_csv_rows(rows):
+    return "".join([encode_csv_row(row) for row in rows])
+
+def copy_sql(table, columns):
+    return f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
@@ -1,58 +1,53 @@
-from cryptography.hazmat.primitives import serialization, hashes
-from cryptography.hazmat.primitives.asymmetric import ec
-from cryptography.hazmat.primitives.kdf.hkdf import HKDF
-from cryptography.fernet import Fernet
+from backend.scripts.stream_cipher import is_chunked_stream
+from backend.scripts.key_manager import SessionKeyWrapper, load_public_key
 import os
+import shutil
 import struct
-import base64
 
-def ecc_encrypt_session_key(public_key_path, session_key_path, encrypted_csv_path, output_bundle_path):
+# Bundles start with a magic + version byte so the loader can tell payload
+# formats apart. Bundles written before this header existed start directly
+# with the ephemeral key length and always carry a Fernet payload.
+BUNDLE_MAGIC = b"SDTB"
+BUNDLE_VERSION_FERNET = 1
+BUNDLE_VERSION_CHUNKED = 2
+
+def wrap_session_key(receiver_public_key, session_key):
+    # Ephemeral ECDH -> HKDF -> Fernet; for a single bundle. Transfers that
+    # write several bundles share one SessionKeyWrapper instead.
+    return SessionKeyWrapper(receiver_public_key).wrap(session_key)
+
+def write_bundle_header(f, bundle_version, ephemeral_pub_bytes, encrypted_session_key):
+    # [4 bytes magic][1 byte version][4 bytes eph_pub_len][eph_pub][4 bytes enc_session_key_len][enc_session_key]
+    f.write(BUNDLE_MAGIC)
+    f.write(struct.pack("B", bundle_version))
+    f.write(struct.pack("I", len(ephemeral_pub_bytes)))
+    f.write(ephemeral_pub_bytes)
+    f.write(struct.pack("I", len(encrypted_session_key)))
+    f.write(encrypted_session_key)
+
+def ecc_encrypt_session_key(public_key_path, session_key_path, encrypted_csv_path, output_bundle_path, key_wrapper=None):
     try:
-        # 1. Load Receiver's Public Key
-        with open(public_key_path, "rb") as key_file:
-            receiver_public_key = serialization.load_pem_public_key(key_file.read())
+        # 1. Load Receiver's Public Key (parsed once per process, see key_manager)
+        if key_wrapper is None:
+            key_wrapper = SessionKeyWrapper(load_public_key(public_key_path))
             
         # 2. Load Session Key (the one used for AES/Fernet)
         with open(session_key_path, "rb") as f:
             session_key = f.read()
 
-        # 3. Generate Ephemeral ECC Key Pair
-        ephemeral_private_key = ec.generate_private_key(ec.SECP256R1())
-        ephemeral_public_key = ephemeral_private_key.public_key()
-        
-        # 4. Perform ECDH to derive shared secret
-        shared_secret = ephemeral_private_key.exchange(ec.ECDH(), receiver_public_key)
-        
-        # 5. Derive encryption key for the session key using HKDF
-        derived_key = HKDF(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=None,
-            info=b'session key encryption',
-        ).derive(shared_secret)
-        
-        # 6. Encrypt the session key with the derived key (using Fernet for simplicity)
-        f_derived = Fernet(base64.urlsafe_b64encode(derived_key))
-        encrypted_session_key = f_derived.encrypt(session_key)
-        
-        # 7. Serialize Ephemeral Public Key
-        ephemeral_pub_bytes = ephemeral_public_key.public_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo
-        )
+        # 3. Wrap the session key with an ephemeral ECDH-derived key
+        ephemeral_pub_bytes, encrypted_session_key = key_wrapper.wrap(session_key)
         
-        # 8. Load encrypted payload (AES/Fernet encrypted CSV)
-        with open(encrypted_csv_path, "rb") as f:
-            encrypted_payload = f.read()
+        # 4. Detect payload format (chunked AES-GCM stream or legacy Fernet token)
+        if is_chunked_stream(encrypted_csv_path):
+            bundle_version = BUNDLE_VERSION_CHUNKED
+        else:
+            bundle_version = BUNDLE_VERSION_FERNET
             
-        # 9. Create bundle: 
-        # [4 bytes eph_pub_len][eph_pub][4 bytes enc_session_key_len][enc_session_key][payload]
-        with open(output_bundle_path, "wb") as f:
-            f.write(struct.pack("I", len(ephemeral_pub_bytes)))
-            f.write(ephemeral_pub_bytes)
-            f.write(struct.pack("I", len(encrypted_session_key)))
-            f.write(encrypted_session_key)
-            f.write(encrypted_payload)
+        # 5. Create bundle: header followed by the payload, streamed rather than read into memory
+        with open(output_bundle_path, "wb") as f, open(encrypted_csv_path, "rb") as payload:
+            write_bundle_header(f, bundle_version, ephemeral_pub_bytes, encrypted_session_key)
+            shutil.copyfileobj(payload, f, 1024 * 1024)
             
         print(f"ECC Hybrid encryption successful. Bundle created: {output_bundle_path}")
         return True
@@ -1,57 +1,50 @@
-import mysql.connector
-import csv
+from backend.scripts.connection_pool import connect_mysql
 import hashlib
 import os
-from cryptography.fernet import Fernet
+from backend.scripts.csv_codec import encode_csv_row, encode_csv_rows
+from backend.scripts.stream_cipher import generate_stream_key, encrypt_file
 
-def extract_and_encrypt(host, port, user, password, database, table, output_csv_enc, hash_file, key_file):
+def extract_and_encrypt(host, port, user, password, database, table, output_csv_enc, hash_file, key_file, batch_size=1000, compression=None, compression_level=None, on_batch=None):
+    # Next to the output so concurrent runs in other directories don't collide
+    temp_csv = f"{output_csv_enc}.plain.csv"
     try:
-        conn = mysql.connector.connect(
+        conn = connect_mysql(
             host=host,
             port=port,
             user=user,
             password=password,
             database=database
         )
-        cursor = conn.cursor()
+        # Unbuffered cursor: rows stay on the server socket until fetched
+        cursor = conn.cursor(buffered=False)
         
-        # 1. Extract to CSV
+        # 1. Extract to CSV, streaming fetchmany batches so memory stays bounded
         cursor.execute(f"SELECT * FROM {table}")
-        rows = cursor.fetchall()
         column_names = [i[0] for i in cursor.description]
         
-        temp_csv = "temp_extract.csv"
-        with open(temp_csv, "w", newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(column_names)
-            writer.writerows(rows)
+        with open(temp_csv, "w", newline='', encoding='utf-8') as f:
+            f.write(encode_csv_row(column_names))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                chunk = encode_csv_rows(rows)
+                f.write(chunk)
+                if on_batch:
+                    on_batch(len(rows), len(chunk.encode("utf-8")))
         
-        # 2. Calculate Hash
+        # 2-3. Hash, compress and encrypt the CSV in one read: chunks are
+        # sealed with AES-GCM on the crypto pool while this thread hashes
+        key = generate_stream_key()
+        with open(key_file, "wb") as kf:
+            kf.write(key)
+            
         sha256_hash = hashlib.sha256()
-        with open(temp_csv, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
+        encrypt_file(key, temp_csv, output_csv_enc, compression=compression, compression_level=compression_level, hasher=sha256_hash)
         
         hash_val = sha256_hash.hexdigest()
         with open(hash_file, "w") as f:
             f.write(hash_val)
-            
-        # 3. Encrypt CSV
-        key = Fernet.generate_key()
-        with open(key_file, "wb") as kf:
-            kf.write(key)
-            
-        cipher_suite = Fernet(key)
-        with open(temp_csv, "rb") as f:
-            file_data = f.read()
-            
-        encrypted_data = cipher_suite.encrypt(file_data)
-        
-        with open(output_csv_enc, "wb") as f:
-            f.write(encrypted_data)
-            
-        # Cleanup
-        os.remove(temp_csv)
         
         print(f"Extraction and encryption successful.")
         print(f"Hash: {hash_val}")
@@ -63,6 +56,10 @@ def extract_and_encrypt(host, port, user, password, database, table, output_csv_
     except Exception as e:
         print(f"Error extracting and encrypting: {e}")
         return False
+    finally:
+        # The plaintext extract never outlives the call, success or not
+        if os.path.exists(temp_csv):
+            os.remove(temp_csv)
 
 if __name__ == "__main__":
     host = os.getenv("MYSQL_HOST", "localhost")
@@ -70,6 +67,9 @@ if __name__ == "__main__":
     user = os.getenv("MYSQL_USER", "user")
     password = os.getenv("MYSQL_PASSWORD", "password")
     database = os.getenv("MYSQL_DATABASE", "source_db")
+    batch_size = int(os.getenv("EXTRACT_BATCH_SIZE", 1000))
+    compression = os.getenv("PAYLOAD_COMPRESSION", "none")
+    compression_level = int(os.environ["PAYLOAD_COMPRESSION_LEVEL"]) if "PAYLOAD_COMPRESSION_LEVEL" in os.environ else None
     
     # Defaults for MVP
     extract_and_encrypt(
@@ -77,5 +77,8 @@ if __name__ == "__main__":
         "users", 
         "pre_transfer.csv.enc", 
         "pre_transfer.hash",
-        "session.key"
+        "session.key",
+        batch_size=batch_size,
+        compression=compression,
+        compression_level=compression_level
     )
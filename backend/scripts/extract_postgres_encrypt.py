@@ -1,57 +1,49 @@
-import psycopg2
-import csv
+from backend.scripts.connection_pool import connect_postgres
 import hashlib
 import os
-from cryptography.fernet import Fernet
+from backend.scripts.csv_codec import encode_csv_row, encode_csv_rows
+from backend.scripts.stream_cipher import generate_stream_key, encrypt_file
 
-def extract_and_encrypt_postgres(host, port, user, password, database, table, output_csv_enc, hash_file, key_file):
+def extract_and_encrypt_postgres(host, port, user, password, database, table, output_csv_enc, hash_file, key_file, batch_size=1000):
+    # Next to the output so concurrent runs in other directories don't collide
+    temp_csv = f"{output_csv_enc}.plain.csv"
     try:
-        conn = psycopg2.connect(
+        conn = connect_postgres(
             host=host,
             port=port,
             user=user,
             password=password,
             database=database
         )
-        cursor = conn.cursor()
+        # Named cursor => server-side cursor, rows are fetched in batches
+        cursor = conn.cursor(name=f"extract_{table}")
+        cursor.itersize = batch_size
         
-        # 1. Extract to CSV
+        # 1. Extract to CSV, streaming fetchmany batches so memory stays bounded
         cursor.execute(f"SELECT * FROM {table}")
-        rows = cursor.fetchall()
+        rows = cursor.fetchmany(batch_size)
+        # description is only populated after the first fetch on a named cursor
         column_names = [i[0] for i in cursor.description]
         
-        temp_csv = "temp_post_extract.csv"
-        with open(temp_csv, "w", newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(column_names)
-            writer.writerows(rows)
+        with open(temp_csv, "w", newline='', encoding='utf-8') as f:
+            f.write(encode_csv_row(column_names))
+            while rows:
+                f.write(encode_csv_rows(rows))
+                rows = cursor.fetchmany(batch_size)
         
-        # 2. Calculate Hash
+        # 2-3. Hash and encrypt the CSV (optional but requested) in one
+        # read: chunks are sealed with AES-GCM on the crypto pool while this
+        # thread hashes
+        key = generate_stream_key()
+        with open(key_file, "wb") as kf:
+            kf.write(key)
+            
         sha256_hash = hashlib.sha256()
-        with open(temp_csv, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
+        encrypt_file(key, temp_csv, output_csv_enc, hasher=sha256_hash)
         
         hash_val = sha256_hash.hexdigest()
         with open(hash_file, "w") as f:
             f.write(hash_val)
-            
-        # 3. Encrypt CSV (Optional but requested)
-        key = Fernet.generate_key()
-        with open(key_file, "wb") as kf:
-            kf.write(key)
-            
-        cipher_suite = Fernet(key)
-        with open(temp_csv, "rb") as f:
-            file_data = f.read()
-            
-        encrypted_data = cipher_suite.encrypt(file_data)
-        
-        with open(output_csv_enc, "wb") as f:
-            f.write(encrypted_data)
-            
-        # Cleanup
-        os.remove(temp_csv)
         
         print(f"Extraction and encryption from Postgres successful.")
         print(f"Hash: {hash_val}")
@@ -62,6 +54,10 @@ def extract_and_encrypt_postgres(host, port, user, password, database, table, ou
     except Exception as e:
         print(f"Error extracting and encrypting from Postgres: {e}")
         return False
+    finally:
+        # The plaintext extract never outlives the call, success or not
+        if os.path.exists(temp_csv):
+            os.remove(temp_csv)
 
 if __name__ == "__main__":
     host = os.getenv("POSTGRES_HOST", "localhost")
@@ -69,11 +65,13 @@ if __name__ == "__main__":
     user = os.getenv("POSTGRES_USER", "user")
     password = os.getenv("POSTGRES_PASSWORD", "password")
     database = os.getenv("POSTGRES_DB", "target_db")
+    batch_size = int(os.getenv("EXTRACT_BATCH_SIZE", 1000))
     
     extract_and_encrypt_postgres(
         host, port, user, password, database, 
         "users", 
         "post_transfer.csv.enc", 
         "post_transfer.hash",
-        "post_session.key"
+        "post_session.key",
+        batch_size=batch_size
     )
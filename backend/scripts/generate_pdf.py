@@ -1,5 +1,5 @@
 from fpdf import FPDF
-import json
+from backend.scripts.audit_logger import AuditStore
 import os
 
 class AuditReport(FPDF):
@@ -14,21 +14,17 @@ class AuditReport(FPDF):
         self.set_font('Arial', 'I', 8)
         self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
 
-def generate_pdf(audit_log_path, output_pdf_path):
+def generate_pdf(audit_log_path, output_pdf_path, entry_hash=None):
     try:
         if not os.path.exists(audit_log_path):
             print("Audit log not found. Cannot generate PDF.")
             return False
             
-        with open(audit_log_path, "r") as f:
-            logs = json.load(f)
-            
-        if not logs:
-            print("Audit log is empty.")
+        # The requested entry (concurrent jobs append to the same log), else the latest
+        entry = AuditStore(audit_log_path).get(entry_hash)
+        if entry is None:
+            print(f"Audit entry {entry_hash} not found." if entry_hash else "Audit log is empty.")
             return False
-            
-        # Get the latest entry
-        entry = logs[-1]
         data = entry["data"]
         
         pdf = AuditReport()
@@ -45,7 +41,20 @@ def generate_pdf(audit_log_path, output_pdf_path):
         pdf.set_font('Arial', '', 12)
         
         for key, value in data.items():
+            if key == "metrics":
+                continue
             pdf.cell(0, 10, f"{key.replace('_', ' ').capitalize()}: {value}", ln=True)
+
+        if data.get("metrics"):
+            # One line per pipeline stage instead of the raw metrics dict
+            pdf.ln(10)
+            pdf.set_font('Arial', 'B', 12)
+            pdf.cell(0, 10, "Performance:", ln=True)
+            pdf.set_font('Arial', '', 10)
+            for stage, m in data["metrics"]["stages"].items():
+                pdf.cell(0, 8, f"{stage}: {m['wall_seconds']:.2f}s wall, {m['cpu_seconds']:.2f}s CPU, {m['rows']} rows, "
+                               f"{m['db_round_trips']} DB round-trips, peak RSS {m['peak_rss_bytes'] / 1048576:.0f} MiB", ln=True)
+            pdf.set_font('Arial', '', 12)
             
         pdf.ln(10)
         pdf.set_font('Arial', 'B', 12)
@@ -59,4 +68,4 @@ def generate_pdf(audit_log_path, output_pdf_path):
         return False
 
 if __name__ == "__main__":
-    generate_pdf("audit_log.json", "secure_transfer_report.pdf")
+    generate_pdf("audit_log.db", "secure_transfer_report.pdf")
@@ -0,0 +1,377 @@
+from datetime import datetime
+import threading
+import sqlite3
+import time
+import uuid
+import json
+import os
+
+# Persistent transfer job queue in SQLite. The API enqueues jobs; worker
+# processes claim them one at a time, subject to limits on how many jobs may
+# run against the same source or destination database at once. Progress
+# goes to job_logs as events ("log" and "step" lines, and throttled
+# "progress" counters whose message is JSON); the row id is the cursor
+# readers use to fetch only what is new.
+#
+# Job configs include database credentials, so the file is created 0600.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT UNIQUE NOT NULL,
+    status TEXT NOT NULL,
+    config TEXT NOT NULL,
+    source_key TEXT NOT NULL,
+    destination_key TEXT NOT NULL,
+    current_step TEXT NOT NULL DEFAULT 'None',
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    worker TEXT,
+    worker_pid INTEGER,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status_source ON jobs (status, source_key);
+CREATE INDEX IF NOT EXISTS jobs_status_destination ON jobs (status, destination_key);
+CREATE TABLE IF NOT EXISTS job_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    message TEXT NOT NULL,
+    kind TEXT NOT NULL DEFAULT 'log'
+);
+CREATE INDEX IF NOT EXISTS job_logs_job ON job_logs (job_id, id);
+CREATE TABLE IF NOT EXISTS metric_totals (
+    stage TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (stage, name)
+);
+"""
+
+# Columns added after the first release, for job databases created before them
+_MIGRATIONS = [
+    ("jobs", "progress", "ALTER TABLE jobs ADD COLUMN progress TEXT"),
+    ("job_logs", "kind", "ALTER TABLE job_logs ADD COLUMN kind TEXT NOT NULL DEFAULT 'log'"),
+]
+
+
+# Explicit column order: migrated databases have the newer columns at the end
+_JOB_COLUMNS = "seq, id, status, config, source_key, destination_key, current_step, result, error, worker, worker_pid, created_at, started_at, finished_at, progress"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+class JobQueue:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        if not os.path.exists(db_path):
+            os.close(os.open(db_path, os.O_CREAT | os.O_WRONLY, 0o600))
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        for table, column, statement in _MIGRATIONS:
+            if column not in [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]:
+                conn.execute(statement)
+        conn.close()
+
+    def _connect(self):
+        # Autocommit mode; multi-statement updates use explicit BEGIN IMMEDIATE
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def enqueue(self, config, source_key, destination_key):
+        job_id = uuid.uuid4().hex
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO jobs (id, status, config, source_key, destination_key, created_at) VALUES (?, 'queued', ?, ?, ?, ?)",
+            (job_id, json.dumps(config), source_key, destination_key, datetime.now().isoformat())
+        )
+        conn.close()
+        return job_id
+
+    def claim(self, worker, max_per_source, max_per_destination):
+        # Oldest queued job whose source and destination both have a free slot
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("""
+                SELECT id, config FROM jobs AS j
+                WHERE status = 'queued'
+                  AND (SELECT COUNT(*) FROM jobs WHERE status = 'running' AND source_key = j.source_key) < ?
+                  AND (SELECT COUNT(*) FROM jobs WHERE status = 'running' AND destination_key = j.destination_key) < ?
+                ORDER BY seq LIMIT 1
+            """, (max_per_source, max_per_destination)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, worker_pid = ?, started_at = ? WHERE id = ?",
+                (worker, os.getpid(), datetime.now().isoformat(), row[0])
+            )
+            conn.execute("COMMIT")
+            return row[0], json.loads(row[1])
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def log(self, job_id, message, step=False):
+        conn = self._connect()
+        now = datetime.now().isoformat()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("INSERT INTO job_logs (job_id, created_at, message, kind) VALUES (?, ?, ?, ?)",
+                     (job_id, now, f"{now}: {message}", "step" if step else "log"))
+        if step:
+            conn.execute("UPDATE jobs SET current_step = ? WHERE id = ?", (message, job_id))
+        conn.execute("COMMIT")
+        conn.close()
+
+    def report_progress(self, job_id, progress):
+        # Latest counters on the job row, plus an event for stream readers
+        payload = json.dumps(progress)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("INSERT INTO job_logs (job_id, created_at, message, kind) VALUES (?, ?, ?, 'progress')",
+                     (job_id, datetime.now().isoformat(), payload))
+        conn.execute("UPDATE jobs SET progress = ? WHERE id = ?", (payload, job_id))
+        conn.execute("COMMIT")
+        conn.close()
+
+    def events(self, job_id, since=0, limit=500):
+        # Events after cursor `since`, oldest first
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT id, created_at, kind, message FROM job_logs WHERE job_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (job_id, since, limit)
+        ).fetchall()
+        conn.close()
+        return [
+            {"id": event_id, "created_at": created_at, "kind": kind,
+             "data": json.loads(message) if kind == "progress" else message}
+            for event_id, created_at, kind, message in rows
+        ]
+
+    def finish(self, job_id, status, result=None, error=None):
+        conn = self._connect()
+        conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+            (status, json.dumps(result) if result is not None else None, error, datetime.now().isoformat(), job_id)
+        )
+        conn.close()
+
+    def fail_running(self, job_id, error):
+        # Fails a job its worker couldn't finish; a job that already reached
+        # completed or failed keeps its outcome
+        conn = self._connect()
+        updated = conn.execute(
+            "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+            (error, datetime.now().isoformat(), job_id)
+        ).rowcount
+        conn.close()
+        return bool(updated)
+
+    def requeue_orphaned(self):
+        # Running jobs whose worker process is gone (server restart or crash)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        running = conn.execute("SELECT id, worker_pid FROM jobs WHERE status = 'running'").fetchall()
+        orphaned = [job_id for job_id, pid in running if pid is None or not _pid_alive(pid)]
+        for job_id in orphaned:
+            conn.execute("UPDATE jobs SET status = 'queued', worker = NULL, worker_pid = NULL, started_at = NULL WHERE id = ?", (job_id,))
+        conn.execute("COMMIT")
+        conn.close()
+        return orphaned
+
+    def requeue_failed(self, job_id):
+        conn = self._connect()
+        updated = conn.execute(
+            "UPDATE jobs SET status = 'queued', error = NULL, result = NULL, worker = NULL, worker_pid = NULL, started_at = NULL, finished_at = NULL "
+            "WHERE id = ? AND status = 'failed'", (job_id,)
+        ).rowcount
+        conn.close()
+        if updated:
+            self.log(job_id, "Resume requested")
+        return bool(updated)
+
+    def add_metric_totals(self, summary, record_count=0):
+        # Folds one job's PipelineMetrics summary into the running totals
+        # behind /metrics; peak RSS keeps the maximum, everything else adds up
+        values = [("pipeline", "record_count", record_count)]
+        for stage, metrics in summary["stages"].items():
+            values.append((stage, "runs", 1))
+            for name in ("wall_seconds", "cpu_seconds", "rows", "db_round_trips", "peak_rss_bytes"):
+                values.append((stage, name, metrics[name]))
+            for operation, delta in metrics["operations"].items():
+                for name in ("count", "seconds", "bytes"):
+                    values.append((stage, f"op:{operation}:{name}", delta[name]))
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            "INSERT INTO metric_totals (stage, name, value) VALUES (?, ?, ?) ON CONFLICT (stage, name) DO UPDATE SET "
+            "value = CASE WHEN name = 'peak_rss_bytes' THEN MAX(value, excluded.value) ELSE value + excluded.value END",
+            values
+        )
+        conn.execute("COMMIT")
+        conn.close()
+
+    def metric_totals(self):
+        conn = self._connect()
+        totals = {(stage, name): value for stage, name, value in conn.execute("SELECT stage, name, value FROM metric_totals")}
+        conn.close()
+        return totals
+
+    def status_counts(self):
+        conn = self._connect()
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        conn.close()
+        return counts
+
+    def running_ids(self):
+        conn = self._connect()
+        ids = [row[0] for row in conn.execute("SELECT id FROM jobs WHERE status = 'running'")]
+        conn.close()
+        return ids
+
+    def resumable_ids(self):
+        # Failed jobs /resume-transfer can still requeue, plus requeued ones
+        # no worker has claimed yet; both need their checkpoint directory
+        conn = self._connect()
+        ids = [row[0] for row in conn.execute("SELECT id FROM jobs WHERE status IN ('failed', 'queued')")]
+        conn.close()
+        return ids
+
+    def _job_dict(self, row, logs=None):
+        seq, job_id, status, _, source_key, destination_key, current_step, result, error, worker, _, created_at, started_at, finished_at, progress = row
+        job = {
+            "job_id": job_id,
+            "status": status,
+            "current_step": current_step,
+            "progress": json.loads(progress) if progress else None,
+            "source": source_key,
+            "destination": destination_key,
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "worker": worker,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+        }
+        if logs is not None:
+            job["logs"] = logs
+        return job
+
+    def get(self, job_id=None, with_logs=True, since=0):
+        # job_id None means the most recently submitted job. logs holds the
+        # log lines after cursor `since`; cursor is the newest event id.
+        conn = self._connect()
+        if job_id is None:
+            row = conn.execute(f"SELECT {_JOB_COLUMNS} FROM jobs ORDER BY seq DESC LIMIT 1").fetchone()
+        else:
+            row = conn.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        job = None
+        if row is not None:
+            logs = None
+            if with_logs:
+                logs = [r[0] for r in conn.execute(
+                    "SELECT message FROM job_logs WHERE job_id = ? AND id > ? AND kind != 'progress' ORDER BY id", (row[1], since))]
+            job = self._job_dict(row, logs)
+            job["cursor"] = conn.execute("SELECT COALESCE(MAX(id), 0) FROM job_logs WHERE job_id = ?", (row[1],)).fetchone()[0]
+        conn.close()
+        return job
+
+    def list(self, status=None, limit=50):
+        conn = self._connect()
+        if status:
+            rows = conn.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE status = ? ORDER BY seq DESC LIMIT ?", (status, limit)).fetchall()
+        else:
+            rows = conn.execute(f"SELECT {_JOB_COLUMNS} FROM jobs ORDER BY seq DESC LIMIT ?", (limit,)).fetchall()
+        conn.close()
+        return [self._job_dict(row) for row in rows]
+
+
+class JobProgress:
+    # What run_transfer_pipeline reports progress through. advance() is
+    # called once per extracted batch, possibly from several threads, and
+    # writes a progress event at most every `interval` seconds.
+    def __init__(self, queue, job_id, interval=0.5):
+        self.queue = queue
+        self.job_id = job_id
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.start_counting()
+
+    def start_counting(self, total_rows=None):
+        with self.lock:
+            self.rows = 0
+            self.bytes = 0
+            self.total_rows = total_rows
+            self.started = time.monotonic()
+            self.reported = 0.0
+            self.dirty = False
+
+    def _snapshot(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        rows_per_second = self.rows / elapsed
+        eta = None
+        if self.total_rows and rows_per_second > 0:
+            eta = max(self.total_rows - self.rows, 0) / rows_per_second
+        return {
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "total_rows": self.total_rows,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(rows_per_second, 1),
+            "bytes_per_second": round(self.bytes / elapsed, 1),
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+        }
+
+    def advance(self, rows, nbytes):
+        with self.lock:
+            self.rows += rows
+            self.bytes += nbytes
+            self.dirty = True
+            now = time.monotonic()
+            if now - self.reported < self.interval:
+                return
+            self.reported = now
+            self.dirty = False
+            snapshot = self._snapshot()
+        self.queue.report_progress(self.job_id, snapshot)
+
+    def flush(self):
+        # Final counters of a stage, even if the last batch was throttled
+        with self.lock:
+            if not self.dirty:
+                return
+            self.dirty = False
+            snapshot = self._snapshot()
+        self.queue.report_progress(self.job_id, snapshot)
+
+    def log_step(self, step_name):
+        self.flush()
+        self.queue.log(self.job_id, step_name, step=True)
+
+    def log(self, message):
+        self.queue.log(self.job_id, message)
+
+    def record_metrics(self, summary, record_count=0):
+        self.queue.add_metric_totals(summary, record_count)
+
+    def complete(self, result):
+        self.flush()
+        self.queue.finish(self.job_id, "completed", result=result)
+
+    def fail(self, error):
+        self.flush()
+        self.queue.finish(self.job_id, "failed", error=error)
@@ -0,0 +1,240 @@
+from backend.scripts.generate_keys import generate_ecc_keys
+from cryptography.hazmat.primitives import serialization, hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.fernet import Fernet, InvalidToken
+from collections import OrderedDict
+from datetime import datetime
+import threading
+import tempfile
+import hashlib
+import shutil
+import base64
+import time
+import re
+import os
+
+# In-process ECC key material for the transfer pipeline. Parsed PEM keys are
+# cached per path and reloaded when the file's mtime/size/inode changes
+# (checked at most every STAT_INTERVAL seconds), so a long-lived worker
+# parses each key once instead of once per bundle.
+#
+# Session keys are wrapped with a key-wrapping key (KEK) derived by ECDH
+# between an ephemeral key and the recipient's key, then HKDF. A
+# SessionKeyWrapper does that once and wraps every chunk/partition session
+# key of a transfer with the same KEK, so bundles of one transfer share the
+# ephemeral public key in their headers; the bundle format is unchanged.
+# The receiving side caches the KEK per ephemeral key, so it too does one
+# ECDH per transfer rather than one per bundle.
+#
+# Rotation archives the current pair in retired_keys/ next to it and
+# replaces it with a new one. Unwrapping falls back to retired private keys, so bundles
+# wrapped just before a rotation still load, and audit checkpoints signed
+# with a retired key still verify.
+
+STAT_INTERVAL = 1.0
+RETIRED_DIR = "retired_keys"
+# datetime.strftime("%Y%m%dT%H%M%S%f") prefix of an archived key file
+RETIRED_STAMP_PATTERN = r"\d{8}T\d{12}"
+KEK_CACHE_SIZE = 256
+KEY_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+_lock = threading.Lock()
+# (kind, path) -> [file signature, last stat time, key]
+_keys = {}
+# (private key path, ephemeral public key PEM) -> Fernet KEK
+_keks = OrderedDict()
+
+
+def _file_signature(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _load(kind, path):
+    path = os.path.abspath(path)
+    now = time.monotonic()
+    with _lock:
+        cached = _keys.get((kind, path))
+        if cached and now - cached[1] < STAT_INTERVAL:
+            return cached[2]
+    # FileNotFoundError propagates, and drops the cached key with it
+    try:
+        signature = _file_signature(path)
+    except FileNotFoundError:
+        with _lock:
+            _keys.pop((kind, path), None)
+        raise
+    if cached and cached[0] == signature:
+        with _lock:
+            cached[1] = now
+        return cached[2]
+    with open(path, "rb") as f:
+        data = f.read()
+    if kind == "private":
+        key = serialization.load_pem_private_key(data, password=None)
+    else:
+        key = serialization.load_pem_public_key(data)
+    with _lock:
+        _keys[(kind, path)] = [signature, now, key]
+    return key
+
+
+def load_public_key(path):
+    return _load("public", path)
+
+
+def load_private_key(path):
+    return _load("private", path)
+
+
+def ensure_keys(private_key_path, public_key_path):
+    # Generates the pair if either half is missing; True if it did
+    try:
+        load_private_key(private_key_path)
+        load_public_key(public_key_path)
+        return False
+    except FileNotFoundError:
+        pass
+    directory = os.path.dirname(os.path.abspath(private_key_path))
+    if os.path.isdir(directory):
+        generate_ecc_keys(private_key_path, public_key_path)
+        return True
+    # A new named key is built in a staging directory and renamed into
+    # place, so workers creating it concurrently can't mix halves of two pairs
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{os.path.basename(directory)}.", dir=parent)
+    generate_ecc_keys(os.path.join(staging, os.path.basename(private_key_path)), os.path.join(staging, os.path.basename(public_key_path)))
+    try:
+        os.rename(staging, directory)
+    except OSError:
+        # Another worker got there first
+        shutil.rmtree(staging, ignore_errors=True)
+        return False
+    return True
+
+
+def key_fingerprint(public_key):
+    der = public_key.public_bytes(encoding=serialization.Encoding.DER, format=serialization.PublicFormat.SubjectPublicKeyInfo)
+    return hashlib.sha256(der).hexdigest()[:32]
+
+
+def named_key_paths(key_dir, name):
+    # (private, public) for a named recipient key under key_dir/<name>/
+    if not KEY_NAME_PATTERN.match(name or ""):
+        raise ValueError(f"Invalid key name: {name!r}")
+    return os.path.join(key_dir, name, "private_key.pem"), os.path.join(key_dir, name, "public_key.pem")
+
+
+def _retired_paths(path):
+    # Retired copies of path, newest first. Matched on the exact archived name
+    # (rotate_keys' timestamp + "_" + basename): a plain "*_private_key.pem"
+    # would also pick up audit_signing_private_key.pem's copies.
+    directory = os.path.join(os.path.dirname(os.path.abspath(path)), RETIRED_DIR)
+    pattern = re.compile(RETIRED_STAMP_PATTERN + "_" + re.escape(os.path.basename(path)))
+    if not os.path.isdir(directory):
+        return []
+    return sorted((os.path.join(directory, name) for name in os.listdir(directory) if pattern.fullmatch(name)), reverse=True)
+
+
+def rotate_keys(private_key_path, public_key_path):
+    # The new pair is written next to the old one and the old pair is
+    # hard-linked (or copied) into retired_keys/ before os.replace swaps the
+    # new files in, so the live paths always hold a key. Returns the new
+    # fingerprint.
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    new_private, new_public = f"{private_key_path}.{stamp}.new", f"{public_key_path}.{stamp}.new"
+    os.makedirs(os.path.dirname(os.path.abspath(private_key_path)), exist_ok=True)
+    generate_ecc_keys(new_private, new_public)
+    retired = os.path.join(os.path.dirname(os.path.abspath(private_key_path)), RETIRED_DIR)
+    os.makedirs(retired, exist_ok=True)
+    for path in (private_key_path, public_key_path):
+        if os.path.exists(path):
+            archived = os.path.join(retired, f"{stamp}_{os.path.basename(path)}")
+            try:
+                os.link(path, archived)
+            except OSError:
+                shutil.copy2(path, archived)
+    os.replace(new_private, private_key_path)
+    os.replace(new_public, public_key_path)
+    with _lock:
+        for kind, path in (("private", private_key_path), ("public", public_key_path)):
+            _keys.pop((kind, os.path.abspath(path)), None)
+    return key_fingerprint(load_public_key(public_key_path))
+
+
+def private_key_candidates(private_key_path):
+    # Current key first, then retired keys newest first
+    paths = [private_key_path] if os.path.exists(private_key_path) else []
+    return [load_private_key(path) for path in paths + _retired_paths(private_key_path)]
+
+
+def public_key_candidates(public_key_path):
+    paths = [public_key_path] if os.path.exists(public_key_path) else []
+    return [load_public_key(path) for path in paths + _retired_paths(public_key_path)]
+
+
+def key_info(private_key_path, public_key_path):
+    public_key = load_public_key(public_key_path)
+    return {
+        "fingerprint": key_fingerprint(public_key),
+        "created_at": datetime.fromtimestamp(os.path.getmtime(public_key_path)).isoformat(),
+        "retired": [key_fingerprint(load_public_key(path)) for path in _retired_paths(public_key_path)],
+    }
+
+
+def _derive_kek(shared_secret):
+    derived_key = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b'session key encryption',
+    ).derive(shared_secret)
+    return Fernet(base64.urlsafe_b64encode(derived_key))
+
+
+class SessionKeyWrapper:
+    # One ephemeral ECDH + HKDF; wrap() then costs one Fernet encryption
+    def __init__(self, receiver_public_key):
+        ephemeral_private_key = ec.generate_private_key(ec.SECP256R1())
+        self.kek = _derive_kek(ephemeral_private_key.exchange(ec.ECDH(), receiver_public_key))
+        self.ephemeral_pub_bytes = ephemeral_private_key.public_key().public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+
+    def wrap(self, session_key):
+        return self.ephemeral_pub_bytes, self.kek.encrypt(session_key)
+
+
+def unwrap_with_private_key(receiver_private_key, eph_pub_bytes, enc_session_key):
+    ephemeral_public_key = serialization.load_pem_public_key(eph_pub_bytes)
+    return _derive_kek(receiver_private_key.exchange(ec.ECDH(), ephemeral_public_key)).decrypt(enc_session_key)
+
+
+def unwrap_session_key_for(private_key_path, eph_pub_bytes, enc_session_key):
+    # KEKs are cached per ephemeral key, so the bundles of one transfer cost
+    # one ECDH between them; the first bundle also picks which of the current
+    # and retired private keys the transfer was wrapped for
+    cache_key = (os.path.abspath(private_key_path), eph_pub_bytes)
+    with _lock:
+        kek = _keks.get(cache_key)
+        if kek is not None:
+            _keks.move_to_end(cache_key)
+    if kek is not None:
+        return kek.decrypt(enc_session_key)
+
+    ephemeral_public_key = serialization.load_pem_public_key(eph_pub_bytes)
+    for private_key in private_key_candidates(private_key_path):
+        kek = _derive_kek(private_key.exchange(ec.ECDH(), ephemeral_public_key))
+        try:
+            session_key = kek.decrypt(enc_session_key)
+        except InvalidToken:
+            continue
+        with _lock:
+            _keks[cache_key] = kek
+            while len(_keks) > KEK_CACHE_SIZE:
+                _keks.popitem(last=False)
+        return session_key
+    raise ValueError("Session key does not unwrap with the current or any retired private key")
@@ -1,10 +1,16 @@
-import mysql.connector
+from backend.scripts.connection_pool import connect_mysql
+from backend.scripts.bulk_load_mysql import bulk_load_rows
 import sys
 import os
 
-def load_dummy_data(host, port, user, password, database):
+# Seeds above this size go through the bulk loader (LOAD DATA LOCAL INFILE
+# where the server allows it) instead of a single executemany
+BULK_SEED_THRESHOLD = 10000
+
+
+def load_dummy_data(host, port, user, password, database, row_count=20, bulk_method="auto"):
     try:
-        conn = mysql.connector.connect(
+        conn = connect_mysql(
             host=host,
             port=port,
             user=user,
@@ -24,14 +30,18 @@ def load_dummy_data(host, port, user, password, database):
         """)
 
         # Sample data generation
-        users = [(f'User {i}', f'user{i}@example.com') for i in range(1, 21)]
+        users = ((f'User {i}', f'user{i}@example.com') for i in range(1, row_count + 1))
 
         # Clear existing data for fresh start
         cursor.execute("TRUNCATE TABLE users")
 
-        cursor.executemany("INSERT INTO users (name, email) VALUES (%s, %s)", users)
-        conn.commit()
-        print(f"Successfully loaded {len(users)} records into MySQL.")
+        if row_count < BULK_SEED_THRESHOLD:
+            cursor.executemany("INSERT INTO users (name, email) VALUES (%s, %s)", list(users))
+            conn.commit()
+        else:
+            conn.commit()
+            bulk_load_rows((host, port, user, password, database), "users", ["name", "email"], users, method=bulk_method)
+        print(f"Successfully loaded {row_count} records into MySQL.")
         
         cursor.close()
         conn.close()
@@ -48,4 +58,6 @@ if __name__ == "__main__":
     password = os.getenv("MYSQL_PASSWORD", "password")
     database = os.getenv("MYSQL_DATABASE", "source_db")
     
-    load_dummy_data(host, port, user, password, database)
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    
+    load_dummy_data(host, port, user, password, database, row_count)
@@ -0,0 +1,162 @@
+from backend.scripts.pipeline_metrics import timed
+from backend.scripts.stream_pipeline import stream_transfer, iter_csv_chunks
+from backend.scripts.key_manager import SessionKeyWrapper, load_public_key
+from backend.scripts.transfer_to_postgres import prepare_destination_table
+from concurrent.futures import ThreadPoolExecutor
+from backend.scripts.connection_pool import connect_mysql, connect_postgres, POOL_SETTINGS
+import hashlib
+import json
+import os
+
+# Range-partitioned transfer: the source table is split on an integer primary
+# key into N slices, each slice is extracted, encrypted and COPY-loaded by its
+# own worker over its own MySQL and Postgres connections. Every slice gets its
+# own SHA-256 digest; the transfer-level hash is SHA-256 over the slice digests
+# in key order, so both sides can be compared without a global serial pass.
+#
+# Each worker holds a pooled connection per side for its whole slice, so at
+# most POOL_SETTINGS["max_size"] slices run at once; the rest queue in the
+# executor instead of timing out in ConnectionPool.acquire.
+
+def split_key_range(min_key, max_key, partitions):
+    if partitions < 1:
+        raise ValueError(f"partitions must be at least 1, got {partitions}")
+    if min_key is None:
+        # Empty table: a single empty slice keeps both sides comparable
+        return [(0, 0)]
+    if not all(isinstance(k, int) and not isinstance(k, bool) for k in (min_key, max_key)):
+        raise ValueError(f"Range partitioning needs an integer key column, got {type(min_key).__name__} keys")
+    span = max_key - min_key + 1
+    partitions = max(1, min(partitions, span))
+    step = -(-span // partitions)
+    ranges = []
+    lo = min_key
+    while lo <= max_key:
+        hi = min(lo + step - 1, max_key)
+        ranges.append((lo, hi))
+        lo = hi + 1
+    return ranges
+
+def get_key_bounds(host, port, user, password, database, table, key_column):
+    conn = connect_mysql(
+        host=host,
+        port=port,
+        user=user,
+        password=password,
+        database=database
+    )
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT MIN({key_column}), MAX({key_column}) FROM {table}")
+    min_key, max_key = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    return min_key, max_key
+
+def get_partition_ranges(host, port, user, password, database, table, key_column, partitions):
+    return split_key_range(*get_key_bounds(host, port, user, password, database, table, key_column), partitions)
+
+def partition_workers(max_workers, partitions):
+    # Concurrent slices: never more than one pool can hand out at once
+    return max(1, min(max_workers or partitions, partitions, POOL_SETTINGS["max_size"]))
+
+def partition_query(table, key_column):
+    # BETWEEN is inclusive on both ends and ranges never overlap
+    return f"SELECT * FROM {table} WHERE {key_column} BETWEEN %s AND %s ORDER BY {key_column}"
+
+def combine_partition_digests(digests):
+    combined = hashlib.sha256()
+    for digest in digests:
+        combined.update(bytes.fromhex(digest))
+    return combined.hexdigest()
+
+def write_partition_manifest(manifest_path, hash_file, ranges, digests):
+    combined = combine_partition_digests(digests)
+    with open(hash_file, "w") as f:
+        f.write(combined)
+    with open(manifest_path, "w") as f:
+        json.dump({
+            "combined_hash": combined,
+            "partitions": [
+                {"range": [lo, hi], "hash": digest}
+                for (lo, hi), digest in zip(ranges, digests)
+            ]
+        }, f, indent=4)
+    return combined
+
+def partitioned_transfer(mysql_params, postgres_params, table, key_column, partitions, public_key_path, private_key_path, hash_file, manifest_path, bundle_dir=".", batch_size=1000, max_workers=None, payload_format="csv", compression=None, compression_level=None, on_batch=None):
+    # mysql_params / postgres_params: (host, port, user, password, database)
+    try:
+        # 1. Split the key space
+        ranges = get_partition_ranges(*mysql_params, table, key_column, partitions)
+
+        # 2. Prepare (create + truncate) the destination once, before concurrent COPYs
+        host, port, user, password, database = postgres_params
+        conn = connect_postgres(host=host, port=port, user=user, password=password, database=database)
+        cursor = conn.cursor()
+        prepare_destination_table(cursor, table)
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+        # 3. Each worker streams one slice: extract -> hash -> encrypt -> bundle -> COPY
+        query = partition_query(table, key_column)
+        # One key-wrapping key for every slice's session key
+        key_wrapper = SessionKeyWrapper(load_public_key(public_key_path))
+
+        def run_partition(index):
+            lo, hi = ranges[index]
+            part_hash = f"{hash_file}.part{index}"
+            part_bundle = os.path.join(bundle_dir, f"encrypted_payload.part{index}.bundle")
+            if not stream_transfer(mysql_params, postgres_params, table, public_key_path, private_key_path, part_hash,
+                                   bundle_path=part_bundle, batch_size=batch_size, query=query, query_params=(lo, hi), prepare_table=False,
+                                   payload_format=payload_format, compression=compression, compression_level=compression_level, on_batch=on_batch,
+                                   key_wrapper=key_wrapper):
+                raise Exception(f"Partition {index} ({lo}-{hi}) failed")
+            with open(part_hash, "r") as f:
+                digest = f.read().strip()
+            os.remove(part_hash)
+            return digest
+
+        with ThreadPoolExecutor(max_workers=partition_workers(max_workers, len(ranges))) as pool:
+            digests = list(pool.map(run_partition, range(len(ranges))))
+
+        # 4. Combine per-slice digests into the transfer-level hash
+        combined = write_partition_manifest(manifest_path, hash_file, ranges, digests)
+        print(f"Partitioned transfer successful ({len(ranges)} partitions). Hash: {combined}")
+        return True
+    except Exception as e:
+        print(f"Error during partitioned transfer: {e}")
+        return False
+
+def hash_postgres_partition(host, port, user, password, database, table, key_column, lo, hi, batch_size=1000):
+    conn = connect_postgres(host=host, port=port, user=user, password=password, database=database)
+    cursor = conn.cursor(name=f"verify_{table}_{lo}")
+    cursor.itersize = batch_size
+    cursor.execute(partition_query(table, key_column), (lo, hi))
+    sha256_hash = hashlib.sha256()
+    for chunk in iter_csv_chunks(cursor, batch_size):
+        with timed("hash", len(chunk)):
+            sha256_hash.update(chunk)
+    cursor.close()
+    conn.close()
+    return sha256_hash.hexdigest()
+
+def partitioned_verify_postgres(postgres_params, table, key_column, source_manifest_path, hash_file, manifest_path, batch_size=1000, max_workers=None):
+    try:
+        # Re-hash the destination over exactly the slices used on the source
+        with open(source_manifest_path, "r") as f:
+            ranges = [tuple(p["range"]) for p in json.load(f)["partitions"]]
+
+        def run_partition(bounds):
+            lo, hi = bounds
+            return hash_postgres_partition(*postgres_params, table, key_column, lo, hi, batch_size)
+
+        with ThreadPoolExecutor(max_workers=partition_workers(max_workers, len(ranges))) as pool:
+            digests = list(pool.map(run_partition, ranges))
+
+        combined = write_partition_manifest(manifest_path, hash_file, ranges, digests)
+        print(f"Partitioned verification hash from Postgres: {combined}")
+        return True
+    except Exception as e:
+        print(f"Error verifying partitions in Postgres: {e}")
+        return False
@@ -0,0 +1,98 @@
+import threading
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+# Per-chunk compression applied before encryption (ciphertext doesn't
+# compress). Each chunk is compressed on its own so the loader can still
+# decrypt and decompress in a single streaming pass. gzip uses the standard
+# library; zstd and lz4 need the zstandard / lz4 packages.
+#
+# Decompression is bounded by the stream's chunk size, so a crafted chunk
+# can't inflate past it, and a chunk that doesn't end exactly at the end of
+# its compressed frame is rejected.
+
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3, "lz4": 0}
+
+
+def _check_output(out, max_size, eof, leftover):
+    # Decompressors are given max_size + 1 bytes of room, so a full-size
+    # chunk still reaches its end-of-frame marker
+    if len(out) > max_size:
+        raise ValueError("Decompressed chunk exceeds the chunk size")
+    if not eof:
+        raise ValueError("Compressed chunk is truncated")
+    if leftover:
+        raise ValueError("Unexpected data after the compressed chunk")
+
+
+class _GzipCodec:
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data, max_size):
+        # wbits 47 reads gzip framing, and the zlib framing of older bundles
+        decompressor = zlib.decompressobj(47)
+        out = decompressor.decompress(data, max_size + 1)
+        _check_output(out, max_size, decompressor.eof, decompressor.unused_data)
+        return out
+
+
+class _ZstdCodec:
+    # zstandard contexts must not be used by two threads at once, and chunks
+    # are (de)compressed on stream_cipher's crypto pool: one pair per thread
+    def __init__(self, level):
+        self.level = level
+        self.local = threading.local()
+
+    def _contexts(self):
+        if not hasattr(self.local, "compressor"):
+            self.local.compressor = zstandard.ZstdCompressor(level=self.level)
+            self.local.decompressor = zstandard.ZstdDecompressor()
+        return self.local
+
+    def compress(self, data):
+        return self._contexts().compressor.compress(data)
+
+    def decompress(self, data, max_size):
+        return self._contexts().decompressor.decompress(data, max_output_size=max_size)
+
+
+class _Lz4Codec:
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        return lz4.frame.compress(data, compression_level=self.level)
+
+    def decompress(self, data, max_size):
+        decompressor = lz4.frame.LZ4FrameDecompressor()
+        out = decompressor.decompress(data, max_length=max_size + 1)
+        _check_output(out, max_size, decompressor.eof, decompressor.unused_data)
+        return out
+
+
+def get_codec(name, level=None):
+    # Returns None for "none" so callers can skip the stage entirely
+    if name in (None, "none"):
+        return None
+    if name not in DEFAULT_LEVELS:
+        raise ValueError(f"Unknown compression codec: {name}")
+    if name == "zstd" and zstandard is None:
+        raise RuntimeError("zstd compression requires the zstandard package (pip install zstandard)")
+    if name == "lz4" and lz4 is None:
+        raise RuntimeError("lz4 compression requires the lz4 package (pip install lz4)")
+    level = DEFAULT_LEVELS[name] if level is None else level
+    return {"gzip": _GzipCodec, "zstd": _ZstdCodec, "lz4": _Lz4Codec}[name](level)
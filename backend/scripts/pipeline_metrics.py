@@ -0,0 +1,177 @@
+from contextlib import contextmanager
+import threading
+import resource
+import time
+
+# Transfer instrumentation. Hot paths (DB calls, hashing, compression,
+# AES-GCM) report into process-wide operation counters through observe() /
+# timed(); a job's PipelineMetrics snapshots those counters at each stage
+# boundary, so stage figures are deltas. This relies on a worker
+# process running one job at a time, as transfer_worker does.
+#
+# Operations: db_execute, db_fetch (rows), db_copy (includes decrypting the
+# payload COPY reads), hash, compress, decompress, encrypt, decrypt.
+
+_lock = threading.Lock()
+_operations = {}
+
+
+def observe(operation, seconds, nbytes=0, rows=0):
+    with _lock:
+        entry = _operations.get(operation)
+        if entry is None:
+            entry = _operations[operation] = {"count": 0, "seconds": 0.0, "bytes": 0, "rows": 0}
+        entry["count"] += 1
+        entry["seconds"] += seconds
+        entry["bytes"] += nbytes
+        entry["rows"] += rows
+
+
+@contextmanager
+def timed(operation, nbytes=0):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(operation, time.perf_counter() - started, nbytes)
+
+
+def operation_totals():
+    with _lock:
+        return {name: dict(entry) for name, entry in _operations.items()}
+
+
+def reset_peak_rss():
+    # Linux only: makes VmHWM track this job instead of the worker's lifetime
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_bytes():
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux (bytes on macOS) and never resets
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _rate(amount, seconds):
+    return round(amount / seconds, 1) if seconds > 0 else None
+
+
+class PipelineMetrics:
+    # Stages follow each other like the pipeline's log_step calls: begin()
+    # closes the running stage and opens the next, finish() closes the last
+    def __init__(self):
+        self.stages = {}
+        self.current = None
+        reset_peak_rss()
+
+    def begin(self, name):
+        self.finish()
+        self.current = (name, operation_totals(), time.perf_counter(), time.process_time())
+
+    def finish(self):
+        if self.current is None:
+            return
+        name, before, wall, cpu = self.current
+        self.current = None
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        operations = {}
+        for operation, entry in operation_totals().items():
+            previous = before.get(operation, {"count": 0, "seconds": 0.0, "bytes": 0, "rows": 0})
+            delta = {key: entry[key] - previous[key] for key in entry}
+            if delta["count"]:
+                delta["seconds"] = round(delta["seconds"], 6)
+                delta["bytes_per_second"] = _rate(delta["bytes"], delta["seconds"])
+                operations[operation] = delta
+        rows = operations.get("db_fetch", {}).get("rows", 0)
+        self.stages[name] = {
+            "wall_seconds": round(wall, 6),
+            "cpu_seconds": round(cpu, 6),
+            "rows": rows,
+            "rows_per_second": _rate(rows, wall),
+            "db_round_trips": sum(delta["count"] for operation, delta in operations.items() if operation.startswith("db_")),
+            "peak_rss_bytes": peak_rss_bytes(),
+            "operations": operations,
+        }
+
+    def summary(self):
+        return {
+            "stages": self.stages,
+            "wall_seconds": round(sum(s["wall_seconds"] for s in self.stages.values()), 6),
+            "cpu_seconds": round(sum(s["cpu_seconds"] for s in self.stages.values()), 6),
+            "peak_rss_bytes": max((s["peak_rss_bytes"] for s in self.stages.values()), default=peak_rss_bytes()),
+        }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def render_prometheus(totals, job_counts, pools):
+    # totals: {(stage, name): value} as kept by JobQueue.add_metric_totals
+    lines = []
+
+    def family(metric, kind, help_text, samples):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for labels, value in samples:
+            lines.append(f"{metric}{_labels(**labels)} {value}")
+
+    family("transfer_jobs", "gauge", "Transfer jobs by status",
+           [({"status": status}, count) for status, count in sorted(job_counts.items())])
+
+    stage_metrics = [
+        ("runs", "transfer_stage_runs_total", "counter", "Completed runs of each pipeline stage"),
+        ("wall_seconds", "transfer_stage_wall_seconds_total", "counter", "Wall-clock seconds spent in each pipeline stage"),
+        ("cpu_seconds", "transfer_stage_cpu_seconds_total", "counter", "Worker CPU seconds spent in each pipeline stage"),
+        ("rows", "transfer_stage_rows_total", "counter", "Rows fetched from MySQL or Postgres in each pipeline stage"),
+        ("db_round_trips", "transfer_stage_db_round_trips_total", "counter", "Driver calls (execute, fetch, COPY) in each pipeline stage"),
+        ("peak_rss_bytes", "transfer_stage_peak_rss_bytes", "gauge", "Highest worker peak RSS observed in each pipeline stage"),
+    ]
+    for name, metric, kind, help_text in stage_metrics:
+        family(metric, kind, help_text,
+               [({"stage": stage}, value) for (stage, key), value in sorted(totals.items()) if key == name])
+
+    operation_metrics = [
+        ("count", "transfer_operation_calls_total", "Hot-path operation calls"),
+        ("seconds", "transfer_operation_seconds_total", "Seconds spent in hot-path operations"),
+        ("bytes", "transfer_operation_bytes_total", "Bytes processed by hot-path operations"),
+    ]
+    for name, metric, help_text in operation_metrics:
+        samples = []
+        for (stage, key), value in sorted(totals.items()):
+            parts = key.split(":")
+            if len(parts) == 3 and parts[0] == "op" and parts[2] == name:
+                samples.append(({"stage": stage, "operation": parts[1]}, value))
+        family(metric, "counter", help_text, samples)
+
+    family("transfer_records_total", "counter", "Rows extracted by completed transfers",
+           [({}, totals.get(("pipeline", "record_count"), 0))])
+
+    pool_metrics = [
+        ("idle", "db_pool_idle_connections", "gauge", "Idle connections in API process pools"),
+        ("in_use", "db_pool_in_use_connections", "gauge", "Checked-out connections in API process pools"),
+        ("created", "db_pool_connections_created_total", "counter", "Connections opened by API process pools"),
+        ("reused", "db_pool_connections_reused_total", "counter", "Connections reused by API process pools"),
+        ("wait_seconds", "db_pool_wait_seconds_total", "counter", "Seconds spent waiting for a free pooled connection"),
+    ]
+    for name, metric, kind, help_text in pool_metrics:
+        family(metric, kind, help_text, [({"pool": pool["name"]}, pool[name]) for pool in pools])
+
+    return "\n".join(lines) + "\n"
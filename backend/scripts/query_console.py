@@ -0,0 +1,314 @@
+from backend.scripts.connection_pool import connect_mysql, connect_postgres
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+import psycopg2
+import base64
+import hashlib
+import json
+import re
+
+# SQL console helpers behind /execute-query. Rows are serialised one at a
+# time as they come off the cursor, every mode stops at a row and byte cap,
+# and pagination wraps the user's statement in a LIMIT query so only one page
+# is ever read. "target" is "source" (MySQL) or anything else (Postgres).
+#
+# An ORDER BY inside the wrapped statement doesn't order the outer query
+# (MySQL drops it from derived tables), so pages are ordered on the outside:
+# by page_key for keyset paging, or by an explicit order_by for LIMIT/OFFSET.
+# OFFSET paging without either is rejected rather than returning rows in an
+# order that can change from one page request to the next.
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+# One order_by term: a column name, optionally ASC / DESC
+_ORDER_TERM = re.compile(r"^\s*[A-Za-z_][A-Za-z0-9_]*(\s+(asc|desc))?\s*$", re.IGNORECASE)
+# Statements worth running on a Postgres server-side cursor
+_ROW_STATEMENT = re.compile(r"^\s*(\(|select\b|with\b|values\b|table\b)", re.IGNORECASE)
+
+
+def open_console_connection(target, host, port, user, password, database):
+    if target == "source":
+        return connect_mysql(host=host, port=port, user=user, password=password, database=database)
+    return connect_postgres(host=host, port=port, user=user, password=password, database=database)
+
+
+def set_statement_timeout(cursor, target, timeout_ms):
+    # Let the server abandon the statement too, not just the HTTP request.
+    # MySQL's limit only covers SELECTs and is session-wide, so it is reset
+    # before the pooled connection goes back; Postgres' ends with the transaction.
+    if target == "source":
+        cursor.execute("SET SESSION max_execution_time = %s", (timeout_ms,))
+    else:
+        cursor.execute("SET LOCAL statement_timeout = %s", (timeout_ms,))
+
+
+def clear_statement_timeout(cursor, target):
+    if target == "source":
+        cursor.execute("SET SESSION max_execution_time = 0")
+
+
+def release_console_connection(conn, target):
+    # Back to the pool without the session timeout; a connection that can't
+    # take the reset (e.g. an unread MySQL result) is dropped instead
+    try:
+        clear_statement_timeout(conn.cursor(), target)
+    except Exception:
+        conn.discard()
+        return
+    conn.close()
+
+
+def declare_server_cursor(conn, cursor, query):
+    # Postgres: run a row-returning statement on a named cursor so rows stay
+    # on the server until fetched; a plain cursor would buffer the whole
+    # result in execute(), before any cap applies. Returns None if the
+    # statement can't be declared (e.g. WITH ... DELETE), rolled back to
+    # before the attempt so it can run on the plain cursor instead.
+    cursor.execute("SAVEPOINT console_declare")
+    named = conn.cursor(name="console_query")
+    try:
+        named.execute(query)
+    except psycopg2.Error:
+        cursor.execute("ROLLBACK TO SAVEPOINT console_declare")
+        return None
+    return named
+
+
+def _json_default(value):
+    # Same conversions FastAPI's encoder applied to the old list-of-dicts body
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode("utf-8", errors="replace")
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return str(value)
+
+
+def row_json(columns, row):
+    return json.dumps(dict(zip(columns, row)), default=_json_default)
+
+
+def query_fingerprint(target, query, page_key, order_by=None):
+    # Ties a continuation token to the statement (and ordering) it was issued for
+    return hashlib.sha256(f"{target}\0{page_key or ''}\0{order_by or ''}\0{query}".encode("utf-8")).hexdigest()[:16]
+
+
+def encode_page_token(fingerprint, position):
+    payload = json.dumps({"q": fingerprint, "p": position}, default=_json_default)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_page_token(token, fingerprint):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except Exception:
+        raise ValueError("Malformed continuation token")
+    if payload.get("q") != fingerprint:
+        raise ValueError("Continuation token belongs to a different query")
+    return payload["p"]
+
+
+def page_query(query, page_key, page_size, position, order_by=None):
+    # One extra row tells us whether another page exists. The user's SQL is
+    # embedded in a derived table, so literal % signs are escaped for the
+    # drivers' %s parameter style.
+    inner = query.strip().rstrip(";").replace("%", "%%")
+    if page_key:
+        # Keyset: resume after the last key seen, cheap at any depth
+        if not _IDENTIFIER.match(page_key):
+            raise ValueError(f"Invalid page_key: {page_key}")
+        if position is None:
+            return f"SELECT * FROM ({inner}) AS console_page ORDER BY {page_key} LIMIT %s", (page_size + 1,)
+        return (f"SELECT * FROM ({inner}) AS console_page WHERE {page_key} > %s ORDER BY {page_key} LIMIT %s",
+                (position, page_size + 1))
+    # LIMIT/OFFSET for statements without a usable key; order_by should be
+    # unique (or end in a unique column) so ties can't straddle pages
+    if not order_by:
+        raise ValueError("Paginated queries need a page_key or an order_by: without an outer ORDER BY, "
+                         "LIMIT/OFFSET pages can skip or repeat rows")
+    terms = order_by.split(",")
+    if not all(_ORDER_TERM.match(term) for term in terms):
+        raise ValueError(f"Invalid order_by: {order_by}")
+    order = ", ".join(" ".join(term.split()) for term in terms)
+    return f"SELECT * FROM ({inner}) AS console_page ORDER BY {order} LIMIT %s OFFSET %s", (page_size + 1, position or 0)
+
+
+def collect_rows(cursor, max_rows, max_bytes, batch_size=500):
+    # Returns (serialised rows, truncated); reads at most max_rows + 1 rows
+    encoded = []
+    size = 0
+    columns = None
+    while True:
+        rows = cursor.fetchmany(min(batch_size, max_rows + 1 - len(encoded)))
+        # Named (server-side) psycopg2 cursors only expose description after a fetch
+        if columns is None:
+            columns = [i[0] for i in cursor.description]
+        if not rows:
+            return encoded, False
+        for row in rows:
+            item = row_json(columns, row)
+            size += len(item) + 1
+            if len(encoded) >= max_rows or size > max_bytes:
+                return encoded, True
+            encoded.append(item)
+
+
+def run_console_query(target, db_params, query, timeout_ms, max_rows, max_bytes):
+    # Returns (JSON body, truncated); the body is a list of row objects, or a
+    # message object for statements that return no rows
+    conn = open_console_connection(target, *db_params)
+    cursor = conn.cursor()
+    truncated = False
+    try:
+        set_statement_timeout(cursor, target, timeout_ms)
+        named = None
+        if target != "source" and _ROW_STATEMENT.match(query):
+            named = declare_server_cursor(conn, cursor, query)
+        if named is not None:
+            encoded, truncated = collect_rows(named, max_rows, max_bytes)
+            named.close()
+            body = "[" + ",".join(encoded) + "]"
+        else:
+            cursor.execute(query)
+            if cursor.description:
+                encoded, truncated = collect_rows(cursor, max_rows, max_bytes)
+                body = "[" + ",".join(encoded) + "]"
+            else:
+                conn.commit()
+                body = json.dumps({"message": "Query executed successfully."})
+    except Exception:
+        # The pool rolls back, or drops the connection if that fails
+        release_console_connection(conn, target)
+        raise
+    if truncated and target == "source":
+        # Draining the rest of an unread MySQL result costs more than reconnecting
+        conn.discard()
+        return body, truncated
+    cursor.close()
+    release_console_connection(conn, target)
+    return body, truncated
+
+
+def run_console_page(target, db_params, query, timeout_ms, page_size, continuation_token, page_key, max_bytes, order_by=None):
+    fingerprint = query_fingerprint(target, query, page_key, order_by)
+    position = decode_page_token(continuation_token, fingerprint) if continuation_token else None
+    sql, params = page_query(query, page_key, page_size, position, order_by)
+
+    conn = open_console_connection(target, *db_params)
+    cursor = conn.cursor()
+    try:
+        set_statement_timeout(cursor, target, timeout_ms)
+        cursor.execute(sql, params)
+        columns = [i[0] for i in cursor.description]
+        rows = cursor.fetchall()
+    except Exception:
+        # The pool rolls back, or drops the connection if that fails
+        release_console_connection(conn, target)
+        raise
+    cursor.close()
+    release_console_connection(conn, target)
+
+    encoded = []
+    size = 0
+    for row in rows[:page_size]:
+        item = row_json(columns, row)
+        size += len(item) + 1
+        if encoded and size > max_bytes:
+            # Byte cap: end the page early; the token resumes from here
+            break
+        encoded.append(item)
+
+    next_token = None
+    if len(encoded) < len(rows):
+        if page_key:
+            last = rows[len(encoded) - 1][columns.index(page_key)]
+            next_token = encode_page_token(fingerprint, last)
+        else:
+            next_token = encode_page_token(fingerprint, (position or 0) + len(encoded))
+    return '{"rows":[' + ",".join(encoded) + '],"continuation_token":' + json.dumps(next_token) + "}"
+
+
+class ConsoleStream:
+    # Rows straight off a server-side cursor, as NDJSON batches. open() runs
+    # the statement and reads the first batch so SQL errors surface before
+    # the HTTP response starts; the final line reports how the stream ended.
+    def __init__(self, target, db_params, query, timeout_ms, max_rows, max_bytes, batch_size=500):
+        self.target = target
+        self.db_params = db_params
+        self.query = query
+        self.timeout_ms = timeout_ms
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.conn = None
+        self.cursor = None
+        self.pending = None
+        self.rows_sent = 0
+        self.bytes_sent = 0
+        self.finished = False
+
+    def open(self):
+        self.conn = open_console_connection(self.target, *self.db_params)
+        try:
+            if self.target == "source":
+                # Unbuffered: rows stay on the server socket until fetched
+                self.cursor = self.conn.cursor(buffered=False)
+                set_statement_timeout(self.cursor, self.target, self.timeout_ms)
+            else:
+                set_statement_timeout(self.conn.cursor(), self.target, self.timeout_ms)
+                # Named cursor: Postgres keeps the result set server-side
+                self.cursor = self.conn.cursor(name="console_stream")
+                self.cursor.itersize = self.batch_size
+            self.cursor.execute(self.query)
+            self.pending = self.cursor.fetchmany(self.batch_size)
+            if self.cursor.description is None:
+                raise ValueError("Streaming mode needs a statement that returns rows")
+            self.columns = [i[0] for i in self.cursor.description]
+        except Exception:
+            self.close()
+            raise
+
+    def next_chunk(self):
+        # Returns the next NDJSON bytes, or None once the trailer has been sent
+        if self.finished:
+            return None
+        rows = self.pending if self.pending is not None else self.cursor.fetchmany(self.batch_size)
+        self.pending = None
+        lines = []
+        truncated_by = None
+        for row in rows:
+            line = row_json(self.columns, row) + "\n"
+            if self.rows_sent >= self.max_rows:
+                truncated_by = "rows"
+            elif self.bytes_sent + len(line) > self.max_bytes:
+                truncated_by = "bytes"
+            if truncated_by:
+                break
+            lines.append(line)
+            self.rows_sent += 1
+            self.bytes_sent += len(line)
+        if rows and not truncated_by:
+            return "".join(lines).encode("utf-8")
+        self.finished = True
+        trailer = {"complete": truncated_by is None, "row_count": self.rows_sent, "truncated_by": truncated_by}
+        self.close(abandon=truncated_by is not None)
+        return ("".join(lines) + json.dumps({"_end": trailer}) + "\n").encode("utf-8")
+
+    def close(self, abandon=False):
+        if self.conn is None:
+            return
+        conn, self.conn = self.conn, None
+        if abandon and self.target == "source":
+            conn.discard()
+            return
+        try:
+            if self.cursor is not None:
+                self.cursor.close()
+        except Exception:
+            conn.discard()
+            return
+        release_console_connection(conn, self.target)
@@ -0,0 +1,233 @@
+from backend.scripts.stream_pipeline import stream_transfer
+from backend.scripts.key_manager import SessionKeyWrapper, load_public_key
+from backend.scripts.schema_translate import translate_schema, create_destination_tables, build_post_load_objects, metadata_text
+from backend.scripts.table_fingerprint import compute_fingerprint
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from backend.scripts.connection_pool import connect_mysql, connect_postgres
+import hashlib
+import json
+import os
+
+# Whole-schema transfer. Tables and foreign keys are read from MySQL's
+# information_schema and every table is moved by its own worker as soon as
+# all the tables it references have been loaded, so independent tables run
+# concurrently on a bounded pool while FK order is still respected. With
+# translate=True the foreign keys are only created after the load, so FK
+# cycles are fine there; loading into existing tables needs an acyclic graph.
+#
+# Each table's integrity hash is the root of an order-independent table
+# fingerprint computed on each database. A CSV hash in primary key order
+# would depend on collation: MySQL and Postgres sort string keys differently
+# (case, accents, trailing spaces), so identical tables could hash apart.
+
+def introspect_schema(host, port, user, password, database, tables=None):
+    conn = connect_mysql(
+        host=host,
+        port=port,
+        user=user,
+        password=password,
+        database=database
+    )
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT table_name FROM information_schema.tables
+        WHERE table_schema = %s AND table_type = 'BASE TABLE'
+        ORDER BY table_name
+    """, (database,))
+    # Some connector versions return information_schema strings as bytearray
+    all_tables = [metadata_text(row[0]) for row in cursor.fetchall()]
+    selected = [t for t in all_tables if tables is None or t in tables]
+    missing = set(tables or []) - set(all_tables)
+    if missing:
+        raise ValueError(f"Tables not found in {database}: {', '.join(sorted(missing))}")
+
+    cursor.execute("""
+        SELECT table_name, column_name FROM information_schema.key_column_usage
+        WHERE table_schema = %s AND constraint_name = 'PRIMARY'
+        ORDER BY table_name, ordinal_position
+    """, (database,))
+    primary_keys = {}
+    for table, column in (map(metadata_text, row) for row in cursor.fetchall()):
+        primary_keys.setdefault(table, []).append(column)
+
+    cursor.execute("""
+        SELECT DISTINCT table_name, referenced_table_name FROM information_schema.key_column_usage
+        WHERE table_schema = %s AND referenced_table_name IS NOT NULL
+    """, (database,))
+    dependencies = {t: set() for t in selected}
+    for table, referenced in (map(metadata_text, row) for row in cursor.fetchall()):
+        # Self-references don't constrain scheduling; tables outside the
+        # selection are assumed to already exist in the destination
+        if table in dependencies and referenced in dependencies and referenced != table:
+            dependencies[table].add(referenced)
+
+    cursor.close()
+    conn.close()
+    return {
+        "tables": selected,
+        "primary_keys": {t: primary_keys.get(t, []) for t in selected},
+        "dependencies": dependencies
+    }
+
+def dependency_order(dependencies, allow_cycles=False):
+    # Kahn's algorithm; only used to validate the graph and for reporting.
+    # With allow_cycles, tables caught in a cycle are listed last instead.
+    remaining = {t: set(deps) for t, deps in dependencies.items()}
+    order = []
+    while remaining:
+        ready = sorted(t for t, deps in remaining.items() if not deps)
+        if not ready:
+            if allow_cycles:
+                print(f"Foreign key cycle between tables {', '.join(sorted(remaining))}; constraints are deferred until after the load")
+                return order + sorted(remaining)
+            raise ValueError(f"Foreign key cycle between tables: {', '.join(sorted(remaining))}")
+        for t in ready:
+            del remaining[t]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+        order.extend(ready)
+    return order
+
+def table_query(table, primary_key):
+    # Primary key order is InnoDB's clustered order, so it costs MySQL no sort
+    # and loads the destination heap in key order; verification doesn't
+    # depend on it
+    if primary_key:
+        return f"SELECT * FROM {table} ORDER BY {', '.join(primary_key)}"
+    return f"SELECT * FROM {table}"
+
+def missing_postgres_tables(host, port, user, password, database, tables):
+    # Tables not present in the destination's current schema
+    conn = connect_postgres(host=host, port=port, user=user, password=password, database=database)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT table_name FROM information_schema.tables
+        WHERE table_schema = current_schema() AND table_name = ANY(%s)
+    """, (list(tables),))
+    existing = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    conn.close()
+    return sorted(set(tables) - existing)
+
+def combine_table_hashes(table_hashes):
+    combined = hashlib.sha256()
+    for table in sorted(table_hashes):
+        combined.update(f"{table}:{table_hashes[table]}\n".encode("utf-8"))
+    return combined.hexdigest()
+
+def write_schema_manifest(manifest_path, hash_file, schema, table_hashes):
+    combined = combine_table_hashes(table_hashes)
+    with open(hash_file, "w") as f:
+        f.write(combined)
+    with open(manifest_path, "w") as f:
+        json.dump({
+            "combined_hash": combined,
+            "primary_keys": schema["primary_keys"],
+            "tables": table_hashes
+        }, f, indent=4)
+    return combined
+
+def fingerprint_root(kind, params, table, primary_key, batch_size=1000):
+    return compute_fingerprint(kind, params, table, primary_key[0] if primary_key else None, batch_size=batch_size).root()
+
+def run_dependency_scheduled(dependencies, task, max_workers):
+    # Submits each table once everything it depends on has finished
+    done = set()
+    pending = {t: set(deps) for t, deps in dependencies.items()}
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        running = {}
+        while pending or running:
+            for table in sorted(t for t, deps in pending.items() if deps <= done):
+                del pending[table]
+                running[pool.submit(task, table)] = table
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                table = running.pop(future)
+                # Re-raises the worker's exception and stops scheduling dependants
+                results[table] = future.result()
+                done.add(table)
+    return results
+
+def schema_transfer(mysql_params, postgres_params, public_key_path, private_key_path, hash_file, manifest_path, tables=None, bundle_dir=None, batch_size=1000, max_workers=4, translate=False, payload_format="csv", compression=None, compression_level=None, on_batch=None):
+    # mysql_params / postgres_params: (host, port, user, password, database)
+    try:
+        # 1. Introspect tables, primary keys and the FK graph
+        schema = introspect_schema(*mysql_params, tables)
+        order = dependency_order(schema["dependencies"], allow_cycles=translate)
+        print(f"Schema transfer order: {', '.join(order)}")
+        if not translate:
+            # Checked before anything is truncated or loaded
+            missing = missing_postgres_tables(*postgres_params, schema["tables"])
+            if missing:
+                raise ValueError(f"Tables missing in the destination (create them or use translate_schema): {', '.join(missing)}")
+
+        # 2. Either recreate the destination from translated MySQL metadata
+        # (bare tables, constraints come after the load) or empty the
+        # existing tables in one statement so FKs between them don't block it
+        dependencies = schema["dependencies"]
+        if translate:
+            metadata = translate_schema(*mysql_params, schema["tables"])
+            create_destination_tables(postgres_params, metadata)
+            # No constraints exist yet, so every table can load at once
+            dependencies = {t: set() for t in schema["tables"]}
+        else:
+            host, port, user, password, database = postgres_params
+            conn = connect_postgres(host=host, port=port, user=user, password=password, database=database)
+            cursor = conn.cursor()
+            if schema["tables"]:
+                cursor.execute(f"TRUNCATE TABLE {', '.join(schema['tables'])}")
+            conn.commit()
+            cursor.close()
+            conn.close()
+
+        # 3. Move each table as soon as its referenced tables are loaded; one
+        # key-wrapping key covers every table's session key
+        key_wrapper = SessionKeyWrapper(load_public_key(public_key_path))
+
+        def run_table(table):
+            table_hash = f"{hash_file}.{table}"
+            bundle_path = os.path.join(bundle_dir, f"encrypted_payload.{table}.bundle") if bundle_dir else None
+            if not stream_transfer(mysql_params, postgres_params, table, public_key_path, private_key_path, table_hash,
+                                   bundle_path=bundle_path, batch_size=batch_size,
+                                   query=table_query(table, schema["primary_keys"][table]), prepare_table=False,
+                                   payload_format=payload_format, compression=compression, compression_level=compression_level, on_batch=on_batch,
+                                   key_wrapper=key_wrapper):
+                raise Exception(f"Table {table} failed")
+            # The stream's CSV digest follows row order; the fingerprint doesn't
+            os.remove(table_hash)
+            return fingerprint_root("mysql", mysql_params, table, schema["primary_keys"][table], batch_size)
+
+        table_hashes = run_dependency_scheduled(dependencies, run_table, max_workers)
+
+        # 4. Build primary keys, indexes, foreign keys and sequences in bulk
+        if translate:
+            build_post_load_objects(postgres_params, metadata, max_workers)
+
+        combined = write_schema_manifest(manifest_path, hash_file, schema, table_hashes)
+        print(f"Schema transfer successful ({len(table_hashes)} tables). Hash: {combined}")
+        return True
+    except Exception as e:
+        print(f"Error during schema transfer: {e}")
+        return False
+
+def schema_verify_postgres(postgres_params, source_manifest_path, hash_file, manifest_path, batch_size=1000, max_workers=4):
+    try:
+        with open(source_manifest_path, "r") as f:
+            source = json.load(f)
+        primary_keys = source["primary_keys"]
+
+        def verify_table(table):
+            return fingerprint_root("postgres", postgres_params, table, primary_keys[table], batch_size)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {t: pool.submit(verify_table, t) for t in source["tables"]}
+            table_hashes = {t: future.result() for t, future in futures.items()}
+
+        combined = write_schema_manifest(manifest_path, hash_file, {"primary_keys": primary_keys}, table_hashes)
+        print(f"Schema verification hash from Postgres: {combined}")
+        return True
+    except Exception as e:
+        print(f"Error verifying schema in Postgres: {e}")
+        return False
@@ -0,0 +1,247 @@
+from concurrent.futures import ThreadPoolExecutor
+from backend.scripts.connection_pool import connect_mysql, connect_postgres
+
+# MySQL -> PostgreSQL schema translation. Column metadata, indexes and foreign
+# keys are read from information_schema; destination tables are created bare
+# (no primary key, indexes or constraints) so COPY doesn't maintain indexes
+# row by row, and build_post_load_objects adds them afterwards in bulk.
+#
+# MySQL TIME is a duration (+-838:59:59), not a time of day, so it maps to
+# INTERVAL. Functional index parts (MySQL 8 expressions) have no column name
+# and are skipped with a note; they need to be recreated by hand.
+
+_INTEGER_TYPES = {
+    # data_type: (signed, unsigned)
+    "tinyint": ("SMALLINT", "SMALLINT"),
+    "smallint": ("SMALLINT", "INTEGER"),
+    "mediumint": ("INTEGER", "INTEGER"),
+    "int": ("INTEGER", "BIGINT"),
+    "integer": ("INTEGER", "BIGINT"),
+    "bigint": ("BIGINT", "NUMERIC(20)"),
+}
+
+_SIMPLE_TYPES = {
+    "float": "REAL",
+    "double": "DOUBLE PRECISION",
+    "real": "DOUBLE PRECISION",
+    "bit": "BIGINT",
+    "year": "SMALLINT",
+    "date": "DATE",
+    "tinytext": "TEXT",
+    "text": "TEXT",
+    "mediumtext": "TEXT",
+    "longtext": "TEXT",
+    "enum": "TEXT",
+    "set": "TEXT",
+    "binary": "BYTEA",
+    "varbinary": "BYTEA",
+    "tinyblob": "BYTEA",
+    "blob": "BYTEA",
+    "mediumblob": "BYTEA",
+    "longblob": "BYTEA",
+    "json": "JSONB",
+}
+
+def map_mysql_type(column):
+    data_type = column["data_type"].lower()
+    column_type = column["column_type"].lower()
+    unsigned = "unsigned" in column_type
+
+    if column_type.startswith("tinyint(1)") and not unsigned:
+        # MySQL hands these back as 0/1 ints and Postgres as bools; csv_codec
+        # and table_fingerprint encode both as 1/0, so the hashes still match
+        return "BOOLEAN"
+    if data_type in _INTEGER_TYPES:
+        return _INTEGER_TYPES[data_type][1 if unsigned else 0]
+    if data_type in ("decimal", "numeric"):
+        return f"NUMERIC({column['numeric_precision']},{column['numeric_scale']})"
+    if data_type in ("char", "varchar"):
+        return f"{data_type.upper()}({column['character_maximum_length']})"
+    if data_type in ("datetime", "timestamp"):
+        # MySQL returns TIMESTAMP in the session time zone, so keep it zone-less
+        return f"TIMESTAMP({column['datetime_precision'] or 0})"
+    if data_type == "time":
+        return f"INTERVAL({column['datetime_precision'] or 0})"
+    return _SIMPLE_TYPES.get(data_type, "TEXT")
+
+def _map_default(column, pg_type):
+    default = column["column_default"]
+    if default is None or column["auto_increment"]:
+        return None
+    if default.upper().startswith("CURRENT_TIMESTAMP"):
+        return "CURRENT_TIMESTAMP"
+    if pg_type == "BOOLEAN":
+        return "TRUE" if default not in ("0", "b'0'") else "FALSE"
+    if pg_type in ("BYTEA", "JSONB"):
+        # Expression defaults on these types don't translate literally
+        return None
+    return "'" + default.replace("'", "''") + "'"
+
+def metadata_text(value):
+    # Some connector versions return information_schema strings as bytearray
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8")
+    return value
+
+def read_table_metadata(cursor, database, table):
+    cursor.execute("""
+        SELECT column_name, data_type, column_type, is_nullable, column_default, extra,
+               numeric_precision, numeric_scale, character_maximum_length, datetime_precision
+        FROM information_schema.columns
+        WHERE table_schema = %s AND table_name = %s
+        ORDER BY ordinal_position
+    """, (database, table))
+    columns = []
+    for row in cursor.fetchall():
+        row = [metadata_text(v) for v in row]
+        name, data_type, column_type, is_nullable, default, extra, precision, scale, char_len, dt_precision = row
+        column = {
+            "name": name,
+            "data_type": data_type,
+            "column_type": column_type,
+            "nullable": is_nullable == "YES",
+            "column_default": default,
+            "auto_increment": "auto_increment" in (extra or "").lower(),
+            "numeric_precision": precision,
+            "numeric_scale": scale,
+            "character_maximum_length": char_len,
+            "datetime_precision": dt_precision,
+        }
+        column["pg_type"] = map_mysql_type(column)
+        columns.append(column)
+
+    cursor.execute("""
+        SELECT index_name, non_unique, column_name
+        FROM information_schema.statistics
+        WHERE table_schema = %s AND table_name = %s
+        ORDER BY index_name, seq_in_index
+    """, (database, table))
+    primary_key = []
+    indexes = {}
+    functional = set()
+    for index_name, non_unique, column_name in (map(metadata_text, row) for row in cursor.fetchall()):
+        if column_name is None:
+            functional.add(index_name)
+        elif index_name == "PRIMARY":
+            primary_key.append(column_name)
+        else:
+            index = indexes.setdefault(index_name, {"unique": not int(non_unique), "columns": []})
+            index["columns"].append(column_name)
+    for index_name in sorted(functional):
+        indexes.pop(index_name, None)
+        print(f"Skipping functional index {index_name} on {table}; recreate it on the destination by hand")
+
+    cursor.execute("""
+        SELECT k.constraint_name, k.column_name, k.referenced_table_name, k.referenced_column_name,
+               r.update_rule, r.delete_rule
+        FROM information_schema.key_column_usage k
+        JOIN information_schema.referential_constraints r
+          ON r.constraint_schema = k.constraint_schema AND r.constraint_name = k.constraint_name
+        WHERE k.table_schema = %s AND k.table_name = %s AND k.referenced_table_name IS NOT NULL
+        ORDER BY k.constraint_name, k.ordinal_position
+    """, (database, table))
+    foreign_keys = {}
+    for name, column, ref_table, ref_column, update_rule, delete_rule in (map(metadata_text, row) for row in cursor.fetchall()):
+        fk = foreign_keys.setdefault(name, {
+            "columns": [], "referenced_table": ref_table, "referenced_columns": [],
+            "on_update": update_rule, "on_delete": delete_rule
+        })
+        fk["columns"].append(column)
+        fk["referenced_columns"].append(ref_column)
+
+    return {
+        "table": table,
+        "columns": columns,
+        "primary_key": primary_key,
+        "indexes": indexes,
+        "foreign_keys": foreign_keys,
+    }
+
+def translate_schema(host, port, user, password, database, tables):
+    conn = connect_mysql(
+        host=host,
+        port=port,
+        user=user,
+        password=password,
+        database=database
+    )
+    cursor = conn.cursor()
+    metadata = {table: read_table_metadata(cursor, database, table) for table in tables}
+    cursor.close()
+    conn.close()
+    return metadata
+
+def create_table_sql(meta):
+    definitions = []
+    for column in meta["columns"]:
+        definition = f"{column['name']} {column['pg_type']}"
+        if column["auto_increment"]:
+            definition += " GENERATED BY DEFAULT AS IDENTITY"
+        default = _map_default(column, column["pg_type"])
+        if default is not None:
+            definition += f" DEFAULT {default}"
+        if not column["nullable"]:
+            definition += " NOT NULL"
+        definitions.append(definition)
+    return f"CREATE TABLE {meta['table']} (\n    " + ",\n    ".join(definitions) + "\n)"
+
+def index_sql(meta):
+    table = meta["table"]
+    statements = []
+    if meta["primary_key"]:
+        statements.append(f"ALTER TABLE {table} ADD PRIMARY KEY ({', '.join(meta['primary_key'])})")
+    for name, index in sorted(meta["indexes"].items()):
+        unique = "UNIQUE " if index["unique"] else ""
+        # Postgres index names are schema-wide, MySQL's are per table
+        statements.append(f"CREATE {unique}INDEX {table}_{name} ON {table} ({', '.join(index['columns'])})")
+    return statements
+
+def foreign_key_sql(meta):
+    table = meta["table"]
+    statements = []
+    for name, fk in sorted(meta["foreign_keys"].items()):
+        statements.append(
+            f"ALTER TABLE {table} ADD CONSTRAINT {table}_{name} FOREIGN KEY ({', '.join(fk['columns'])}) "
+            f"REFERENCES {fk['referenced_table']} ({', '.join(fk['referenced_columns'])}) "
+            f"ON UPDATE {fk['on_update']} ON DELETE {fk['on_delete']}"
+        )
+    return statements
+
+def sequence_reset_sql(meta):
+    table = meta["table"]
+    return [
+        f"SELECT setval(pg_get_serial_sequence('{table}', '{c['name']}'), COALESCE(MAX({c['name']}), 1), MAX({c['name']}) IS NOT NULL) FROM {table}"
+        for c in meta["columns"] if c["auto_increment"]
+    ]
+
+def _execute_all(postgres_params, statements):
+    host, port, user, password, database = postgres_params
+    conn = connect_postgres(host=host, port=port, user=user, password=password, database=database)
+    cursor = conn.cursor()
+    for statement in statements:
+        cursor.execute(statement)
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+def create_destination_tables(postgres_params, metadata):
+    # Recreated rather than truncated so the bare, index-free layout is
+    # guaranteed. No CASCADE: if views or tables outside this transfer depend
+    # on one of these tables, the DROP fails instead of silently removing them.
+    tables = list(metadata)
+    statements = []
+    if tables:
+        statements.append(f"DROP TABLE IF EXISTS {', '.join(tables)}")
+    statements.extend(create_table_sql(metadata[t]) for t in tables)
+    _execute_all(postgres_params, statements)
+
+def build_post_load_objects(postgres_params, metadata, max_workers=4):
+    # 1. Primary keys and indexes, one table per connection in parallel
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        list(pool.map(lambda meta: _execute_all(postgres_params, index_sql(meta)), metadata.values()))
+
+    # 2. Foreign keys need the referenced keys from step 1 to exist
+    _execute_all(postgres_params, [s for meta in metadata.values() for s in foreign_key_sql(meta)])
+
+    # 3. Identity sequences continue after the highest copied id
+    _execute_all(postgres_params, [s for meta in metadata.values() for s in sequence_reset_sql(meta)])
@@ -0,0 +1,292 @@
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from backend.scripts.payload_compression import get_codec
+from backend.scripts.pipeline_metrics import timed
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import threading
+import io
+import json
+import os
+import struct
+
+# Chunked AES-256-GCM container used for payloads instead of single-shot Fernet.
+#
+# Header: [4 bytes magic][1 byte version][4 bytes chunk_size][7 bytes nonce prefix]
+#         [4 bytes meta_len][meta JSON]
+# Chunks: [4 bytes ciphertext_len][ciphertext + 16 byte tag] ...
+#
+# Each chunk nonce is prefix || sequence number || final flag, and the whole
+# header is passed as associated data, so reordered, dropped, truncated or
+# appended chunks and edited metadata all fail authentication.
+#
+# With compression enabled (meta["compression"]), every chunk's plaintext is
+# [1 byte flag][data]: flag 1 means data is the compressed chunk, flag 0 that
+# it is stored as-is because compressing didn't make it smaller.
+#
+# Chunks are independent once their sequence number is known, so with
+# CRYPTO_WORKERS > 1 (default: one per core) compression + AES-GCM run on a
+# shared thread pool (both release the GIL on large buffers) and an ordered
+# writer / reader keeps the stream in sequence. Each stream keeps at most
+# 2 x workers chunks in flight, which bounds its memory. The stream format is
+# the same either way.
+CRYPTO_WORKERS = int(os.getenv("CRYPTO_WORKERS", os.cpu_count() or 1))
+
+STREAM_MAGIC = b"SDTC"
+STREAM_VERSION = 1
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+TAG_SIZE = 16
+
+_HEADER_FMT = ">4sBI7sI"
+_HEADER_SIZE = struct.calcsize(_HEADER_FMT)
+_LEN_FMT = ">I"
+_LEN_SIZE = struct.calcsize(_LEN_FMT)
+_MAX_SEQUENCE = 2 ** 32 - 1
+_STORED = b"\x00"
+_COMPRESSED = b"\x01"
+
+
+def generate_stream_key():
+    return AESGCM.generate_key(bit_length=256)
+
+
+def _chunk_nonce(prefix, sequence, final):
+    if sequence > _MAX_SEQUENCE:
+        raise ValueError("Too many chunks for a single stream")
+    return prefix + struct.pack(">IB", sequence, 1 if final else 0)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _crypto_pool():
+    # Shared by every stream in the process, so concurrent partitions don't
+    # each start their own set of threads
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max(1, CRYPTO_WORKERS), thread_name_prefix="crypto")
+        return _pool
+
+
+def _read_exact(f, size):
+    data = f.read(size)
+    while len(data) < size:
+        more = f.read(size - len(data))
+        if not more:
+            break
+        data += more
+    return data
+
+
+class ChunkedEncryptor:
+    def __init__(self, key, out_f, chunk_size=DEFAULT_CHUNK_SIZE, meta=None, compression=None, compression_level=None, workers=None):
+        self.aead = AESGCM(key)
+        self.workers = CRYPTO_WORKERS if workers is None else workers
+        # Sealed chunks not yet written, in sequence order
+        self.pending = deque()
+        self.out_f = out_f
+        self.chunk_size = chunk_size
+        self.meta = dict(meta or {})
+        self.codec = get_codec(compression, compression_level)
+        if self.codec is not None:
+            self.meta["compression"] = {"codec": compression, "level": self.codec.level}
+        self.buffer = bytearray()
+        self.sequence = 0
+        self.closed = False
+
+        nonce_prefix = os.urandom(7)
+        meta_bytes = json.dumps(self.meta, sort_keys=True).encode("utf-8")
+        self.header = struct.pack(_HEADER_FMT, STREAM_MAGIC, STREAM_VERSION, chunk_size, nonce_prefix, len(meta_bytes)) + meta_bytes
+        self.nonce_prefix = nonce_prefix
+        self.out_f.write(self.header)
+
+    def _seal(self, plaintext, sequence, final):
+        # Runs on a crypto pool thread when workers > 1
+        nonce = _chunk_nonce(self.nonce_prefix, sequence, final)
+        if self.codec is not None:
+            with timed("compress", len(plaintext)):
+                compressed = self.codec.compress(plaintext)
+            if len(compressed) < len(plaintext):
+                plaintext = _COMPRESSED + compressed
+            else:
+                plaintext = _STORED + plaintext
+        with timed("encrypt", len(plaintext)):
+            return self.aead.encrypt(nonce, plaintext, self.header)
+
+    def _write_chunk(self, ciphertext):
+        self.out_f.write(struct.pack(_LEN_FMT, len(ciphertext)))
+        self.out_f.write(ciphertext)
+
+    def _emit(self, plaintext, final):
+        sequence = self.sequence
+        self.sequence += 1
+        if self.workers <= 1:
+            self._write_chunk(self._seal(bytes(plaintext), sequence, final))
+            return
+        self.pending.append(_crypto_pool().submit(self._seal, bytes(plaintext), sequence, final))
+        # Write whatever is ready at the head; block only when the window is full
+        while self.pending and (self.pending[0].done() or len(self.pending) >= 2 * self.workers):
+            self._write_chunk(self.pending.popleft().result())
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("Write to closed encryptor")
+        self.buffer += data
+        # Hold back the last full chunk so close() can mark it as final
+        while len(self.buffer) > self.chunk_size:
+            self._emit(self.buffer[:self.chunk_size], final=False)
+            del self.buffer[:self.chunk_size]
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        self._emit(self.buffer, final=True)
+        self.buffer = bytearray()
+        while self.pending:
+            self._write_chunk(self.pending.popleft().result())
+        self.closed = True
+
+    def abort(self):
+        for future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def read_stream_header(in_f):
+    fixed = _read_exact(in_f, _HEADER_SIZE)
+    if len(fixed) < _HEADER_SIZE:
+        raise ValueError("Truncated stream header")
+    magic, version, chunk_size, nonce_prefix, meta_len = struct.unpack(_HEADER_FMT, fixed)
+    if magic != STREAM_MAGIC:
+        raise ValueError("Not a chunked payload stream")
+    if version != STREAM_VERSION:
+        raise ValueError(f"Unsupported stream version: {version}")
+    meta_bytes = _read_exact(in_f, meta_len)
+    if len(meta_bytes) < meta_len:
+        raise ValueError("Truncated stream header")
+    return {
+        "header": fixed + meta_bytes,
+        "chunk_size": chunk_size,
+        "nonce_prefix": nonce_prefix,
+        "meta": json.loads(meta_bytes.decode("utf-8")),
+    }
+
+
+def _open_chunk(aead, codec, header, nonce, ciphertext):
+    with timed("decrypt", len(ciphertext)):
+        plaintext = aead.decrypt(nonce, ciphertext, header["header"])
+    if codec is not None:
+        flag, plaintext = plaintext[:1], plaintext[1:]
+        if flag == _COMPRESSED:
+            with timed("decompress", len(plaintext)):
+                plaintext = codec.decompress(plaintext, header["chunk_size"])
+            if len(plaintext) > header["chunk_size"]:
+                raise ValueError("Decompressed chunk exceeds the chunk size")
+        elif flag != _STORED:
+            raise ValueError("Invalid chunk compression flag")
+    return plaintext
+
+
+def iter_decrypted_chunks(key, in_f, header=None, workers=None):
+    if header is None:
+        header = read_stream_header(in_f)
+    aead = AESGCM(key)
+    compression = header["meta"].get("compression")
+    codec = get_codec(compression["codec"]) if compression else None
+    workers = CRYPTO_WORKERS if workers is None else workers
+    max_len = header["chunk_size"] + TAG_SIZE + (1 if codec else 0)
+
+    def read_record():
+        length_bytes = _read_exact(in_f, _LEN_SIZE)
+        if not length_bytes:
+            return None
+        if len(length_bytes) < _LEN_SIZE:
+            raise ValueError("Truncated chunk length")
+        length = struct.unpack(_LEN_FMT, length_bytes)[0]
+        if length < TAG_SIZE or length > max_len:
+            raise ValueError("Invalid chunk length")
+        ciphertext = _read_exact(in_f, length)
+        if len(ciphertext) < length:
+            raise ValueError("Truncated chunk")
+        return ciphertext
+
+    sequence = 0
+    current = read_record()
+    if current is None:
+        raise ValueError("Stream has no chunks")
+    # Chunks decrypted ahead on the crypto pool, yielded in sequence order
+    pending = deque()
+    try:
+        while current is not None:
+            # One record of look-ahead tells us whether this must be the final chunk
+            following = read_record()
+            nonce = _chunk_nonce(header["nonce_prefix"], sequence, following is None)
+            if workers <= 1:
+                yield _open_chunk(aead, codec, header, nonce, current)
+            else:
+                pending.append(_crypto_pool().submit(_open_chunk, aead, codec, header, nonce, current))
+                while len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            sequence += 1
+            current = following
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # Consumer stopped early or a chunk failed: drop the read-ahead
+        for future in pending:
+            future.cancel()
+
+
+class ChunkIteratorReader(io.RawIOBase):
+    # File-like view over an iterator of byte chunks, for consumers such as COPY
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.pending = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self.pending:
+            try:
+                self.pending = memoryview(next(self.chunks))
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self.pending))
+        b[:n] = self.pending[:n]
+        self.pending = self.pending[n:]
+        return n
+
+
+class DecryptingReader(ChunkIteratorReader):
+    def __init__(self, key, in_f, header=None):
+        super().__init__(iter_decrypted_chunks(key, in_f, header))
+
+
+def encrypt_file(key, input_path, output_path, chunk_size=DEFAULT_CHUNK_SIZE, meta=None, compression=None, compression_level=None, hasher=None, workers=None):
+    # hasher: updated with the plaintext in the reading thread, so hashing
+    # overlaps the pool's encryption instead of taking a separate pass
+    with open(input_path, "rb") as src, open(output_path, "wb") as dst:
+        with ChunkedEncryptor(key, dst, chunk_size, meta, compression, compression_level, workers) as encryptor:
+            for block in iter(lambda: src.read(chunk_size), b""):
+                if hasher is not None:
+                    with timed("hash", len(block)):
+                        hasher.update(block)
+                encryptor.write(block)
+
+
+def is_chunked_stream(path):
+    with open(path, "rb") as f:
+        return f.read(len(STREAM_MAGIC)) == STREAM_MAGIC
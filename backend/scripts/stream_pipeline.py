@@ -0,0 +1,129 @@
+from backend.scripts.encrypt_payload import BUNDLE_VERSION_CHUNKED, write_bundle_header
+from backend.scripts.key_manager import SessionKeyWrapper, load_public_key
+from backend.scripts.stream_cipher import ChunkedEncryptor, generate_stream_key
+from backend.scripts.transfer_to_postgres import ecc_decrypt_and_load, ecc_decrypt_and_load_stream
+from backend.scripts.csv_codec import encode_csv_row, encode_csv_rows
+from backend.scripts.arrow_payload import mysql_arrow_schema, describe_schema, write_arrow_stream
+from backend.scripts.connection_pool import connect_mysql
+from backend.scripts.pipeline_metrics import timed
+import hashlib
+import os
+import threading
+
+# Single-pass variant of steps 2-4 of the pipeline: rows flow from the MySQL
+# cursor through the CSV encoder, the SHA-256 hasher and the chunked cipher
+# straight into the bundle, without temp_extract.csv / pre_transfer.csv.enc.
+
+def iter_csv_chunks(cursor, batch_size=1000, on_batch=None):
+    # Yields the same bytes extract_and_encrypt writes to temp_extract.csv,
+    # one encoded batch at a time. on_batch(rows, nbytes) is called per batch.
+    rows = cursor.fetchmany(batch_size)
+    # Named (server-side) psycopg2 cursors only expose description after a fetch
+    header = encode_csv_row([i[0] for i in cursor.description])
+    if not rows:
+        yield header.encode("utf-8")
+    while rows:
+        chunk = (header + encode_csv_rows(rows)).encode("utf-8")
+        if on_batch:
+            on_batch(len(rows), len(chunk))
+        yield chunk
+        header = ""
+        rows = cursor.fetchmany(batch_size)
+
+def iter_hashed(chunks, hasher):
+    for chunk in chunks:
+        with timed("hash", len(chunk)):
+            hasher.update(chunk)
+        yield chunk
+
+def estimate_row_count(host, port, user, password, database, table):
+    # InnoDB's statistics estimate; cheap, unlike COUNT(*), and good enough for an ETA
+    conn = connect_mysql(host=host, port=port, user=user, password=password, database=database)
+    cursor = conn.cursor()
+    cursor.execute("SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s", (database, table))
+    row = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    return int(row[0]) if row and row[0] is not None else None
+
+def stream_extract_to_bundle(host, port, user, password, database, table, public_key_path, bundle_file, hash_file, batch_size=1000, query=None, query_params=None, payload_format="csv", compression=None, compression_level=None, on_batch=None, key_wrapper=None):
+    # key_wrapper: a SessionKeyWrapper shared by the bundles of one transfer
+    try:
+        conn = connect_mysql(
+            host=host,
+            port=port,
+            user=user,
+            password=password,
+            database=database
+        )
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(query or f"SELECT * FROM {table}", query_params)
+
+        # 1. Session key wrapped for the receiver; bundle header goes out first
+        session_key = generate_stream_key()
+        wrapper = key_wrapper or SessionKeyWrapper(load_public_key(public_key_path))
+        ephemeral_pub_bytes, encrypted_session_key = wrapper.wrap(session_key)
+        write_bundle_header(bundle_file, BUNDLE_VERSION_CHUNKED, ephemeral_pub_bytes, encrypted_session_key)
+
+        # 2. Extract -> CSV (or Arrow record batches) -> hash -> encrypt in one pass
+        sha256_hash = hashlib.sha256()
+        meta = {"format": payload_format}
+        if payload_format == "arrow":
+            schema = mysql_arrow_schema(cursor.description)
+            meta["schema"] = describe_schema(schema)
+        with ChunkedEncryptor(session_key, bundle_file, meta=meta, compression=compression, compression_level=compression_level) as encryptor:
+            if payload_format == "arrow":
+                write_arrow_stream(cursor, schema, encryptor, sha256_hash, batch_size, on_batch)
+            else:
+                for chunk in iter_hashed(iter_csv_chunks(cursor, batch_size, on_batch), sha256_hash):
+                    encryptor.write(chunk)
+        bundle_file.flush()
+
+        hash_val = sha256_hash.hexdigest()
+        with open(hash_file, "w") as f:
+            f.write(hash_val)
+
+        print(f"Streaming extraction and encryption successful.")
+        print(f"Hash: {hash_val}")
+
+        cursor.close()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Error during streaming extraction: {e}")
+        return False
+
+def stream_transfer(mysql_params, postgres_params, table, public_key_path, private_key_path, hash_file, bundle_path=None, batch_size=1000, query=None, query_params=None, prepare_table=True, merge_key=None, payload_format="csv", compression=None, compression_level=None, on_batch=None, key_wrapper=None):
+    # mysql_params / postgres_params: (host, port, user, password, database)
+    # on_batch(rows, nbytes) reports extraction progress, one call per batch
+    # With bundle_path the bundle is written once and then loaded (1x disk);
+    # without it the bundle is handed to the loader over a pipe (no disk I/O).
+    try:
+        if bundle_path:
+            with open(bundle_path, "wb") as f:
+                if not stream_extract_to_bundle(*mysql_params, table, public_key_path, f, hash_file, batch_size, query, query_params, payload_format, compression, compression_level, on_batch, key_wrapper):
+                    return False
+            return ecc_decrypt_and_load(private_key_path, bundle_path, *postgres_params, table, prepare_table=prepare_table, merge_key=merge_key)
+
+        read_fd, write_fd = os.pipe()
+        producer_result = {}
+
+        def produce():
+            try:
+                with os.fdopen(write_fd, "wb") as writer:
+                    producer_result["ok"] = stream_extract_to_bundle(*mysql_params, table, public_key_path, writer, hash_file, batch_size, query, query_params, payload_format, compression, compression_level, on_batch, key_wrapper)
+            except BrokenPipeError:
+                # Loader gave up and closed its end
+                producer_result["ok"] = False
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        # A failed producer closes the pipe early; the loader then sees a
+        # truncated stream, fails authentication and never commits
+        with os.fdopen(read_fd, "rb") as reader:
+            loaded = ecc_decrypt_and_load_stream(private_key_path, reader, *postgres_params, table, prepare_table=prepare_table, merge_key=merge_key)
+        producer.join()
+        return loaded and producer_result.get("ok", False)
+    except Exception as e:
+        print(f"Error during streaming transfer: {e}")
+        return False
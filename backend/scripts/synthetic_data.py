@@ -0,0 +1,151 @@
+from backend.scripts.connection_pool import connect_mysql, connect_postgres
+from backend.scripts.csv_codec import encode_csv_row, encode_csv_rows
+from backend.scripts.bulk_load_mysql import bulk_load_rows, BULK_METHODS, DEFAULT_CHUNK_ROWS, DEFAULT_BATCH_SIZE
+from datetime import datetime, timedelta
+from decimal import Decimal
+import argparse
+import random
+import string
+import time
+import sys
+import os
+
+# Deterministic synthetic tables for benchmarking. A column mix such as
+# "int:2,varchar:3,datetime:1" plus a width (VARCHAR length; TEXT values
+# are one to four times as long) fully describes the table, and the same seed
+# always yields the same rows, so runs against different versions move
+# identical data. Every table gets an integer primary key "id" first.
+#
+# Seeding a large source table for load tests:
+#   python -m backend.scripts.synthetic_data --rows 20000000 --columns int:2,varchar:4,datetime:1
+
+_EPOCH = datetime(2024, 1, 1)
+_ALPHABET = string.ascii_letters + string.digits + " "
+
+# Strings are slices of a seeded random pool rather than per-character
+# draws, which keeps generation fast enough to seed tens of millions of rows
+_POOL_SIZE = 1 << 16
+
+
+def _pool_slice(rng, pool, low, high):
+    length = low + int(rng.random() * (high - low + 1))
+    offset = int(rng.random() * (len(pool) - length))
+    return pool[offset:offset + length]
+
+
+# type: (MySQL DDL, Postgres DDL, value generator(rng, width, pool))
+COLUMN_TYPES = {
+    "int": ("INT", "INTEGER", lambda rng, width, pool: rng.getrandbits(32) - 2 ** 31),
+    "bigint": ("BIGINT", "BIGINT", lambda rng, width, pool: rng.getrandbits(64) - 2 ** 63),
+    "double": ("DOUBLE", "DOUBLE PRECISION", lambda rng, width, pool: rng.uniform(-1e6, 1e6)),
+    "decimal": ("DECIMAL(12,2)", "NUMERIC(12,2)", lambda rng, width, pool: Decimal(rng.randint(-10 ** 11, 10 ** 11)) / 100),
+    "varchar": ("VARCHAR({width})", "VARCHAR({width})", lambda rng, width, pool: _pool_slice(rng, pool, 1, width)),
+    "text": ("TEXT", "TEXT", lambda rng, width, pool: _pool_slice(rng, pool, width, width * 4)),
+    "datetime": ("DATETIME", "TIMESTAMP", lambda rng, width, pool: _EPOCH + timedelta(seconds=int(rng.random() * 10 ** 8))),
+}
+
+
+def parse_column_mix(mix):
+    # "int:2,varchar:3" -> [("c1_int", "int"), ("c2_int", "int"), ("c3_varchar", "varchar"), ...]
+    columns = []
+    for part in mix.split(","):
+        type_name, _, count = part.strip().partition(":")
+        if type_name not in COLUMN_TYPES:
+            raise ValueError(f"Unknown column type: {type_name} (choose from {', '.join(COLUMN_TYPES)})")
+        for _ in range(int(count or 1)):
+            columns.append((f"c{len(columns) + 1}_{type_name}", type_name))
+    return columns
+
+
+def synthetic_rows(row_count, columns, width=32, seed=0):
+    rng = random.Random(seed)
+    pool = "".join(rng.choices(_ALPHABET, k=max(_POOL_SIZE, width * 8)))
+    generators = [COLUMN_TYPES[type_name][2] for _, type_name in columns]
+    for row_id in range(1, row_count + 1):
+        yield (row_id,) + tuple([generate(rng, width, pool) for generate in generators])
+
+
+def _ddl(table, columns, width, dialect, primary_key=True):
+    index = 0 if dialect == "mysql" else 1
+    column_defs = [f"{name} {COLUMN_TYPES[type_name][index].format(width=width)}" for name, type_name in columns]
+    id_type = "INT" if dialect == "mysql" else "INTEGER"
+    key = " PRIMARY KEY" if primary_key else ""
+    return f"CREATE TABLE {table} (id {id_type}{key}, {', '.join(column_defs)})"
+
+
+def create_synthetic_tables(mysql_params, postgres_params, table, columns, width=32, mysql_primary_key=True):
+    # Drops and recreates the table on both sides with identical columns, so
+    # the loader's CREATE TABLE IF NOT EXISTS leaves the destination alone
+    for connect, params, dialect in ((connect_mysql, mysql_params, "mysql"), (connect_postgres, postgres_params, "postgres")):
+        if params is None:
+            continue
+        host, port, user, password, database = params
+        conn = connect(host=host, port=port, user=user, password=password, database=database)
+        cursor = conn.cursor()
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(_ddl(table, columns, width, dialect, primary_key=mysql_primary_key or dialect != "mysql"))
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+
+def bulk_load_synthetic_data(mysql_params, postgres_params, table, columns, row_count, width=32, seed=0, method="auto", chunk_rows=DEFAULT_CHUNK_ROWS, batch_size=DEFAULT_BATCH_SIZE, defer_indexes=True):
+    # Recreates the table on both sides and fills the MySQL one. With
+    # defer_indexes the primary key is added after the load, so InnoDB builds
+    # it once by sort instead of maintaining it row by row
+    try:
+        create_synthetic_tables(mysql_params, postgres_params, table, columns, width, mysql_primary_key=not defer_indexes)
+        bulk_load_rows(mysql_params, table, ["id"] + [name for name, _ in columns], synthetic_rows(row_count, columns, width, seed),
+                       method=method, chunk_rows=chunk_rows, batch_size=batch_size)
+        if defer_indexes:
+            host, port, user, password, database = mysql_params
+            conn = connect_mysql(host=host, port=port, user=user, password=password, database=database)
+            cursor = conn.cursor()
+            started = time.perf_counter()
+            cursor.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id)")
+            conn.commit()
+            cursor.close()
+            conn.close()
+            print(f"Built primary key on {table} in {time.perf_counter() - started:.1f}s.")
+        return True
+    except Exception as e:
+        print(f"Error loading synthetic data: {e}")
+        return False
+
+
+def write_synthetic_csv(path, columns, row_count, width=32, seed=0, batch_size=5000):
+    # The CSV the extractors would produce for the same table; for runs
+    # without databases. Returns the file size in bytes.
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        f.write(encode_csv_row(["id"] + [name for name, _ in columns]))
+        batch = []
+        for row in synthetic_rows(row_count, columns, width, seed):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                f.write(encode_csv_rows(batch))
+                batch = []
+        f.write(encode_csv_rows(batch))
+    return os.path.getsize(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed MySQL with a synthetic table")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--columns", default="varchar:2,datetime:1", help=f"column mix, e.g. int:2,varchar:4 (types: {', '.join(COLUMN_TYPES)})")
+    parser.add_argument("--width", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--table", default="bench_synthetic")
+    parser.add_argument("--method", choices=BULK_METHODS, default="auto")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="rows per LOAD DATA file / per commit")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows per INSERT statement")
+    parser.add_argument("--no-postgres", action="store_true", help="leave the destination table alone")
+    args = parser.parse_args()
+
+    mysql_params = (os.getenv("MYSQL_HOST", "localhost"), int(os.getenv("MYSQL_PORT", 3306)), os.getenv("MYSQL_USER", "user"),
+                    os.getenv("MYSQL_PASSWORD", "password"), os.getenv("MYSQL_DATABASE", "source_db"))
+    postgres_params = None if args.no_postgres else (
+        os.getenv("POSTGRES_HOST", "localhost"), int(os.getenv("POSTGRES_PORT", 5432)), os.getenv("POSTGRES_USER", "user"),
+        os.getenv("POSTGRES_PASSWORD", "password"), os.getenv("POSTGRES_DB", "target_db"))
+    ok = bulk_load_synthetic_data(mysql_params, postgres_params, args.table, parse_column_mix(args.columns), args.rows,
+                                  args.width, args.seed, args.method, args.chunk_rows, args.batch_size)
+    sys.exit(0 if ok else 1)
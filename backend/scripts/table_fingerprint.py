@@ -0,0 +1,212 @@
+from backend.scripts.partitioned_transfer import split_key_range
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from backend.scripts.connection_pool import connect_mysql, connect_postgres
+import hashlib
+import json
+import struct
+
+# Order-independent table fingerprint.
+#
+# Every row is reduced to a canonical, driver-independent byte encoding and
+# hashed. Rows are grouped into buckets of bucket_size consecutive key values;
+# a bucket keeps its row count and the sum of its row hashes mod 2**256, which
+# is commutative, so rows can be added in any order and partial fingerprints
+# computed in parallel simply add up. The table root is a Merkle root over the
+# sorted buckets, and two fingerprints can be diffed bucket by bucket to find
+# the key ranges that differ.
+#
+# JSON columns are compared by value: MySQL returns them as text in its own
+# key order, psycopg2 as parsed dicts and lists, so the MySQL text is parsed
+# and objects and arrays are encoded with sorted keys.
+_MOD = 2 ** 256
+# cursor.description type code of MySQL JSON columns (FieldType.JSON)
+_MYSQL_JSON_TYPE = 245
+
+def _format_timedelta(value):
+    # Signed [-]HH:MM:SS[.ffffff], hours unbounded; within 0-24h it equals
+    # time.isoformat(), so a MySQL TIME still matches a Postgres TIME column
+    sign = "-" if value < timedelta(0) else ""
+    value = abs(value)
+    seconds = value.days * 86400 + value.seconds
+    text = f"{sign}{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    if value.microseconds:
+        text += f".{value.microseconds:06d}"
+    return text
+
+def _canonical_value(value):
+    # Tag + length-prefixed payload so adjacent values can't run together
+    if value is None:
+        return b"N"
+    if isinstance(value, bool):
+        # MySQL TINYINT(1) comes back as int, Postgres BOOLEAN as bool
+        tag, payload = b"n", str(int(value))
+    elif isinstance(value, int):
+        tag, payload = b"n", str(value)
+    elif isinstance(value, Decimal):
+        # 5, 5.0 and 5.00 all encode as "5"
+        payload = format(value, "f")
+        if "." in payload:
+            payload = payload.rstrip("0").rstrip(".")
+        tag, payload = b"n", "0" if payload in ("", "-0") else payload
+    elif isinstance(value, float):
+        tag, payload = b"f", repr(value)
+    elif isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        tag, payload = b"t", value.isoformat()
+    elif isinstance(value, (date, time)):
+        tag, payload = b"t", value.isoformat()
+    elif isinstance(value, timedelta):
+        # MySQL TIME columns come back as timedelta and range over +-838h
+        tag, payload = b"t", _format_timedelta(value)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        tag, payload = b"b", bytes(value).hex()
+    elif isinstance(value, (dict, list)):
+        tag, payload = b"j", json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    else:
+        tag, payload = b"s", str(value)
+    encoded = payload.encode("utf-8")
+    return tag + struct.pack(">I", len(encoded)) + encoded
+
+def row_hash(row):
+    return hashlib.sha256(b"".join(_canonical_value(v) for v in row)).digest()
+
+class TableFingerprint:
+    def __init__(self, bucket_size=10000):
+        self.bucket_size = bucket_size
+        self.buckets = {}
+
+    def _bucket_of(self, key):
+        if isinstance(key, (int, Decimal)) and not isinstance(key, bool):
+            return int(key) // self.bucket_size
+        # Non-integer keys cannot be range-bucketed
+        return 0
+
+    def add_rows(self, rows, key_index):
+        # key_index None puts every row in bucket 0 (tables without a key)
+        for row in rows:
+            bucket = self._bucket_of(row[key_index]) if key_index is not None else 0
+            count, total = self.buckets.get(bucket, (0, 0))
+            self.buckets[bucket] = (count + 1, (total + int.from_bytes(row_hash(row), "big")) % _MOD)
+
+    def merge(self, other):
+        for bucket, (count, total) in other.buckets.items():
+            mine_count, mine_total = self.buckets.get(bucket, (0, 0))
+            self.buckets[bucket] = (mine_count + count, (mine_total + total) % _MOD)
+
+    def row_count(self):
+        return sum(count for count, _ in self.buckets.values())
+
+    def bucket_digest(self, bucket):
+        count, total = self.buckets[bucket]
+        return hashlib.sha256(f"{bucket}:{count}:{total:064x}".encode("utf-8")).hexdigest()
+
+    def root(self):
+        level = [bytes.fromhex(self.bucket_digest(b)) for b in sorted(self.buckets)]
+        if not level:
+            return hashlib.sha256(b"").hexdigest()
+        while len(level) > 1:
+            if len(level) % 2:
+                level.append(level[-1])
+            level = [hashlib.sha256(level[i] + level[i + 1]).digest() for i in range(0, len(level), 2)]
+        return level[0].hex()
+
+    def to_dict(self):
+        return {
+            "bucket_size": self.bucket_size,
+            "row_count": self.row_count(),
+            "root": self.root(),
+            "buckets": {
+                str(bucket): {"count": self.buckets[bucket][0], "digest": self.bucket_digest(bucket)}
+                for bucket in sorted(self.buckets)
+            }
+        }
+
+def _parse_json(value):
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray)):
+        value = bytes(value).decode("utf-8")
+    return json.loads(value)
+
+def fingerprint_cursor(cursor, key_column, fingerprint, batch_size=1000, parse_json=False):
+    # parse_json: decode MySQL JSON columns so they hash like psycopg2's values
+    rows = cursor.fetchmany(batch_size)
+    key_index = [i[0] for i in cursor.description].index(key_column) if key_column else None
+    json_indexes = [i for i, column in enumerate(cursor.description) if column[1] == _MYSQL_JSON_TYPE] if parse_json else []
+    while rows:
+        if json_indexes:
+            rows = [tuple(_parse_json(v) if i in json_indexes else v for i, v in enumerate(row)) for row in rows]
+        fingerprint.add_rows(rows, key_index)
+        rows = cursor.fetchmany(batch_size)
+    return fingerprint
+
+def _connect(kind, host, port, user, password, database):
+    if kind == "mysql":
+        return connect_mysql(host=host, port=port, user=user, password=password, database=database)
+    return connect_postgres(host=host, port=port, user=user, password=password, database=database)
+
+def _fingerprint_range(kind, params, table, key_column, bucket_size, batch_size, key_range):
+    conn = _connect(kind, *params)
+    if kind == "mysql":
+        cursor = conn.cursor(buffered=False)
+    else:
+        cursor = conn.cursor(name=f"fingerprint_{table}_{key_range[0] if key_range else 'all'}")
+        cursor.itersize = batch_size
+    # No ORDER BY: the aggregate does not depend on row order
+    if key_range:
+        cursor.execute(f"SELECT * FROM {table} WHERE {key_column} BETWEEN %s AND %s", key_range)
+    else:
+        cursor.execute(f"SELECT * FROM {table}")
+    fingerprint = fingerprint_cursor(cursor, key_column, TableFingerprint(bucket_size), batch_size, parse_json=kind == "mysql")
+    cursor.close()
+    conn.close()
+    return fingerprint
+
+def compute_fingerprint(kind, params, table, key_column, bucket_size=10000, batch_size=1000, workers=1):
+    # Returns the TableFingerprint; key_column may be None for tables without a key
+    key_ranges = [None]
+    if workers > 1 and key_column:
+        conn = _connect(kind, *params)
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT MIN({key_column}), MAX({key_column}) FROM {table}")
+        min_key, max_key = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        # Only integer keys can be split into ranges; other keys (VARCHAR,
+        # UUID) are read in a single pass
+        if isinstance(min_key, int) and isinstance(max_key, int):
+            key_ranges = split_key_range(min_key, max_key, workers)
+        elif min_key is not None:
+            print(f"{table}.{key_column} is not an integer key; fingerprinting {table} in a single pass")
+
+    with ThreadPoolExecutor(max_workers=len(key_ranges)) as pool:
+        parts = list(pool.map(
+            lambda key_range: _fingerprint_range(kind, params, table, key_column, bucket_size, batch_size, key_range),
+            key_ranges
+        ))
+
+    fingerprint = TableFingerprint(bucket_size)
+    for part in parts:
+        fingerprint.merge(part)
+    return fingerprint
+
+def fingerprint_table(kind, params, table, key_column, hash_file, fingerprint_file, bucket_size=10000, batch_size=1000, workers=1):
+    # kind: "mysql" or "postgres"; params: (host, port, user, password, database)
+    try:
+        fingerprint = compute_fingerprint(kind, params, table, key_column, bucket_size, batch_size, workers)
+        result = fingerprint.to_dict()
+        result["table"] = table
+        result["key_column"] = key_column
+        with open(fingerprint_file, "w") as f:
+            json.dump(result, f, indent=4)
+        with open(hash_file, "w") as f:
+            f.write(result["root"])
+
+        print(f"Fingerprint of {table} ({kind}): {result['root']} over {result['row_count']} rows")
+        return True
+    except Exception as e:
+        print(f"Error fingerprinting {table} ({kind}): {e}")
+        return False
@@ -1,58 +1,84 @@
-from cryptography.hazmat.primitives import serialization, hashes
-from cryptography.hazmat.primitives.asymmetric import ec
-from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.fernet import Fernet
-import psycopg2
+from backend.scripts.encrypt_payload import BUNDLE_MAGIC, BUNDLE_VERSION_FERNET, BUNDLE_VERSION_CHUNKED
+from backend.scripts.stream_cipher import DecryptingReader, read_stream_header
+from backend.scripts.arrow_payload import open_arrow_csv_stream
+from backend.scripts.csv_codec import copy_sql
+from backend.scripts.connection_pool import connect_postgres
+from backend.scripts.key_manager import unwrap_with_private_key, unwrap_session_key_for
+import csv
 import struct
 import io
 import os
-import base64
 
-def ecc_decrypt_and_load(private_key_path, bundle_path, host, port, user, password, database, table):
+def read_bundle_header(f):
+    # Headerless bundles are the original Fernet format
+    prefix = f.read(4)
+    if prefix == BUNDLE_MAGIC:
+        bundle_version = struct.unpack("B", f.read(1))[0]
+        eph_pub_len = struct.unpack("I", f.read(4))[0]
+    else:
+        bundle_version = BUNDLE_VERSION_FERNET
+        eph_pub_len = struct.unpack("I", prefix)[0]
+    if bundle_version not in (BUNDLE_VERSION_FERNET, BUNDLE_VERSION_CHUNKED):
+        raise ValueError(f"Unsupported bundle version: {bundle_version}")
+
+    # Read Ephemeral Public Key
+    eph_pub_bytes = f.read(eph_pub_len)
+
+    # Read Encrypted Session Key
+    enc_session_key_len = struct.unpack("I", f.read(4))[0]
+    enc_session_key = f.read(enc_session_key_len)
+    return bundle_version, eph_pub_bytes, enc_session_key
+
+def unwrap_session_key(receiver_private_key, eph_pub_bytes, enc_session_key):
+    # ECDH with the ephemeral key -> HKDF -> Fernet, without key_manager's caching
+    return unwrap_with_private_key(receiver_private_key, eph_pub_bytes, enc_session_key)
+
+def prepare_destination_table(cursor, table, truncate=True):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(100),
+            email VARCHAR(100),
+            created_at TIMESTAMP
+        )
+    """)
+
+    if truncate:
+        cursor.execute(f"TRUNCATE TABLE {table}")
+
+def merge_from_staging(cursor, table, staging_table, columns, merge_key):
+    # Upsert staged rows; existing keys take the new values
+    column_list = ", ".join(columns)
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns if c != merge_key)
+    conflict_action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+    cursor.execute(f"""
+        INSERT INTO {table} ({column_list})
+        SELECT {column_list} FROM {staging_table}
+        ON CONFLICT ({merge_key}) {conflict_action}
+    """)
+    return cursor.rowcount
+
+def ecc_decrypt_and_load_stream(private_key_path, bundle_file, host, port, user, password, database, table, prepare_table=True, merge_key=None):
     try:
-        # 1. Load Receiver's Private Key (ECC)
-        with open(private_key_path, "rb") as key_file:
-            receiver_private_key = serialization.load_pem_private_key(
-                key_file.read(),
-                password=None
-            )
-            
-        with open(bundle_path, "rb") as f:
-            # Read Ephemeral Public Key
-            eph_pub_len = struct.unpack("I", f.read(4))[0]
-            eph_pub_bytes = f.read(eph_pub_len)
-            
-            # Read Encrypted Session Key
-            enc_session_key_len = struct.unpack("I", f.read(4))[0]
-            enc_session_key = f.read(enc_session_key_len)
-            
-            # Read Payload
-            encrypted_payload = f.read()
-            
-        # 2. Deserialized Ephemeral Public Key
-        ephemeral_public_key = serialization.load_pem_public_key(eph_pub_bytes)
-        
-        # 3. Perform ECDH to derive same shared secret
-        shared_secret = receiver_private_key.exchange(ec.ECDH(), ephemeral_public_key)
-        
-        # 4. Derive same encryption key
-        derived_key = HKDF(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=None,
-            info=b'session key encryption',
-        ).derive(shared_secret)
-        
-        # 5. Decrypt the session key
-        f_derived = Fernet(base64.urlsafe_b64encode(derived_key))
-        session_key = f_derived.decrypt(enc_session_key)
-        
-        # 6. Decrypt payload with original session key
-        cipher_suite = Fernet(session_key)
-        decrypted_csv_data = cipher_suite.decrypt(encrypted_payload)
-        
-        # 7. Load into Postgres
-        conn = psycopg2.connect(
+        # 1-2. Read bundle header and recover the session key with the
+        # receiver's private key (current or retired; key and KEK are cached)
+        bundle_version, eph_pub_bytes, enc_session_key = read_bundle_header(bundle_file)
+        session_key = unwrap_session_key_for(private_key_path, eph_pub_bytes, enc_session_key)
+
+        # 3. Decrypt payload with original session key
+        payload_format = "csv"
+        if bundle_version == BUNDLE_VERSION_CHUNKED:
+            # Decrypted lazily, chunk by chunk, while COPY consumes the raw bytes
+            stream_header = read_stream_header(bundle_file)
+            payload_format = stream_header["meta"].get("format", "csv")
+            f_io = io.BufferedReader(DecryptingReader(session_key, bundle_file, stream_header), 1024 * 1024)
+        else:
+            cipher_suite = Fernet(session_key)
+            f_io = io.BytesIO(cipher_suite.decrypt(bundle_file.read()))
+
+        # 4. Load into Postgres
+        conn = connect_postgres(
             host=host,
             port=port,
             user=user,
@@ -60,25 +86,31 @@ def ecc_decrypt_and_load(private_key_path, bundle_path, host, port, user, passwo
             database=database
         )
         cursor = conn.cursor()
-        
-        cursor.execute(f"""
-            CREATE TABLE IF NOT EXISTS {table} (
-                id SERIAL PRIMARY KEY,
-                name VARCHAR(100),
-                email VARCHAR(100),
-                created_at TIMESTAMP
-            )
-        """)
-        
-        cursor.execute(f"TRUNCATE TABLE {table}")
-        
-        f_io = io.StringIO(decrypted_csv_data.decode('utf-8'))
-        next(f_io) # Skip header
-        cursor.copy_from(f_io, table, sep=',', columns=('id', 'name', 'email', 'created_at'))
-        
+
+        # Partitioned loads prepare the table once and then append concurrently;
+        # incremental (merge_key) loads keep the existing rows
+        if prepare_table:
+            prepare_destination_table(cursor, table, truncate=merge_key is None)
+
+        # Column list comes from the CSV header (or Arrow schema) rather than a fixed schema
+        if payload_format == "arrow":
+            columns, arrow_csv = open_arrow_csv_stream(f_io)
+            f_io = io.BufferedReader(arrow_csv, 1024 * 1024)
+        else:
+            columns = next(csv.reader([f_io.readline().decode('utf-8')]))
+        if merge_key:
+            # Delta rows go to a staging table first, then are upserted
+            staging_table = f"{table}_staging"
+            cursor.execute(f"CREATE TEMP TABLE {staging_table} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+            cursor.copy_expert(copy_sql(staging_table, columns), f_io, 1024 * 1024)
+            merged = merge_from_staging(cursor, table, staging_table, columns, merge_key)
+            print(f"Merged {merged} rows into {table}.")
+        else:
+            cursor.copy_expert(copy_sql(table, columns), f_io, 1024 * 1024)
+
         conn.commit()
         print(f"ECC Decryption and transfer to Postgres successful.")
-        
+
         cursor.close()
         conn.close()
         return True
@@ -86,13 +118,21 @@ def ecc_decrypt_and_load(private_key_path, bundle_path, host, port, user, passwo
         print(f"Error during ECC transfer to Postgres: {e}")
         return False
 
+def ecc_decrypt_and_load(private_key_path, bundle_path, host, port, user, password, database, table, prepare_table=True, merge_key=None):
+    try:
+        with open(bundle_path, "rb") as f:
+            return ecc_decrypt_and_load_stream(private_key_path, f, host, port, user, password, database, table, prepare_table, merge_key)
+    except Exception as e:
+        print(f"Error during ECC transfer to Postgres: {e}")
+        return False
+
 if __name__ == "__main__":
     host = os.getenv("POSTGRES_HOST", "localhost")
     port = int(os.getenv("POSTGRES_PORT", 5432))
     user = os.getenv("POSTGRES_USER", "user")
     password = os.getenv("POSTGRES_PASSWORD", "password")
     database = os.getenv("POSTGRES_DB", "target_db")
-    
+
     ecc_decrypt_and_load(
         "private_key.pem",
         "encrypted_payload.bundle",
@@ -0,0 +1,54 @@
+import shutil
+import time
+import os
+
+# Per-job directories. Artifacts that outlive the run (hashes, manifests,
+# fingerprints, the PDF report) go in job_root/<job id>; intermediate payloads
+# (plaintext session keys, .enc files, bundles) go in a scratch directory
+# that can sit on a faster volume such as tmpfs and is always removed when
+# the job ends. Nothing is written to the process working directory, so
+# concurrent jobs, API workers and benchmark runs never share a file.
+
+class JobWorkspace:
+    def __init__(self, job_id, job_root, scratch_root=None):
+        self.job_id = job_id
+        self.job_dir = os.path.join(job_root, job_id)
+        # Without a dedicated scratch volume, scratch is a subdirectory of the job
+        self.scratch_dir = os.path.join(scratch_root or self.job_dir, job_id if scratch_root else "scratch")
+        os.makedirs(self.job_dir, exist_ok=True)
+        os.makedirs(self.scratch_dir, mode=0o700, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.job_dir, name)
+
+    def scratch(self, name):
+        return os.path.join(self.scratch_dir, name)
+
+    def cleanup_scratch(self):
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
+
+
+def apply_retention(job_root, max_age_days=None, max_jobs=None, active=(), resumable=()):
+    # Deletes the oldest job directories beyond max_jobs and any older than
+    # max_age_days; directories of active jobs are never touched, nor those
+    # of resumable jobs, whose checkpoint a resume continues from
+    if not os.path.isdir(job_root):
+        return []
+    keep = set(active) | set(resumable)
+    entries = []
+    for name in os.listdir(job_root):
+        path = os.path.join(job_root, name)
+        if os.path.isdir(path) and name not in keep:
+            entries.append((os.path.getmtime(path), name, path))
+    entries.sort(reverse=True)
+
+    cutoff = time.time() - max_age_days * 86400 if max_age_days is not None else None
+    removed = []
+    for index, (mtime, name, path) in enumerate(entries):
+        # Active jobs aren't in entries but still count towards max_jobs
+        too_many = max_jobs is not None and index + len(active) >= max_jobs
+        too_old = cutoff is not None and mtime < cutoff
+        if too_many or too_old:
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(name)
+    return removed
@@ -17,6 +17,7 @@ function App() {
   });
 
   const [progress, setProgress] = useState(null);
+  const [jobId, setJobId] = useState(null);
   const [auditLogs, setAuditLogs] = useState([]);
   const [activeTab, setActiveTab] = useState('transfer'); // transfer, audit, query
   const [testResult, setTestResult] = useState(null);
@@ -56,19 +57,60 @@ function App() {
         body: JSON.stringify(config)
       });
       if (resp.ok) {
-        pollProgress();
+        const data = await resp.json();
+        setJobId(data.job_id);
+        pollProgress(data.job_id);
       }
     } catch (err) {
       console.error("Failed to start transfer", err);
     }
   };
 
-  const pollProgress = async () => {
+  const pollProgress = (id) => {
+    // Push updates over Server-Sent Events; each event carries only what changed
+    setProgress({ status: 'queued', current_step: 'None', progress: null, logs: [], result: null });
+    const source = new EventSource(`${API_BASE}/progress/stream?job_id=${id}`);
+    const appendLog = (e) => {
+      const event = JSON.parse(e.data);
+      setProgress(prev => ({
+        ...prev,
+        logs: [...prev.logs, event.data],
+        current_step: event.kind === 'step' ? event.data.replace(/^[^ ]+: /, '') : prev.current_step
+      }));
+    };
+    source.addEventListener('log', appendLog);
+    source.addEventListener('step', appendLog);
+    source.addEventListener('progress', (e) => {
+      const event = JSON.parse(e.data);
+      setProgress(prev => ({ ...prev, progress: event.data }));
+    });
+    source.addEventListener('status', (e) => {
+      const data = JSON.parse(e.data);
+      setProgress(prev => ({ ...prev, ...data }));
+    });
+    source.addEventListener('done', (e) => {
+      const job = JSON.parse(e.data);
+      source.close();
+      setProgress(prev => ({ ...prev, ...job, logs: prev.logs }));
+      fetchAuditLogs();
+    });
+    source.onerror = () => {
+      // EventSource retries on its own; fall back to cursor polling if it gives up
+      if (source.readyState === EventSource.CLOSED) {
+        pollProgressSince(id, 0);
+      }
+    };
+  };
+
+  const pollProgressSince = (id, cursor) => {
     const interval = setInterval(async () => {
       try {
-        const resp = await fetch(`${API_BASE}/progress`);
+        const resp = await fetch(`${API_BASE}/progress?job_id=${id}&since=${cursor}`);
         const data = await resp.json();
-        setProgress(data);
+        // The first response (since=0) carries the full log and replaces what the stream showed
+        const first = cursor === 0;
+        cursor = data.cursor;
+        setProgress(prev => ({ ...data, logs: first ? data.logs : [...prev.logs, ...data.logs] }));
         if (data.status === 'completed' || data.status === 'failed') {
           clearInterval(interval);
           fetchAuditLogs();
@@ -83,7 +125,7 @@ function App() {
     try {
       const resp = await fetch(`${API_BASE}/audit-logs`);
       const data = await resp.json();
-      setAuditLogs(data.reverse());
+      setAuditLogs(data);
     } catch (err) {
       console.error("Failed to fetch audit logs", err);
     }
@@ -211,8 +253,8 @@ function App() {
                   </div>
                 </div>
                 <div style={{ marginTop: '20px', display: 'flex', gap: '10px' }}>
-                  <button className="button" onClick={startTransfer} disabled={progress?.status === 'running'}>
-                    {progress?.status === 'running' ? 'Transferring...' : 'Start Transfer'}
+                  <button className="button" onClick={startTransfer} disabled={progress?.status === 'running' || progress?.status === 'queued'}>
+                    {progress?.status === 'running' ? 'Transferring...' : progress?.status === 'queued' ? 'Queued...' : 'Start Transfer'}
                   </button>
                   <button className="button secondary" onClick={testConnection}>Test Connection</button>
                 </div>
@@ -237,6 +279,12 @@ function App() {
                   <div style={{ marginBottom: '15px', color: 'var(--accent-primary)', fontWeight: 'bold' }}>
                     Current Step: {progress.current_step}
                   </div>
+                  {progress.progress && (
+                    <div style={{ marginBottom: '15px', fontSize: '12px', color: 'var(--text-secondary)' }}>
+                      {progress.progress.rows.toLocaleString()} rows · {(progress.progress.bytes / 1048576).toFixed(1)} MiB · {Math.round(progress.progress.rows_per_second).toLocaleString()} rows/s
+                      {progress.progress.eta_seconds != null && progress.status === 'running' && ` · ETA ${Math.ceil(progress.progress.eta_seconds)}s`}
+                    </div>
+                  )}
                   <div className="log-container">
                     {progress.logs.map((log, i) => (
                       <div key={i}>{log}</div>
@@ -258,7 +306,7 @@ function App() {
                         <div style={{ color: progress.result?.success ? 'var(--success)' : 'var(--error)', fontWeight: 'bold' }}>
                            INTEGRITY CHECK: {progress.result?.success ? 'PASS' : 'FAIL'}
                         </div>
-                        <a href={`${API_BASE}/download-report`} className="button secondary" style={{ textDecoration: 'none' }}>
+                        <a href={`${API_BASE}/download-report?job_id=${jobId}`} className="button secondary" style={{ textDecoration: 'none' }}>
                           Download PDF Audit Report
                         </a>
                       </div>
@@ -0,0 +1,221 @@
+import json
+import sqlite3
+
+import pytest
+
+from backend.scripts.audit_logger import AuditStore, calculate_entry_hash
+from backend.scripts.audit_verify import verify_chain
+from backend.scripts.key_manager import ensure_keys, rotate_keys
+
+ENTRIES = 25
+INTERVAL = 10
+
+
+@pytest.fixture
+def keys(tmp_path):
+    private_key, public_key = str(tmp_path / "signing_private.pem"), str(tmp_path / "signing_public.pem")
+    ensure_keys(private_key, public_key)
+    return private_key, public_key
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "audit_log.db")
+    store = AuditStore(path)
+    for i in range(ENTRIES):
+        store.append({"transfer_status": "success", "source_database": "src", "record_count": i})
+    return path
+
+
+def execute(db, sql, params=()):
+    conn = sqlite3.connect(db)
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+
+def rehash_from(db, seq):
+    # Rewrites every hash from seq on, as someone editing the log would
+    conn = sqlite3.connect(db)
+    previous = conn.execute("SELECT current_hash FROM audit_entries WHERE seq < ? ORDER BY seq DESC LIMIT 1", (seq,)).fetchone()[0]
+    rows = conn.execute("SELECT seq, timestamp, data FROM audit_entries WHERE seq >= ? ORDER BY seq", (seq,)).fetchall()
+    for row_seq, timestamp, data in rows:
+        current = calculate_entry_hash({"timestamp": timestamp, "previous_hash": previous, "data": json.loads(data)})
+        conn.execute("UPDATE audit_entries SET previous_hash = ?, current_hash = ? WHERE seq = ?", (previous, current, row_seq))
+        previous = current
+    conn.execute("UPDATE audit_tip SET current_hash = ? WHERE id = 1", (previous,))
+    conn.commit()
+    conn.close()
+
+
+def sign(db, keys):
+    private_key, public_key = keys
+    return verify_chain(db, public_key, private_key, workers=1, interval=INTERVAL)
+
+
+def checkpoint_count(db):
+    conn = sqlite3.connect(db)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM audit_checkpoints").fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("full", [False, True])
+def test_intact_chain_verifies(db, keys, full):
+    result = verify_chain(db, keys[1], full=full, workers=1, interval=INTERVAL)
+    assert result["valid"] is True
+    assert result["entries_verified"] == ENTRIES
+    assert result["tip_seq"] == ENTRIES
+
+
+def test_full_verification_in_parallel(db, keys):
+    result = verify_chain(db, keys[1], full=True, workers=2, interval=INTERVAL)
+    assert result["valid"] is True
+    assert result["entries_verified"] == ENTRIES
+
+
+def test_read_only_verification_writes_no_checkpoints(db, keys):
+    verify_chain(db, keys[1], workers=1, interval=INTERVAL)
+    assert checkpoint_count(db) is None
+
+
+def test_signing_run_adds_checkpoints(db, keys):
+    result = sign(db, keys)
+    assert result["valid"] is True
+    assert result["checkpoints_added"] == ENTRIES // INTERVAL
+    # The next incremental run starts after the newest checkpoint
+    result = verify_chain(db, keys[1], workers=1, interval=INTERVAL)
+    assert result["valid"] is True
+    assert result["verified_from"] == 21
+    assert result["entries_verified"] == ENTRIES - 20
+
+
+@pytest.mark.parametrize("full", [False, True])
+def test_edited_entry_detected(db, keys, full):
+    execute(db, "UPDATE audit_entries SET data = ? WHERE seq = 7", (json.dumps({"transfer_status": "forged"}),))
+    result = verify_chain(db, keys[1], full=full, workers=1, interval=INTERVAL)
+    assert result["valid"] is False
+    assert result["error"] == {"seq": 7, "error": "current_hash does not match the entry contents"}
+
+
+@pytest.mark.parametrize("full", [False, True])
+def test_deleted_entry_detected(db, keys, full):
+    execute(db, "DELETE FROM audit_entries WHERE seq = 12")
+    result = verify_chain(db, keys[1], full=full, workers=1, interval=INTERVAL)
+    assert result["valid"] is False
+    assert result["error"] == {"seq": 13, "error": "previous_hash does not link to the preceding entry"}
+
+
+def test_rehashed_entry_breaks_the_next_link(db, keys):
+    conn = sqlite3.connect(db)
+    timestamp, previous = conn.execute("SELECT timestamp, previous_hash FROM audit_entries WHERE seq = 5").fetchone()
+    conn.close()
+    data = {"transfer_status": "forged"}
+    forged = calculate_entry_hash({"timestamp": timestamp, "previous_hash": previous, "data": data})
+    execute(db, "UPDATE audit_entries SET data = ?, current_hash = ? WHERE seq = 5", (json.dumps(data), forged))
+    result = verify_chain(db, keys[1], full=True, workers=1, interval=INTERVAL)
+    assert result["error"] == {"seq": 6, "error": "previous_hash does not link to the preceding entry"}
+
+
+@pytest.mark.parametrize("full", [False, True])
+def test_rewritten_chain_fails_signed_checkpoint(db, keys, full):
+    sign(db, keys)
+    execute(db, "UPDATE audit_entries SET data = ? WHERE seq = 3", (json.dumps({"transfer_status": "forged"}),))
+    rehash_from(db, 3)
+    result = verify_chain(db, keys[1], full=full, workers=1, interval=INTERVAL)
+    assert result["valid"] is False
+    assert result["error"]["error"] == "entry no longer matches its signed checkpoint"
+
+
+def test_edit_after_checkpoint_is_detected_incrementally(db, keys):
+    sign(db, keys)
+    execute(db, "UPDATE audit_entries SET data = ? WHERE seq = 23", (json.dumps({"transfer_status": "forged"}),))
+    result = verify_chain(db, keys[1], workers=1, interval=INTERVAL)
+    assert result["error"] == {"seq": 23, "error": "current_hash does not match the entry contents"}
+
+
+def test_checkpoint_signed_with_another_key_is_rejected(db, keys, tmp_path):
+    other = (str(tmp_path / "other_private.pem"), str(tmp_path / "other_public.pem"))
+    ensure_keys(*other)
+    sign(db, other)
+    result = verify_chain(db, keys[1], workers=1, interval=INTERVAL)
+    assert result["valid"] is False
+    assert result["error"] == {"seq": 20, "error": "checkpoint signature is invalid"}
+
+
+def test_forged_checkpoint_row_is_rejected(db, keys):
+    sign(db, keys)
+    execute(db, "UPDATE audit_checkpoints SET current_hash = ? WHERE seq = 20", ("0" * 64,))
+    result = verify_chain(db, keys[1], full=True, workers=1, interval=INTERVAL)
+    assert result["error"] == {"seq": 20, "error": "checkpoint signature is invalid"}
+
+
+def test_unsigned_legacy_checkpoints_are_ignored(db, keys):
+    sign(db, keys)
+    execute(db, "UPDATE audit_checkpoints SET signer = NULL")
+    result = verify_chain(db, keys[1], workers=1, interval=INTERVAL)
+    assert result["valid"] is True
+    assert result["verified_from"] == 1
+
+
+def test_checkpoints_survive_key_rotation(db, keys):
+    sign(db, keys)
+    rotate_keys(*keys)
+    result = verify_chain(db, keys[1], full=True, workers=1, interval=INTERVAL)
+    assert result["valid"] is True
+
+
+@pytest.mark.parametrize("full", [False, True])
+def test_truncated_tail_detected(tmp_path, keys, full):
+    db = str(tmp_path / "short.db")
+    store = AuditStore(db)
+    for i in range(10):
+        store.append({"record_count": i})
+    verify_chain(db, keys[1], keys[0], workers=1, interval=4)
+    execute(db, "DELETE FROM audit_entries WHERE seq >= 9")
+    result = verify_chain(db, keys[1], full=full, workers=1, interval=4)
+    assert result["valid"] is False
+    assert result["error"] == {"seq": 10, "error": "log ends at seq 8 but audit_tip records seq 10"}
+
+
+@pytest.mark.parametrize("full", [False, True])
+def test_truncated_below_checkpoint_detected(db, keys, full):
+    sign(db, keys)
+    execute(db, "DELETE FROM audit_entries WHERE seq >= 15")
+    result = verify_chain(db, keys[1], full=full, workers=1, interval=INTERVAL)
+    assert result["valid"] is False
+
+
+@pytest.mark.parametrize("full", [False, True])
+def test_truncated_log_with_rewound_tip_fails_checkpoint(db, keys, full):
+    sign(db, keys)
+    conn = sqlite3.connect(db)
+    conn.execute("DELETE FROM audit_entries WHERE seq >= 15")
+    conn.execute("UPDATE audit_tip SET seq = 14, current_hash = (SELECT current_hash FROM audit_entries WHERE seq = 14)")
+    conn.commit()
+    conn.close()
+    result = verify_chain(db, keys[1], full=full, workers=1, interval=INTERVAL)
+    assert result["error"] == {"seq": 20, "error": "signed checkpoint lies past the end of the log (seq 14)"}
+
+
+@pytest.mark.parametrize("full", [False, True])
+def test_entry_appended_past_tip_detected(db, keys, full):
+    conn = sqlite3.connect(db)
+    previous = conn.execute("SELECT current_hash FROM audit_tip").fetchone()[0]
+    entry = {"timestamp": "2024-01-01T00:00:00", "previous_hash": previous, "data": {"transfer_status": "forged"}}
+    conn.execute("INSERT INTO audit_entries (timestamp, previous_hash, current_hash, data) VALUES (?, ?, ?, ?)",
+                 (entry["timestamp"], previous, calculate_entry_hash(entry), json.dumps(entry["data"])))
+    conn.commit()
+    conn.close()
+    result = verify_chain(db, keys[1], full=full, workers=1, interval=INTERVAL)
+    assert result["error"] == {"seq": ENTRIES, "error": f"log ends at seq {ENTRIES + 1} but audit_tip records seq {ENTRIES}"}
+
+
+def test_empty_log_verifies(tmp_path, keys):
+    db = str(tmp_path / "empty.db")
+    AuditStore(db)
+    for full in (False, True):
+        assert verify_chain(db, keys[1], full=full, workers=1)["valid"] is True
@@ -0,0 +1,69 @@
+import mysql.connector
+import pytest
+
+from backend.scripts import bulk_load_mysql
+
+
+class FakeCursor:
+    def __init__(self):
+        self.executed = []
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+        if sql.startswith("LOAD DATA"):
+            with open(params[0]) as f:
+                self.rowcount = sum(1 for _ in f)
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.cursor_obj = FakeCursor()
+
+    def cursor(self):
+        return self.cursor_obj
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    made = []
+
+    def connect(**kwargs):
+        made.append(FakeConn(**kwargs))
+        return made[-1]
+
+    monkeypatch.setattr(mysql.connector, "connect", connect)
+    return made
+
+
+def test_infile_is_limited_to_the_chunk_directory(connections):
+    rows = [(i, f"name\t{i}", None) for i in range(5)]
+    assert bulk_load_mysql.bulk_load_rows((1, 2, 3, 4, 5), "users", ["id", "name", "email"], rows, method="infile", chunk_rows=2) == (5, "infile")
+    kwargs = connections[0].kwargs
+    assert "allow_local_infile" not in kwargs
+    loaded = [params[0] for sql, params in connections[0].cursor_obj.executed if sql.startswith("LOAD DATA")]
+    assert len(loaded) == 3
+    assert all(path.startswith(kwargs["allow_local_infile_in_path"]) for path in loaded)
+
+
+def test_insert_connections_get_no_local_infile(connections):
+    bulk_load_mysql.bulk_load_rows((1, 2, 3, 4, 5), "users", ["id"], [(1,), (2,)], method="insert")
+    assert connections[0].kwargs["allow_local_infile"] is False
+    assert "allow_local_infile_in_path" not in connections[0].kwargs
+
+
+def test_chunk_escaping(tmp_path):
+    path = tmp_path / "chunk.tsv"
+    rows = iter([(1, "tab\there", None, True), (2, "back\\slash\nline", "", False)])
+    assert bulk_load_mysql._write_chunk(str(path), rows, 10) == 2
+    assert path.read_text() == "1\ttab\\there\t\\N\t1\n2\tback\\\\slash\\nline\t\t0\n"
@@ -0,0 +1,76 @@
+import re
+
+from backend.scripts import checkpointed_transfer
+from backend.scripts.checkpointed_transfer import Checkpoint
+
+
+class KeysetCursor:
+    # Answers plan_key_chunks' MIN/MAX over "key > last ORDER BY key LIMIT n"
+    def __init__(self, keys):
+        self.keys = sorted(keys)
+        self.statements = []
+
+    def execute(self, sql, params):
+        self.statements.append(sql)
+        assert re.search(r"ORDER BY id LIMIT %s\) AS chunk$", sql)
+        after = params[0] if len(params) == 2 else None
+        chunk = [k for k in self.keys if after is None or k > after][:params[-1]]
+        self.result = (min(chunk), max(chunk)) if chunk else (None, None)
+
+    def fetchone(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self):
+        return self._cursor
+
+    def close(self):
+        pass
+
+
+def plan(monkeypatch, keys, chunk_size):
+    cursor = KeysetCursor(keys)
+    monkeypatch.setattr(checkpointed_transfer, "connect_mysql", lambda **kwargs: FakeConnection(cursor))
+    return checkpointed_transfer.plan_key_chunks("h", 3306, "u", "p", "app", "users", "id", chunk_size), cursor
+
+
+def test_chunks_hold_chunk_size_rows_on_sparse_keys(monkeypatch):
+    # A handful of ids near 1 and a long tail near 10**9
+    keys = list(range(1, 6)) + list(range(10 ** 9, 10 ** 9 + 7))
+    ranges, _ = plan(monkeypatch, keys, 4)
+    assert ranges == [(1, 4), (5, 10 ** 9 + 2), (10 ** 9 + 3, 10 ** 9 + 6)]
+    counts = [sum(1 for k in keys if lo <= k <= hi) for lo, hi in ranges]
+    assert counts == [4, 4, 4]
+
+
+def test_chunks_cover_every_key_once(monkeypatch):
+    keys = [3, 8, 9, 20, 21, 22, 50, 51, 90, 1000]
+    ranges, cursor = plan(monkeypatch, keys, 3)
+    covered = [k for lo, hi in ranges for k in keys if lo <= k <= hi]
+    assert covered == keys
+    # One index walk per chunk plus the one that finds the end
+    assert len(cursor.statements) == len(ranges) + 1
+    assert "WHERE" not in cursor.statements[0]
+
+
+def test_empty_table_plans_one_empty_chunk(monkeypatch):
+    ranges, _ = plan(monkeypatch, [], 100)
+    assert ranges == [(0, 0)]
+
+
+def test_checkpoint_round_trips_the_plan(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = Checkpoint(path)
+    checkpoint.start_transfer({"table": "users", "key_column": "id", "chunk_size": 4, "ranges": [(1, 4), (5, 9)]})
+    checkpoint.mark_chunk(1, (5, 9), "ab" * 32, rows=4)
+    resumed = Checkpoint(path)
+    assert resumed.transfer_plan()["ranges"] == [[1, 4], [5, 9]]
+    assert resumed.chunk(0) is None and resumed.chunk(1)["rows"] == 4
+    assert resumed.transfer_rows() == 4
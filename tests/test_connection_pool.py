@@ -0,0 +1,111 @@
+import pytest
+
+from backend.scripts.connection_pool import ConnectionPool
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=None):
+        if sql == "DISCARD ALL" and not self.conn.autocommit:
+            raise RuntimeError("DISCARD ALL cannot run inside a transaction block")
+        self.conn.calls.append(sql)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, fail_reset=False):
+        self.calls = []
+        self.closed = 0
+        self.autocommit = False
+        self.unread_result = False
+        self.fail_reset = fail_reset
+        self._database = "app"
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.calls.append("rollback")
+
+    def cmd_reset_connection(self):
+        if self.fail_reset:
+            raise RuntimeError("reset not supported")
+        self.calls.append("reset")
+
+    @property
+    def database(self):
+        return self._database
+
+    @database.setter
+    def database(self, value):
+        self.calls.append(f"USE {value}")
+        self._database = value
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+def make_pool(kind, monkeypatch, **conn_kwargs):
+    pool = ConnectionPool(kind, "h", 1, "u", "p", "app")
+    opened = []
+
+    def open_connection(connect_timeout=None):
+        opened.append(FakeConnection(**conn_kwargs))
+        return opened[-1]
+
+    monkeypatch.setattr(pool, "_open", open_connection)
+    return pool, opened
+
+
+def test_mysql_session_is_reset_on_release(monkeypatch):
+    pool, opened = make_pool("mysql", monkeypatch)
+    conn = pool.acquire()
+    conn.cursor().execute("SET @tenant = 7")
+    conn.close()
+    assert opened[0].calls == ["SET @tenant = 7", "rollback", "reset", "USE app"]
+    assert opened[0].database == "app"
+    # The reset connection is reused
+    pool.acquire().close()
+    assert len(opened) == 1
+
+
+def test_postgres_session_is_discarded_on_release(monkeypatch):
+    pool, opened = make_pool("postgres", monkeypatch)
+    conn = pool.acquire()
+    conn.cursor().execute("SET search_path TO other")
+    conn.close()
+    assert opened[0].calls == ["SET search_path TO other", "rollback", "DISCARD ALL"]
+    assert opened[0].autocommit is False
+    assert pool.stats()["idle"] == 1
+
+
+def test_connection_that_cannot_be_reset_is_closed(monkeypatch):
+    pool, opened = make_pool("mysql", monkeypatch, fail_reset=True)
+    pool.acquire().close()
+    stats = pool.stats()
+    assert stats["idle"] == 0 and stats["closed_broken"] == 1
+    assert opened[0].closed
+
+
+def test_discarded_connection_is_not_reset(monkeypatch):
+    pool, opened = make_pool("mysql", monkeypatch)
+    pool.acquire().discard()
+    assert opened[0].calls == []
+    assert pool.stats()["closed_discarded"] == 1
+
+
+def test_acquire_times_out_when_the_pool_is_full(monkeypatch):
+    pool, _ = make_pool("postgres", monkeypatch)
+    pool.settings.update(max_size=1, acquire_timeout=0.05)
+    held = pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+    held.close()
+    pool.acquire().close()
@@ -0,0 +1,63 @@
+import csv
+import io
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from backend.scripts.csv_codec import copy_sql, encode_csv_field, encode_csv_row, encode_csv_rows
+
+
+@pytest.mark.parametrize("value, encoded", [
+    (None, ""),
+    ("", '""'),
+    ("plain", "plain"),
+    ("a,b", '"a,b"'),
+    ('say "hi"', '"say ""hi"""'),
+    ("two\nlines", '"two\nlines"'),
+    ("cr\rlf", '"cr\rlf"'),
+    ("\\.", '"\\."'),
+    (42, "42"),
+    (-1.5, "-1.5"),
+    (Decimal("10.50"), "10.50"),
+    (True, "1"),
+    (False, "0"),
+    (b"\x00\xffA", "\\x00ff41"),
+    (bytearray(b"ab"), "\\x6162"),
+    (memoryview(b"ab"), "\\x6162"),
+    ({"a": 1}, '"{""a"": 1}"'),
+    ([1, 2], '"[1, 2]"'),
+    ({"red", "blue"}, '"blue,red"'),
+    (frozenset({"solo"}), "solo"),
+    (set(), '""'),
+    (date(2024, 1, 2), "2024-01-02"),
+    (datetime(2024, 1, 2, 3, 4, 5), "2024-01-02 03:04:05"),
+])
+def test_encode_field(value, encoded):
+    assert encode_csv_field(value) == encoded
+
+
+@pytest.mark.parametrize("value, encoded", [
+    (timedelta(hours=1, minutes=2, seconds=3), "01:02:03"),
+    (timedelta(0), "00:00:00"),
+    (timedelta(hours=838, minutes=59, seconds=59), "838:59:59"),
+    (timedelta(seconds=5, microseconds=250), "00:00:05.000250"),
+    (-timedelta(hours=1, minutes=30), "-01:30:00"),
+])
+def test_encode_time(value, encoded):
+    # MySQL TIME columns come back as timedelta, including past 24h and negative
+    assert encode_csv_field(value) == encoded
+
+
+def test_null_and_empty_string_differ():
+    assert encode_csv_row([None, ""]) == ',""\r\n'
+
+
+def test_rows_parse_back_with_csv_module():
+    rows = [(1, "a,b", 'q"uote', "multi\nline", None), (2, "", "x", "y", b"\x01")]
+    parsed = list(csv.reader(io.StringIO(encode_csv_rows(rows), newline="")))
+    assert parsed == [["1", "a,b", 'q"uote', "multi\nline", ""], ["2", "", "x", "y", "\\x01"]]
+
+
+def test_copy_sql():
+    assert copy_sql("users", ["id", "name"]) == "COPY users (id, name) FROM STDIN WITH (FORMAT csv)"
@@ -0,0 +1,40 @@
+import pytest
+
+from backend.scripts import extract_mysql_encrypt, extract_postgres_encrypt
+
+
+class FailingCursor:
+    # Returns one batch, then loses the connection
+    description = [("id",)]
+    itersize = 0
+
+    def __init__(self):
+        self.batches = 0
+
+    def execute(self, query):
+        pass
+
+    def fetchmany(self, size):
+        self.batches += 1
+        if self.batches == 1:
+            return [(1,)]
+        raise RuntimeError("connection lost")
+
+
+class FakeConnection:
+    def cursor(self, *args, **kwargs):
+        return FailingCursor()
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize("module, connect, extract", [
+    (extract_mysql_encrypt, "connect_mysql", extract_mysql_encrypt.extract_and_encrypt),
+    (extract_postgres_encrypt, "connect_postgres", extract_postgres_encrypt.extract_and_encrypt_postgres),
+])
+def test_failed_extract_removes_the_plaintext_csv(tmp_path, monkeypatch, module, connect, extract):
+    monkeypatch.setattr(module, connect, lambda **kwargs: FakeConnection())
+    output = tmp_path / "payload.csv.enc"
+    assert extract("h", 1, "u", "p", "db", "users", str(output), str(tmp_path / "hash"), str(tmp_path / "key")) is False
+    assert not (tmp_path / "payload.csv.enc.plain.csv").exists()
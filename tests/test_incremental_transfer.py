@@ -0,0 +1,57 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.scripts.incremental_transfer import load_watermark, save_watermark, window_params, window_query, window_start
+
+
+def test_window_start_integer_watermark():
+    assert window_start(None) is None
+    assert window_start(5000, overlap=100) == 4900
+    # No overlap still re-reads the watermark value itself
+    assert window_start(5000, overlap=0) == 5000
+
+
+def test_window_start_timestamp_watermark():
+    assert window_start("2024-01-01 00:05:00", overlap=300) == "2024-01-01 00:00:00"
+    assert window_start("2024-01-01 00:05:00", overlap=0) == "2024-01-01 00:05:00"
+
+
+def test_window_start_other_watermark():
+    assert window_start("v1.2", overlap=300) == "v1.2"
+
+
+def test_window_query_is_inclusive():
+    assert window_query("users", "updated_at", "id", None) == "SELECT * FROM users WHERE updated_at <= %s ORDER BY updated_at, id"
+    assert window_query("users", "updated_at", "id", "x") == \
+        "SELECT * FROM users WHERE updated_at >= %s AND updated_at <= %s ORDER BY updated_at, id"
+    assert window_params(None, 10) == (10,)
+    assert window_params(5, 10) == (5, 10)
+
+
+def test_watermarks_are_keyed_per_server(tmp_path):
+    path = str(tmp_path / "watermarks.json")
+    save_watermark(path, "db1", 3306, "app", "users", {"column": "id", "value": 10})
+    save_watermark(path, "db2", 3306, "app", "users", {"column": "id", "value": 20})
+    assert load_watermark(path, "db1", 3306, "app", "users")["value"] == 10
+    assert load_watermark(path, "db2", 3306, "app", "users")["value"] == 20
+    assert load_watermark(path, "db1", 3307, "app", "users") is None
+
+
+def test_legacy_watermark_key_is_read_and_replaced(tmp_path):
+    path = tmp_path / "watermarks.json"
+    path.write_text(json.dumps({"app.users": {"column": "id", "value": 7}}))
+    assert load_watermark(str(path), "db1", 3306, "app", "users")["value"] == 7
+    save_watermark(str(path), "db1", 3306, "app", "users", {"column": "id", "value": 8})
+    assert json.loads(path.read_text()) == {"db1:3306/app.users": {"column": "id", "value": 8}}
+
+
+def test_concurrent_watermark_saves_keep_every_entry(tmp_path):
+    # Job workers save watermarks for different tables at the same time
+    path = str(tmp_path / "watermarks.json")
+    tables = [f"table{i}" for i in range(16)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda t: save_watermark(path, "db1", 3306, "app", t, {"column": "id", "value": t}), tables))
+    assert all(load_watermark(path, "db1", 3306, "app", t)["value"] == t for t in tables)
+    # No temp files left behind
+    assert sorted(os.listdir(tmp_path)) == ["watermarks.json", "watermarks.json.lock"]
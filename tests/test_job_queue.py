@@ -0,0 +1,190 @@
+import os
+import sqlite3
+import stat
+import threading
+
+import pytest
+
+from backend.scripts.job_queue import JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+
+def claim_all(queue, max_per_source, max_per_destination, worker="w"):
+    claimed = []
+    while True:
+        job = queue.claim(worker, max_per_source, max_per_destination)
+        if job is None:
+            return claimed
+        claimed.append(job[0])
+
+
+def test_database_is_private(tmp_path, queue):
+    assert stat.S_IMODE(os.stat(tmp_path / "jobs.db").st_mode) == 0o600
+
+
+def test_claim_returns_oldest_job_and_config(queue):
+    first = queue.enqueue({"n": 1}, "src-a", "dst-a")
+    queue.enqueue({"n": 2}, "src-b", "dst-b")
+    assert queue.claim("w", 1, 1) == (first, {"n": 1})
+    job = queue.get(first, with_logs=False)
+    assert job["status"] == "running" and job["worker"] == "w"
+
+
+def test_empty_queue(queue):
+    assert queue.claim("w", 1, 1) is None
+
+
+def test_per_source_limit(queue):
+    jobs = [queue.enqueue({}, "src", f"dst-{i}") for i in range(4)]
+    assert claim_all(queue, 2, 10) == jobs[:2]
+    assert queue.status_counts() == {"running": 2, "queued": 2}
+
+
+def test_per_destination_limit(queue):
+    jobs = [queue.enqueue({}, f"src-{i}", "dst") for i in range(3)]
+    assert claim_all(queue, 10, 1) == jobs[:1]
+
+
+def test_blocked_job_does_not_hold_up_others(queue):
+    a1 = queue.enqueue({}, "src-a", "dst-a")
+    queue.enqueue({}, "src-a", "dst-b")
+    b = queue.enqueue({}, "src-b", "dst-b")
+    # The second src-a job is over the source limit; the src-b job behind it still runs
+    assert claim_all(queue, 1, 1) == [a1, b]
+
+
+def test_finishing_frees_the_slot(queue):
+    first = queue.enqueue({}, "src", "dst")
+    second = queue.enqueue({}, "src", "dst")
+    assert claim_all(queue, 1, 1) == [first]
+    queue.finish(first, "completed", result={"ok": True})
+    assert claim_all(queue, 1, 1) == [second]
+    assert queue.get(first, with_logs=False)["result"] == {"ok": True}
+
+
+def test_concurrent_claims_respect_limits(queue):
+    for i in range(20):
+        queue.enqueue({}, f"src-{i % 2}", f"dst-{i % 4}")
+    claimed = []
+    lock = threading.Lock()
+
+    def worker(name):
+        jobs = claim_all(queue, 2, 1, worker=name)
+        with lock:
+            claimed.extend(jobs)
+
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(claimed) == len(set(claimed))
+    conn = sqlite3.connect(queue.db_path)
+    per_source = dict(conn.execute("SELECT source_key, COUNT(*) FROM jobs WHERE status = 'running' GROUP BY source_key"))
+    per_destination = dict(conn.execute("SELECT destination_key, COUNT(*) FROM jobs WHERE status = 'running' GROUP BY destination_key"))
+    conn.close()
+    assert max(per_source.values()) <= 2
+    assert max(per_destination.values()) <= 1
+    assert len(claimed) == 4
+
+
+def test_requeue_orphaned(queue):
+    job_id = queue.enqueue({}, "src", "dst")
+    queue.claim("w", 1, 1)
+    # This process is alive, so the job is not orphaned
+    assert queue.requeue_orphaned() == []
+    conn = sqlite3.connect(queue.db_path)
+    conn.execute("UPDATE jobs SET worker_pid = NULL WHERE id = ?", (job_id,))
+    conn.commit()
+    conn.close()
+    assert queue.requeue_orphaned() == [job_id]
+    assert queue.claim("w", 1, 1)[0] == job_id
+
+
+def test_requeue_failed_only_requeues_failed_jobs(queue):
+    job_id = queue.enqueue({}, "src", "dst")
+    queue.claim("w", 1, 1)
+    assert queue.requeue_failed(job_id) is False
+    queue.finish(job_id, "failed", error="boom")
+    assert queue.requeue_failed(job_id) is True
+    job = queue.get(job_id)
+    assert job["status"] == "queued" and job["error"] is None
+    assert job["logs"][-1].endswith("Resume requested")
+
+
+def test_events_follow_the_cursor(queue):
+    job_id = queue.enqueue({}, "src", "dst")
+    queue.log(job_id, "Extracting", step=True)
+    queue.report_progress(job_id, {"rows": 10})
+    events = queue.events(job_id)
+    assert [e["kind"] for e in events] == ["step", "progress"]
+    assert events[1]["data"] == {"rows": 10}
+    assert queue.events(job_id, since=events[0]["id"]) == events[1:]
+    job = queue.get(job_id)
+    assert job["current_step"] == "Extracting"
+    assert job["progress"] == {"rows": 10}
+    assert job["cursor"] == events[1]["id"]
+
+
+def test_fail_running_only_fails_running_jobs(queue):
+    job_id = queue.enqueue({}, "src", "dst")
+    assert queue.fail_running(job_id, "boom") is False
+    queue.claim("w", 1, 1)
+    assert queue.fail_running(job_id, "boom") is True
+    job = queue.get(job_id, with_logs=False)
+    assert job["status"] == "failed" and job["error"] == "boom"
+    # A finished job keeps its outcome
+    done = queue.enqueue({}, "src", "dst")
+    queue.claim("w", 1, 1)
+    queue.finish(done, "completed", result={"ok": True})
+    assert queue.fail_running(done, "late error") is False
+    assert queue.get(done, with_logs=False)["status"] == "completed"
+
+
+def test_resumable_ids(queue):
+    failed, queued, running = (queue.enqueue({}, f"src-{i}", f"dst-{i}") for i in range(3))
+    claim_all(queue, 1, 1)
+    queue.finish(failed, "failed", error="boom")
+    # Failed, then resumed but not yet claimed again
+    queue.finish(queued, "failed", error="boom")
+    assert queue.requeue_failed(queued)
+    assert sorted(queue.resumable_ids()) == sorted([failed, queued])
+    assert queue.running_ids() == [running]
+
+
+class StopWorker(BaseException):
+    pass
+
+
+def test_worker_survives_a_job_that_raises(tmp_path, monkeypatch):
+    from backend import main
+    monkeypatch.setattr(main, "JOB_DB_PATH", str(tmp_path / "jobs.db"))
+    monkeypatch.setattr(main, "JOB_ROOT", str(tmp_path / "jobs"))
+    queue = JobQueue(main.JOB_DB_PATH)
+    broken = queue.enqueue({}, "src", "dst")
+    healthy = queue.enqueue({}, "src", "dst")
+    ran = []
+
+    def run_transfer_pipeline(config, progress, workspace):
+        ran.append(progress.job_id)
+        if progress.job_id == broken:
+            raise RuntimeError("lost the database")
+        queue.finish(progress.job_id, "completed", result={"ok": True})
+
+    def sleep(seconds):
+        # The queue is empty: stop the otherwise endless worker loop
+        raise StopWorker()
+
+    monkeypatch.setattr(main, "run_transfer_pipeline", run_transfer_pipeline)
+    monkeypatch.setattr(main.time, "sleep", sleep)
+    with pytest.raises(StopWorker):
+        main.transfer_worker("w")
+    assert ran == [broken, healthy]
+    job = queue.get(broken, with_logs=False)
+    assert job["status"] == "failed" and job["error"] == "lost the database"
+    assert queue.get(healthy, with_logs=False)["status"] == "completed"
@@ -0,0 +1,27 @@
+from backend.scripts.key_manager import ensure_keys, key_fingerprint, key_info, load_public_key, public_key_candidates, rotate_keys
+
+
+def test_retired_keys_are_not_shared_between_pairs_in_one_directory(tmp_path):
+    # The transfer pair and the audit signing pair live side by side, and
+    # "audit_signing_private_key.pem" ends in "_private_key.pem"
+    transfer = (str(tmp_path / "private_key.pem"), str(tmp_path / "public_key.pem"))
+    signing = (str(tmp_path / "audit_signing_private_key.pem"), str(tmp_path / "audit_signing_public_key.pem"))
+    ensure_keys(*transfer)
+    ensure_keys(*signing)
+    old_transfer = key_fingerprint(load_public_key(transfer[1]))
+    old_signing = key_fingerprint(load_public_key(signing[1]))
+    rotate_keys(*transfer)
+    rotate_keys(*signing)
+
+    assert key_info(*transfer)["retired"] == [old_transfer]
+    assert key_info(*signing)["retired"] == [old_signing]
+    assert [key_fingerprint(k) for k in public_key_candidates(transfer[1])][1:] == [old_transfer]
+
+
+def test_unrelated_files_in_retired_keys_are_ignored(tmp_path):
+    private_key_path, public_key_path = str(tmp_path / "private_key.pem"), str(tmp_path / "public_key.pem")
+    ensure_keys(private_key_path, public_key_path)
+    rotate_keys(private_key_path, public_key_path)
+    retired = tmp_path / "retired_keys"
+    (retired / "backup_public_key.pem").write_bytes((tmp_path / "public_key.pem").read_bytes())
+    assert len(key_info(private_key_path, public_key_path)["retired"]) == 1
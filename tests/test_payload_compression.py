@@ -0,0 +1,27 @@
+import pytest
+
+from backend.scripts import payload_compression
+
+PLAINTEXT = b"".join(f"{i},user{i},user{i}@example.com\r\n".encode() for i in range(200))
+
+
+def test_gzip_round_trip():
+    codec = payload_compression.get_codec("gzip")
+    assert codec.decompress(codec.compress(PLAINTEXT), len(PLAINTEXT)) == PLAINTEXT
+
+
+def test_gzip_rejects_output_past_the_chunk_size():
+    codec = payload_compression.get_codec("gzip")
+    bomb = codec.compress(b"\0" * 10000)
+    assert codec.decompress(bomb, 10000) == b"\0" * 10000
+    with pytest.raises(ValueError):
+        codec.decompress(bomb, 9999)
+
+
+def test_gzip_rejects_truncated_and_trailing_data():
+    codec = payload_compression.get_codec("gzip")
+    compressed = codec.compress(PLAINTEXT)
+    with pytest.raises(ValueError):
+        codec.decompress(compressed[:-4], len(PLAINTEXT))
+    with pytest.raises(ValueError):
+        codec.decompress(compressed + b"extra", len(PLAINTEXT))
@@ -0,0 +1,39 @@
+import pytest
+
+from backend.scripts.query_console import decode_page_token, encode_page_token, page_query, query_fingerprint
+
+
+def test_keyset_page_orders_outside_the_derived_table():
+    sql, params = page_query("SELECT * FROM users ORDER BY email;", "id", 50, 120)
+    assert sql == "SELECT * FROM (SELECT * FROM users ORDER BY email) AS console_page WHERE id > %s ORDER BY id LIMIT %s"
+    assert params == (120, 51)
+
+
+def test_offset_page_uses_the_outer_order_by():
+    sql, params = page_query("SELECT name, id FROM users", None, 50, 100, "name DESC,  id")
+    assert sql.endswith("AS console_page ORDER BY name DESC, id LIMIT %s OFFSET %s")
+    assert params == (51, 100)
+
+
+def test_offset_page_without_an_order_is_rejected():
+    # MySQL drops an ORDER BY inside a derived table, so the inner one doesn't count
+    with pytest.raises(ValueError, match="page_key or an order_by"):
+        page_query("SELECT * FROM users ORDER BY id", None, 50, None)
+
+
+@pytest.mark.parametrize("order_by", ["id; DROP TABLE users", "id DESC NULLS", "LOWER(name)", "id,"])
+def test_invalid_order_by_is_rejected(order_by):
+    with pytest.raises(ValueError, match="Invalid order_by"):
+        page_query("SELECT * FROM users", None, 50, None, order_by)
+
+
+def test_page_query_escapes_percent_signs():
+    sql, _ = page_query("SELECT * FROM users WHERE email LIKE '%@example.com'", "id", 10, None)
+    assert "'%%@example.com'" in sql
+
+
+def test_continuation_token_is_bound_to_the_ordering():
+    token = encode_page_token(query_fingerprint("source", "SELECT 1", None, "id"), 50)
+    assert decode_page_token(token, query_fingerprint("source", "SELECT 1", None, "id")) == 50
+    with pytest.raises(ValueError, match="different query"):
+        decode_page_token(token, query_fingerprint("source", "SELECT 1", None, "id DESC"))
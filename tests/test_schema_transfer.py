@@ -0,0 +1,54 @@
+from backend.scripts import schema_transfer
+from backend.scripts.table_fingerprint import TableFingerprint
+
+
+class FakeCursor:
+    def __init__(self, results):
+        self.results = list(results)
+
+    def execute(self, sql, params=None):
+        self.rows = self.results.pop(0)
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, results):
+        self.results = results
+
+    def cursor(self):
+        return FakeCursor(self.results)
+
+    def close(self):
+        pass
+
+
+def test_introspect_schema_decodes_bytearray_metadata(monkeypatch):
+    results = [
+        [(bytearray(b"orders"),), (bytearray(b"users"),)],
+        [(bytearray(b"orders"), bytearray(b"id")), (bytearray(b"users"), bytearray(b"id"))],
+        [(bytearray(b"orders"), bytearray(b"users"))],
+    ]
+    monkeypatch.setattr(schema_transfer, "connect_mysql", lambda **kwargs: FakeConnection(results))
+    schema = schema_transfer.introspect_schema("h", 3306, "u", "p", "app", tables=["orders", "users"])
+    assert schema["tables"] == ["orders", "users"]
+    assert schema["primary_keys"] == {"orders": ["id"], "users": ["id"]}
+    assert schema["dependencies"] == {"orders": {"users"}, "users": set()}
+
+
+def test_table_hash_ignores_collation_order():
+    # MySQL's case-insensitive collation and Postgres' "C" order disagree
+    rows = [("apple", 1), ("Banana", 2), ("banana ", 3), ("cherry", 4)]
+    mysql_order = sorted(rows, key=lambda row: row[0].lower().rstrip())
+    postgres_order = sorted(rows)
+    assert mysql_order != postgres_order
+
+    def root(ordered):
+        fingerprint = TableFingerprint()
+        fingerprint.add_rows(ordered, 0)
+        return fingerprint.root()
+    assert root(mysql_order) == root(postgres_order)
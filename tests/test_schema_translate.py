@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+import pytest
+
+from backend.scripts import schema_translate
+from backend.scripts.csv_codec import encode_csv_row
+from backend.scripts.schema_translate import create_table_sql, index_sql, map_mysql_type, read_table_metadata
+from backend.scripts.table_fingerprint import row_hash
+
+
+def column(data_type, column_type=None, **extra):
+    base = {"data_type": data_type, "column_type": column_type or data_type, "numeric_precision": None, "numeric_scale": None,
+            "character_maximum_length": None, "datetime_precision": None}
+    base.update(extra)
+    return base
+
+
+class FakeCursor:
+    # Answers read_table_metadata's three information_schema queries in order
+    def __init__(self, *results):
+        self.results = list(results)
+
+    def execute(self, sql, params=None):
+        self.rows = self.results.pop(0)
+
+    def fetchall(self):
+        return self.rows
+
+
+@pytest.mark.parametrize("col, pg_type", [
+    (column("tinyint", "tinyint(1)"), "BOOLEAN"),
+    (column("tinyint", "tinyint(1) unsigned"), "SMALLINT"),
+    (column("int", "int unsigned"), "BIGINT"),
+    (column("bigint", "bigint unsigned"), "NUMERIC(20)"),
+    (column("decimal", numeric_precision=10, numeric_scale=2), "NUMERIC(10,2)"),
+    (column("varchar", character_maximum_length=255), "VARCHAR(255)"),
+    (column("datetime", datetime_precision=3), "TIMESTAMP(3)"),
+    (column("time", datetime_precision=0), "INTERVAL(0)"),
+    (column("time", datetime_precision=6), "INTERVAL(6)"),
+    (column("json"), "JSONB"),
+    (column("geometry"), "TEXT"),
+])
+def test_map_mysql_type(col, pg_type):
+    assert map_mysql_type(col) == pg_type
+
+
+def test_boolean_columns_hash_alike():
+    # MySQL returns TINYINT(1) as 0/1, psycopg2 returns BOOLEAN as bool
+    assert encode_csv_row([1, 0]) == encode_csv_row([True, False])
+    assert row_hash((1, 0)) == row_hash((True, False))
+
+
+def test_time_values_outside_a_day_survive():
+    # INTERVAL accepts what csv_codec writes for MySQL TIME
+    assert encode_csv_row([timedelta(hours=838, minutes=59, seconds=59), -timedelta(hours=1, minutes=30)]) == "838:59:59,-01:30:00\r\n"
+
+
+def test_functional_indexes_are_skipped():
+    cursor = FakeCursor(
+        [("id", "int", "int", "NO", None, "auto_increment", 10, 0, None, None),
+         ("email", "varchar", "varchar(255)", "YES", None, "", None, None, 255, None)],
+        [("PRIMARY", 0, "id"), ("email_lower", 1, None), ("email_idx", 0, bytearray(b"email"))],
+        [],
+    )
+    meta = read_table_metadata(cursor, "app", "users")
+    assert meta["primary_key"] == ["id"]
+    assert meta["indexes"] == {"email_idx": {"unique": True, "columns": ["email"]}}
+    assert index_sql(meta) == ["ALTER TABLE users ADD PRIMARY KEY (id)", "CREATE UNIQUE INDEX users_email_idx ON users (email)"]
+    assert create_table_sql(meta) == "CREATE TABLE users (\n    id INTEGER GENERATED BY DEFAULT AS IDENTITY NOT NULL,\n    email VARCHAR(255)\n)"
+
+
+def test_destination_tables_are_dropped_without_cascade(monkeypatch):
+    executed = []
+    monkeypatch.setattr(schema_translate, "_execute_all", lambda params, statements: executed.extend(statements))
+    meta = {"table": "users", "columns": [{"name": "id", "pg_type": "INTEGER", "auto_increment": False, "column_default": None, "nullable": False}]}
+    schema_translate.create_destination_tables(None, {"users": meta})
+    assert executed[0] == "DROP TABLE IF EXISTS users"
+    assert "CASCADE" not in " ".join(executed)
@@ -0,0 +1,184 @@
+import io
+import os
+import struct
+
+import pytest
+from cryptography.exceptions import InvalidTag
+
+from backend.scripts import payload_compression
+from backend.scripts.stream_cipher import (
+    ChunkedEncryptor, DecryptingReader, generate_stream_key, iter_decrypted_chunks, read_stream_header,
+)
+
+CHUNK_SIZE = 64
+# Compressible enough that most chunks take the compressed path
+PLAINTEXT = b"".join(f"{i},user{i},user{i}@example.com\r\n".encode() for i in range(200))
+
+
+def encrypt(key, data, chunk_size=CHUNK_SIZE, **kwargs):
+    out = io.BytesIO()
+    with ChunkedEncryptor(key, out, chunk_size, meta={"table": "users"}, **kwargs) as encryptor:
+        # Uneven writes so chunk boundaries don't line up with write calls
+        for i in range(0, len(data), 37):
+            encryptor.write(data[i:i + 37])
+    return out.getvalue()
+
+
+def decrypt(key, stream, workers=1):
+    return b"".join(iter_decrypted_chunks(key, io.BytesIO(stream), workers=workers))
+
+
+def split_stream(stream):
+    # (header bytes, [length-prefixed chunk records])
+    f = io.BytesIO(stream)
+    header = read_stream_header(f)["header"]
+    records = []
+    while True:
+        length = f.read(4)
+        if not length:
+            return header, records
+        records.append(length + f.read(struct.unpack(">I", length)[0]))
+
+
+@pytest.fixture
+def key():
+    return generate_stream_key()
+
+
+@pytest.fixture
+def stream(key):
+    return encrypt(key, PLAINTEXT)
+
+
+def test_round_trip(key, stream):
+    assert decrypt(key, stream) == PLAINTEXT
+    assert len(split_stream(stream)[1]) > 3
+
+
+def test_round_trip_through_reader(key, stream):
+    assert DecryptingReader(key, io.BytesIO(stream)).read() == PLAINTEXT
+
+
+@pytest.mark.parametrize("size", [0, 1, CHUNK_SIZE - 1, CHUNK_SIZE, CHUNK_SIZE + 1, 3 * CHUNK_SIZE])
+def test_round_trip_at_chunk_boundaries(key, size):
+    data = os.urandom(size)
+    assert decrypt(key, encrypt(key, data)) == data
+
+
+def test_meta_is_readable(stream):
+    assert read_stream_header(io.BytesIO(stream))["meta"] == {"table": "users"}
+
+
+def test_wrong_key_fails(stream):
+    with pytest.raises(InvalidTag):
+        decrypt(generate_stream_key(), stream)
+
+
+def test_reordered_chunks_fail(key, stream):
+    header, records = split_stream(stream)
+    records[0], records[1] = records[1], records[0]
+    with pytest.raises(InvalidTag):
+        decrypt(key, header + b"".join(records))
+
+
+def test_dropped_chunk_fails(key, stream):
+    header, records = split_stream(stream)
+    del records[1]
+    with pytest.raises(InvalidTag):
+        decrypt(key, header + b"".join(records))
+
+
+def test_truncated_at_chunk_boundary_fails(key, stream):
+    # The new last chunk was not sealed as the final one
+    header, records = split_stream(stream)
+    with pytest.raises(InvalidTag):
+        decrypt(key, header + b"".join(records[:-1]))
+
+
+def test_truncated_mid_chunk_fails(key, stream):
+    with pytest.raises(ValueError, match="Truncated chunk"):
+        decrypt(key, stream[:-5])
+
+
+def test_appended_chunk_fails(key, stream):
+    header, records = split_stream(stream)
+    with pytest.raises(InvalidTag):
+        decrypt(key, header + b"".join(records + [records[-1]]))
+
+
+def test_chunk_from_another_stream_fails(key, stream):
+    header, records = split_stream(stream)
+    _, other = split_stream(encrypt(key, PLAINTEXT))
+    records[0] = other[0]
+    with pytest.raises(InvalidTag):
+        decrypt(key, header + b"".join(records))
+
+
+def test_tampered_meta_fails(key, stream):
+    header, records = split_stream(stream)
+    tampered = header.replace(b'"users"', b'"admin"')
+    assert tampered != header
+    with pytest.raises(InvalidTag):
+        decrypt(key, tampered + b"".join(records))
+
+
+def test_tampered_nonce_prefix_fails(key, stream):
+    header, records = split_stream(stream)
+    # Nonce prefix follows magic, version and chunk size
+    tampered = header[:9] + bytes([header[9] ^ 1]) + header[10:]
+    with pytest.raises(InvalidTag):
+        decrypt(key, tampered + b"".join(records))
+
+
+def test_tampered_ciphertext_fails(key, stream):
+    header, records = split_stream(stream)
+    records[2] = records[2][:-1] + bytes([records[2][-1] ^ 1])
+    with pytest.raises(InvalidTag):
+        decrypt(key, header + b"".join(records))
+
+
+def test_bad_magic_rejected(key, stream):
+    with pytest.raises(ValueError, match="Not a chunked payload stream"):
+        decrypt(key, b"XXXX" + stream[4:])
+
+
+def test_empty_stream_rejected(key, stream):
+    header, _ = split_stream(stream)
+    with pytest.raises(ValueError, match="no chunks"):
+        decrypt(key, header)
+
+
+def _codecs():
+    params = [None, "gzip"]
+    params.append(pytest.param("zstd", marks=pytest.mark.skipif(payload_compression.zstandard is None, reason="zstandard not installed")))
+    params.append(pytest.param("lz4", marks=pytest.mark.skipif(payload_compression.lz4 is None, reason="lz4 not installed")))
+    return params
+
+
+@pytest.mark.parametrize("compression", _codecs())
+@pytest.mark.parametrize("workers", [1, 4])
+def test_round_trip_compressed_and_parallel(key, compression, workers):
+    data = PLAINTEXT * 20 + os.urandom(500)
+    stream = encrypt(key, data, chunk_size=256, compression=compression, workers=workers)
+    meta = read_stream_header(io.BytesIO(stream))["meta"]
+    assert ("compression" in meta) == (compression is not None)
+    assert decrypt(key, stream, workers=workers) == data
+    # The format doesn't depend on the worker count on either side
+    assert decrypt(key, stream, workers=5 - workers) == data
+
+
+def test_parallel_and_serial_streams_share_a_format(key):
+    data = PLAINTEXT * 5
+    serial = encrypt(key, data, workers=1)
+    parallel = encrypt(key, data, workers=4)
+    assert len(split_stream(serial)[1]) == len(split_stream(parallel)[1])
+    assert decrypt(key, parallel, workers=1) == decrypt(key, serial, workers=4) == data
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_parallel_reordered_chunks_fail(key, workers):
+    header, records = split_stream(encrypt(key, PLAINTEXT * 5, workers=workers))
+    records[3], records[4] = records[4], records[3]
+    with pytest.raises(InvalidTag):
+        decrypt(key, header + b"".join(records), workers=workers)
+
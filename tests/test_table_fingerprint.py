@@ -0,0 +1,190 @@
+import json
+import random
+from datetime import datetime, time, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+from backend.scripts.compare_hash import compare_fingerprints
+from backend.scripts.connection_pool import POOL_SETTINGS
+from backend.scripts.partitioned_transfer import partition_workers, split_key_range
+from backend.scripts.table_fingerprint import TableFingerprint, fingerprint_cursor, row_hash
+
+ROWS = [(i, f"user{i}", f"user{i}@example.com", datetime(2024, 1, 1) + timedelta(minutes=i)) for i in range(1, 2501)]
+
+
+class FakeCursor:
+    def __init__(self, rows, description):
+        self.rows = list(rows)
+        self.description = description
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+
+def fingerprint(rows, bucket_size=1000, key_index=0):
+    fp = TableFingerprint(bucket_size)
+    fp.add_rows(rows, key_index)
+    return fp
+
+
+def write_fingerprint(path, fp):
+    path.write_text(json.dumps(fp.to_dict()))
+    return str(path)
+
+
+@pytest.mark.parametrize("min_key, max_key, partitions", [
+    (1, 100, 4), (1, 101, 4), (5, 5, 3), (1, 3, 10), (-10, 10, 3), (1, 10 ** 12, 7),
+])
+def test_split_key_range_covers_every_key_once(min_key, max_key, partitions):
+    ranges = split_key_range(min_key, max_key, partitions)
+    assert ranges[0][0] == min_key and ranges[-1][1] == max_key
+    assert len(ranges) == min(partitions, max_key - min_key + 1)
+    for (_, hi), (lo, _) in zip(ranges, ranges[1:]):
+        assert lo == hi + 1
+    assert all(lo <= hi for lo, hi in ranges)
+
+
+def test_split_key_range_empty_table():
+    assert split_key_range(None, None, 4) == [(0, 0)]
+
+
+@pytest.mark.parametrize("min_key, max_key", [("a", "z"), (Decimal("1.5"), Decimal("9")), (datetime(2024, 1, 1), datetime(2024, 2, 1))])
+def test_split_key_range_rejects_non_integer_keys(min_key, max_key):
+    with pytest.raises(ValueError, match="integer key column"):
+        split_key_range(min_key, max_key, 4)
+
+
+def test_split_key_range_rejects_zero_partitions():
+    with pytest.raises(ValueError):
+        split_key_range(1, 100, 0)
+
+
+def test_partition_workers_never_exceed_the_pool():
+    pool_max = POOL_SETTINGS["max_size"]
+    assert partition_workers(None, pool_max * 3) == pool_max
+    assert partition_workers(None, 3) == 3
+    assert partition_workers(2, 8) == 2
+    assert partition_workers(pool_max * 2, pool_max * 2) == pool_max
+
+
+def test_fingerprint_is_order_independent():
+    shuffled = list(ROWS)
+    random.Random(7).shuffle(shuffled)
+    assert fingerprint(ROWS).root() == fingerprint(shuffled).root()
+
+
+def test_partial_fingerprints_merge():
+    whole = fingerprint(ROWS)
+    merged = TableFingerprint(1000)
+    for part in (ROWS[:700], ROWS[700:1900], ROWS[1900:]):
+        merged.merge(fingerprint(part))
+    assert merged.root() == whole.root()
+    assert merged.row_count() == len(ROWS)
+
+
+@pytest.mark.parametrize("change", ["update", "delete", "insert", "duplicate"])
+def test_fingerprint_detects_changes(change):
+    rows = list(ROWS)
+    if change == "update":
+        rows[10] = (rows[10][0], "changed") + rows[10][2:]
+    elif change == "delete":
+        del rows[10]
+    elif change == "insert":
+        rows.append((9999, "new", "new@example.com", datetime(2024, 2, 1)))
+    else:
+        rows.append(rows[10])
+    assert fingerprint(rows).root() != fingerprint(ROWS).root()
+
+
+def test_driver_types_hash_alike():
+    # What MySQL and psycopg2 return for the same stored values
+    mysql_row = (1, 1, Decimal("5.00"), datetime(2024, 1, 1, 12), timedelta(hours=1, minutes=2), b"\x01")
+    postgres_row = (1, True, Decimal("5"), datetime(2024, 1, 1, 12, tzinfo=timezone.utc), timedelta(hours=1, minutes=2), memoryview(b"\x01"))
+    assert row_hash(mysql_row) == row_hash(postgres_row)
+
+
+@pytest.mark.parametrize("value", [
+    -timedelta(hours=1), -timedelta(microseconds=1), timedelta(hours=838, minutes=59, seconds=59), -timedelta(hours=838, minutes=59, seconds=59),
+])
+def test_time_values_outside_a_day_hash(value):
+    # MySQL TIME ranges over +-838:59:59
+    assert row_hash((value,)) != row_hash((abs(value) + timedelta(seconds=1),))
+
+
+def test_time_values_do_not_wrap():
+    assert row_hash((timedelta(hours=30),)) != row_hash((timedelta(hours=6),))
+    assert row_hash((-timedelta(hours=6),)) != row_hash((timedelta(hours=6),))
+    assert row_hash((timedelta(days=1),)) != row_hash((timedelta(0),))
+
+
+def test_time_within_a_day_matches_postgres_time():
+    assert row_hash((timedelta(hours=6, minutes=5, seconds=4, microseconds=30),)) == row_hash((time(6, 5, 4, 30),))
+
+
+def test_adjacent_values_cannot_run_together():
+    assert row_hash(("ab", "c")) != row_hash(("a", "bc"))
+    assert row_hash((None, "")) != row_hash(("", None))
+    assert row_hash((1,)) != row_hash(("1",))
+
+
+def test_json_columns_hash_by_value():
+    mysql_cursor = FakeCursor([(1, '{"b": 1, "a": [1, 2.5]}'), (2, '"text"'), (3, None)], [("id", 3), ("doc", 245)])
+    postgres_cursor = FakeCursor([(3, None), (1, {"a": [1, 2.5], "b": 1}), (2, "text")], [("id", 23), ("doc", 3802)])
+    mysql = fingerprint_cursor(mysql_cursor, "id", TableFingerprint(), batch_size=2, parse_json=True)
+    postgres = fingerprint_cursor(postgres_cursor, "id", TableFingerprint(), batch_size=2)
+    assert mysql.root() == postgres.root()
+
+
+def test_rows_without_key_share_one_bucket():
+    fp = fingerprint(ROWS, key_index=None)
+    assert list(fp.buckets) == [0]
+    assert fp.root() == fingerprint(list(reversed(ROWS)), key_index=None).root()
+
+
+def test_non_integer_keys_share_one_bucket():
+    fp = fingerprint([("a-uuid", 1), ("b-uuid", 2)])
+    assert list(fp.buckets) == [0]
+
+
+def test_empty_fingerprint_root():
+    assert TableFingerprint().root() == fingerprint([]).root()
+
+
+def test_compare_fingerprints_match(tmp_path):
+    pre = write_fingerprint(tmp_path / "pre.json", fingerprint(ROWS))
+    post = write_fingerprint(tmp_path / "post.json", fingerprint(list(reversed(ROWS))))
+    result = compare_fingerprints(pre, post)
+    assert result["match"] is True
+    assert result["mismatched_ranges"] == []
+    assert result["row_count_before"] == result["row_count_after"] == len(ROWS)
+
+
+def test_compare_fingerprints_reports_differing_ranges(tmp_path):
+    rows = list(ROWS)
+    rows[1500] = (rows[1500][0], "changed") + rows[1500][2:]
+    del rows[10]
+    pre = write_fingerprint(tmp_path / "pre.json", fingerprint(ROWS))
+    post = write_fingerprint(tmp_path / "post.json", fingerprint(rows))
+    result = compare_fingerprints(pre, post)
+    assert result["match"] is False
+    assert result["mismatched_ranges"] == [
+        {"range": [0, 999], "rows_before": 999, "rows_after": 998},
+        {"range": [1000, 1999], "rows_before": 1000, "rows_after": 1000},
+    ]
+
+
+def test_compare_fingerprints_missing_bucket(tmp_path):
+    pre = write_fingerprint(tmp_path / "pre.json", fingerprint(ROWS))
+    post = write_fingerprint(tmp_path / "post.json", fingerprint(ROWS[:1999]))
+    result = compare_fingerprints(pre, post)
+    assert result["mismatched_ranges"] == [{"range": [2000, 2999], "rows_before": 501, "rows_after": 0}]
+
+
+def test_compare_fingerprints_rejects_different_bucket_sizes(tmp_path):
+    pre = write_fingerprint(tmp_path / "pre.json", fingerprint(ROWS, bucket_size=1000))
+    post = write_fingerprint(tmp_path / "post.json", fingerprint(ROWS, bucket_size=500))
+    result = compare_fingerprints(pre, post)
+    assert result["match"] is False
+    assert "bucket sizes" in result["error"]
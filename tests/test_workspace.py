@@ -0,0 +1,30 @@
+import os
+import time
+
+from backend.scripts.workspace import apply_retention
+
+
+def make_jobs(root, names):
+    now = time.time()
+    for age, name in enumerate(names):
+        os.makedirs(root / name)
+        os.utime(root / name, (now - age * 3600, now - age * 3600))
+
+
+def test_retention_keeps_the_newest_jobs(tmp_path):
+    make_jobs(tmp_path, ["new", "mid", "old"])
+    assert apply_retention(str(tmp_path), max_jobs=2) == ["old"]
+    assert sorted(os.listdir(tmp_path)) == ["mid", "new"]
+
+
+def test_retention_never_deletes_running_or_resumable_jobs(tmp_path):
+    make_jobs(tmp_path, ["new", "failed", "requeued", "running", "done"])
+    removed = apply_retention(str(tmp_path), max_age_days=0, max_jobs=1,
+                              active=["running"], resumable=["failed", "requeued"])
+    assert sorted(removed) == ["done", "new"]
+    assert sorted(os.listdir(tmp_path)) == ["failed", "requeued", "running"]
+
+
+def test_resumable_jobs_do_not_count_towards_max_jobs(tmp_path):
+    make_jobs(tmp_path, ["new", "failed", "done"])
+    assert apply_retention(str(tmp_path), max_jobs=2, resumable=["failed"]) == []